@@ -0,0 +1,124 @@
+"""
+Effective Assignments
+A TemporaryTag overrides an employee's department and role between its start and end dates.
+Every tag that is active, upcoming or ended within LOOKBACK_DAYS is expanded once into a
+{date: {employee_id: (department, role)}} map, so resolving (employee, date) is two dict lookups;
+dates outside the map fall back to the per-employee interval lookups. The map is rebuilt when the
+local date changes and when the shared TemporaryTag version moves past the one it was built under,
+which every worker sees on its next lookup after a tag is saved or deleted anywhere.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .intervals import tag_intervals
+from .models import TemporaryTag
+
+
+LOOKBACK_DAYS = 366  # Past days kept in the map, enough for the analytics windows
+HORIZON_DAYS = 366   # Future days expanded; later dates use the interval lookups
+MAP_TTL_SECONDS = 300  # Safety net for queryset updates that skipped the save signal
+
+
+class AssignmentMap:
+    def __init__(self, tags, today, version):
+        self.today = today
+        self.version = version  # Shared TemporaryTag version the tags were read under
+        self.first_day = today - timedelta(days=LOOKBACK_DAYS)
+        self.last_day = today + timedelta(days=HORIZON_DAYS)
+        self.by_date = {}
+        # Ascending ids with setdefault: the oldest tag wins an overlap, as .first() did
+        for tag_id, employee_id, department, role, start, end in sorted(tags):
+            day = max(start, self.first_day)
+            while day <= min(end, self.last_day):
+                self.by_date.setdefault(day, {}).setdefault(employee_id, (department, role))
+                day += timedelta(days=1)
+        self.built_at = time.monotonic()
+
+    def tag_for(self, employee_id, day):
+        """(department, role) of the temporary tag covering the day, or None"""
+        if self.first_day <= day <= self.last_day:
+            return self.by_date.get(day, {}).get(employee_id)
+        tags = tag_intervals.covering(employee_id, day)
+        if not tags:
+            return None
+        tag = min(tags, key=lambda t: t['id'])
+        return tag['department'], tag['role']
+
+    def tagged_employees(self, start, end):
+        """Ids of employees with a temporary tag on any day of [start, end] within the map"""
+        employees = set()
+        day = max(start, self.first_day)
+        while day <= min(end, self.last_day):
+            employees.update(self.by_date.get(day, ()))
+            day += timedelta(days=1)
+        return employees
+
+
+_map = None
+_map_lock = threading.Lock()
+
+
+def _stale(assignment_map, today, version):
+    return (
+        assignment_map is None
+        or assignment_map.today != today
+        or assignment_map.version != version
+        or time.monotonic() - assignment_map.built_at > MAP_TTL_SECONDS
+    )
+
+
+def get_assignment_map():
+    """Return the cached assignment map, rebuilding it when invalidated, stale or from another day"""
+    global _map
+    today = timezone.localtime(timezone.now()).date()
+    version = tag_intervals.version.current()
+    assignment_map = _map
+    if _stale(assignment_map, today, version):
+        with _map_lock:
+            if _stale(_map, today, version):
+                tags = TemporaryTag.objects.filter(
+                    end_date__gte=today - timedelta(days=LOOKBACK_DAYS)
+                ).values_list('id', 'employee_id', 'department', 'role', 'start_date', 'end_date')
+                _map = AssignmentMap(tags, today, version)
+            assignment_map = _map
+    return assignment_map
+
+
+def invalidate_assignment_map():
+    """
+    Drop the cached map once the current transaction commits; the next lookup rebuilds it.
+    Other workers rebuild theirs from the version bump of tag_intervals.invalidate().
+    """
+    def drop():
+        global _map
+        _map = None
+    transaction.on_commit(drop)
+
+
+def _assignment(tag, department, role):
+    if tag:
+        return {'department': tag[0], 'role': tag[1], 'is_temporary': True}
+    return {'department': department, 'role': role, 'is_temporary': False}
+
+
+def effective_assignment(employee_id, department, role, day=None):
+    """
+    Department and role in effect for an employee on a day (default today), given their
+    own department and role: {'department', 'role', 'is_temporary'}.
+    """
+    assignment_map = get_assignment_map()
+    return _assignment(assignment_map.tag_for(employee_id, day or assignment_map.today), department, role)
+
+
+def effective_assignments(employees, day=None):
+    """{employee_id: assignment} for (employee_id, department, role) tuples on one day"""
+    assignment_map = get_assignment_map()
+    day = day or assignment_map.today
+    return {
+        employee_id: _assignment(assignment_map.tag_for(employee_id, day), department, role)
+        for employee_id, department, role in employees
+    }
@@ -4,7 +4,8 @@ Analyzes historical attendance patterns and predicts future attendance for emplo
 """
 from datetime import datetime, timedelta
 from django.db.models import Count, Avg, Q
-from .models import AttendanceRecord, EmployeeRequest, Employee
+from .models import AttendanceRecord, Employee
+from .intervals import request_intervals
 
 
 class AttendancePredictionEngine:
@@ -33,13 +34,10 @@ class AttendancePredictionEngine:
         leave_days = records.filter(status='leave').count()
         
         # Also count approved leaves from EmployeeRequest
-        approved_leaves = EmployeeRequest.objects.filter(
-            employee_id=self.employee_id,
-            status='approved',
-            request_type='full_day',
-            start_date__gte=start_date,
-            start_date__lte=end_date
-        ).count()
+        approved_leaves = sum(
+            1 for req in request_intervals.overlapping(self.employee_id, start_date, end_date)
+            if req['status'] == 'approved' and req['request_type'] == 'full_day' and req['start_date'] >= start_date
+        )
         
         leave_days = max(leave_days, approved_leaves)
         
@@ -121,30 +119,22 @@ class AttendancePredictionEngine:
         today = datetime.now().date()
         
         # Check for scheduled leaves/WFH
-        future_requests = EmployeeRequest.objects.filter(
-            employee_id=self.employee_id,
-            status='approved',
-            start_date__gte=today,
-            start_date__lte=today + timedelta(days=days)
-        )
-        
-        scheduled_dates = {}
-        for req in future_requests:
-            current = req.start_date
-            while current <= req.end_date:
-                if req.request_type == 'full_day':
-                    scheduled_dates[current] = 'leave'
-                elif req.request_type == 'wfh':
-                    scheduled_dates[current] = 'wfh'
-                current += timedelta(days=1)
+        future_requests = sorted((
+            req for req in request_intervals.overlapping(self.employee_id, today, today + timedelta(days=days))
+            if req['status'] == 'approved' and req['start_date'] >= today
+        ), key=lambda req: req['id'])
         
         for i in range(1, days + 1):
             future_date = today + timedelta(days=i)
             day_of_week = future_date.weekday()
             
-            # Check if there's a scheduled leave/WFH
-            if future_date in scheduled_dates:
-                prediction = scheduled_dates[future_date]
+            # Check if there's a scheduled leave/WFH (the newest request covering the day wins)
+            scheduled = None
+            for req in future_requests:
+                if req['start_date'] <= future_date <= req['end_date'] and req['request_type'] in ('full_day', 'wfh'):
+                    scheduled = 'leave' if req['request_type'] == 'full_day' else 'wfh'
+            if scheduled:
+                prediction = scheduled
                 confidence = 100
             else:
                 # Combine pattern probability with recent behavior
@@ -241,7 +231,8 @@ class AttendancePredictionEngine:
 
 def get_all_employees_predictions():
     """Get predictions for all active employees."""
-    employees = Employee.objects.filter(is_active=True)
+    employees = list(Employee.objects.filter(is_active=True))
+    request_intervals.preload([employee.id for employee in employees])  # One query instead of one per engine
     predictions_data = []
     
     for employee in employees:
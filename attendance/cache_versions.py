@@ -0,0 +1,33 @@
+"""
+Shared Cache Versions
+Process-local caches are only dropped by the signal handlers of the worker that made a change.
+Each cache also remembers the value of a counter in the cache_versions table when it loaded its
+data; writers bump the counter once their transaction commits, and a worker that reads a newer
+value drops its copy, so every worker sees a committed change on its next lookup.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+
+class SharedVersion:
+    def __init__(self, name):
+        self.name = name
+
+    def current(self):
+        """The committed version, read with one primary key lookup (0 before the first bump)"""
+        return CacheVersion.objects.filter(name=self.name).values_list('version', flat=True).first() or 0
+
+    def bump(self):
+        """Increment the version once the current transaction commits"""
+        transaction.on_commit(self._increment)
+
+    def _increment(self):
+        if CacheVersion.objects.filter(name=self.name).update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                CacheVersion.objects.create(name=self.name, version=1)
+        except IntegrityError:  # Another worker created the row first
+            CacheVersion.objects.filter(name=self.name).update(version=F('version') + 1)
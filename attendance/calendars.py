@@ -0,0 +1,60 @@
+"""
+Month Calendar
+One employee's month as a day-indexed array: days[0] is the 1st, each entry is a row of
+CALENDAR_COLUMNS or None. It is built from one attendance query and one request query and merged
+the way the calendar screen merged attendance-records and my-requests: a leave request fills an
+empty or absent day, a WFH request only an empty one, the newest request first; rejected requests
+are left out. The ETag is a digest of the encoded payload, so an unchanged month answers 304.
+"""
+import calendar
+import hashlib
+from datetime import date
+
+from .models import AttendanceRecord, EmployeeRequest
+from .renderers import dumps_json
+
+
+CALENDAR_COLUMNS = ['status', 'source', 'request_status', 'check_in_time', 'check_out_time', 'total_hours']
+
+REQUEST_DAY_STATUS = {'full_day': 'leave', 'half_day': 'half_day', 'wfh': 'wfh'}
+
+
+def _time_str(value):
+    return str(value) if value else None
+
+
+def month_days(employee_id, year, month):
+    """The day-indexed rows of an employee's month"""
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    days = [None] * last.day
+
+    records = AttendanceRecord.objects.filter(
+        employee_id=employee_id, date__gte=first, date__lte=last
+    ).values_list('date', 'status', 'check_in_time', 'check_out_time', 'total_hours')
+    for record_date, record_status, check_in, check_out, hours in records:
+        days[record_date.day - 1] = [
+            record_status.lower(), 'attendance', None, _time_str(check_in), _time_str(check_out), float(hours),
+        ]
+
+    requests = EmployeeRequest.objects.filter(
+        employee_id=employee_id, start_date__lte=last, end_date__gte=first
+    ).exclude(status='rejected').order_by('-created_at', '-id').values_list(
+        'request_type', 'status', 'start_date', 'end_date'
+    )
+    for request_type, request_status, start, end in requests:
+        day_status = REQUEST_DAY_STATUS.get(request_type)
+        if day_status is None:
+            continue
+        for day in range(max(start, first).day, min(end, last).day + 1):
+            current = days[day - 1]
+            if current is None or (request_type != 'wfh' and current[0] == 'absent'):
+                days[day - 1] = [day_status, 'request', request_status, None, None, None]
+    return days
+
+
+def calendar_etag(payload, representation='json'):
+    """Strong ETag for a calendar payload; JSON and MessagePack bodies get different tags"""
+    digest = hashlib.md5(dumps_json(payload), usedforsecurity=False)
+    digest.update(representation.encode())
+    return '"%s"' % digest.hexdigest()
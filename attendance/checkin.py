@@ -0,0 +1,159 @@
+"""
+Check-in write path
+Transactional "create or fill today's attendance row" used by mark_attendance.
+On SQLite/PostgreSQL a new row is a single INSERT ... ON CONFLICT DO NOTHING ... RETURNING
+statement plus one summary increment. An existing row (an absent or leave placeholder, or a
+second check-in) and other backends go through select_for_update inside the transaction,
+which takes a few statements rather than one.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import AttendanceRecord
+from .rollups import apply_record_changes
+
+
+# Columns written by a check-in. Only rows without a check-in are filled, so absent
+# placeholders and approved-leave rows are taken over but a real check-in is never overwritten.
+CHECK_IN_FIELDS = ['check_in_time', 'type', 'status', 'office', 'check_in_location', 'check_in_photo']
+INSERT_FIELDS = ['employee', 'date', *CHECK_IN_FIELDS, 'total_hours', 'is_half_day', 'created_at', 'updated_at']
+UPDATE_FIELDS = [*CHECK_IN_FIELDS, 'updated_at']
+
+
+def _supports_single_statement_insert():
+    features = connection.features
+    return (
+        connection.vendor in ('sqlite', 'postgresql')
+        and features.supports_update_conflicts_with_target
+        and features.can_return_rows_from_bulk_insert
+    )
+
+
+def _insert_sql(row_count):
+    meta = AttendanceRecord._meta
+    qn = connection.ops.quote_name
+    table = qn(meta.db_table)
+    insert_cols = [qn(meta.get_field(name).column) for name in INSERT_FIELDS]
+    row = '(' + ', '.join(['%s'] * len(insert_cols)) + ')'
+
+    return (
+        f"INSERT INTO {table} ({', '.join(insert_cols)}) "
+        f"VALUES {', '.join([row] * row_count)} "
+        f"ON CONFLICT ({qn(meta.get_field('employee').column)}, {qn(meta.get_field('date').column)}) DO NOTHING "
+        f"RETURNING {qn(meta.pk.column)}, {qn(meta.get_field('employee').column)}"
+    )
+
+
+def _inserted_state(check_in):
+    """Summary state of a row created by the INSERT"""
+    return {
+        'employee_id': check_in['employee_id'],
+        'date': check_in['date'],
+        'office_id': check_in.get('office_id'),
+        'status': check_in['status'],
+        'type': check_in['type'],
+        'is_half_day': False,
+        'check_in_time': check_in['check_in_time'],
+        'total_hours': 0,
+    }
+
+
+def _row_params(check_in):
+    meta = AttendanceRecord._meta
+    values = {
+        'employee': check_in['employee_id'],
+        'date': check_in['date'],
+        'check_in_time': check_in['check_in_time'],
+        'type': check_in['type'],
+        'status': check_in['status'],
+        'office': check_in.get('office_id'),
+        'check_in_location': check_in.get('location'),
+        'check_in_photo': check_in.get('photo'),
+        'total_hours': 0,
+        'is_half_day': False,
+        'created_at': check_in['now'],
+        'updated_at': check_in['now'],
+    }
+    return [meta.get_field(name).get_db_prep_save(values[name], connection) for name in INSERT_FIELDS]
+
+
+def upsert_check_ins(check_ins):
+    """
+    Apply many check-ins in one transaction: rows that do not exist yet are created by a
+    single statement, existing rows are filled under a row lock. Each item is a dict with
+    employee_id, date, check_in_time, type, status and optional office_id, location, photo,
+    department and role (the employee's, to skip looking them up for the summary).
+    Returns {employee_id: record_id} for the check-ins that were applied; employees missing
+    from the result had already checked in for that date.
+    """
+    if not check_ins:
+        return {}
+    now = timezone.now()
+    check_ins = [{'now': now, **c} for c in check_ins]
+
+    applied = {}
+    with transaction.atomic():
+        if _supports_single_statement_insert():
+            params = []
+            for check_in in check_ins:
+                params.extend(_row_params(check_in))
+            with connection.cursor() as cursor:
+                cursor.execute(_insert_sql(len(check_ins)), params)
+                applied = {employee_id: record_id for record_id, employee_id in cursor.fetchall()}
+            inserted = [c for c in check_ins if c['employee_id'] in applied]
+            # The raw INSERT sends no model signals, so the summary is incremented here
+            apply_record_changes(
+                [(None, _inserted_state(c)) for c in inserted],
+                {c['employee_id']: (c['department'], c['role']) for c in inserted if 'department' in c and 'role' in c},
+            )
+        for check_in in check_ins:
+            if check_in['employee_id'] in applied:
+                continue
+            record_id = _upsert_locked(check_in)  # save() signals keep the summary current
+            if record_id:
+                applied[check_in['employee_id']] = record_id
+    return applied
+
+
+def _upsert_locked(check_in):
+    """
+    Fill an existing row under a row lock: takeovers of absent/leave placeholders on every
+    backend, and all check-ins on backends without ON CONFLICT ... RETURNING (e.g. MySQL).
+    A takeover is several statements (lock, update, summary deltas) in the caller's transaction;
+    save() is used so the signals can move the placeholder's summary contribution.
+    """
+    for _ in range(2):
+        record = AttendanceRecord.objects.select_for_update().filter(
+            employee_id=check_in['employee_id'], date=check_in['date']
+        ).first()
+        if record:
+            if record.check_in_time:
+                return None
+            record.check_in_time = check_in['check_in_time']
+            record.type = check_in['type']
+            record.status = check_in['status']
+            record.office_id = check_in.get('office_id')
+            record.check_in_location = check_in.get('location')
+            record.check_in_photo = check_in.get('photo')
+            record.save(update_fields=UPDATE_FIELDS)
+            return record.id
+        try:
+            with transaction.atomic():
+                return AttendanceRecord.objects.create(
+                    employee_id=check_in['employee_id'],
+                    date=check_in['date'],
+                    check_in_time=check_in['check_in_time'],
+                    type=check_in['type'],
+                    status=check_in['status'],
+                    office_id=check_in.get('office_id'),
+                    check_in_location=check_in.get('location'),
+                    check_in_photo=check_in.get('photo'),
+                ).id
+        except IntegrityError:
+            continue  # Lost the insert race; lock the winner's row and re-check
+    return None
+
+
+def upsert_check_in(**check_in):
+    """Single check-in; returns the record id, or None if already checked in today"""
+    return upsert_check_ins([check_in]).get(check_in['employee_id'])
@@ -0,0 +1,141 @@
+"""
+Payroll Export
+Attendance for a date range written as CSV/TSV rows while it is read: employees are walked in
+id chunks, each chunk's approved leave is expanded to days, and its records are streamed in
+(employee, date) order over the (employee, date, id) index. Leave days without a record get
+their own row, so memory depends on the chunk size, not on how many employees or days match.
+
+The header and first batch are read before the response is returned, so an early database error
+becomes the view's 500. A failure after that writes INCOMPLETE_ROW as the last line and aborts the
+transfer, so a cut-off file can never pass for a complete export.
+"""
+import csv
+import io
+import logging
+from datetime import timedelta
+from itertools import chain, groupby, islice
+
+from django.http import StreamingHttpResponse
+
+from .models import AttendanceRecord, EmployeeRequest
+
+
+EMPLOYEE_CHUNK_SIZE = 500
+RECORD_CHUNK_SIZE = 2000
+BATCH_SIZE = 500  # Lines per chunk written to the client
+
+DIALECTS = {
+    'csv': (csv.excel, 'text/csv'),
+    'tsv': (csv.excel_tab, 'text/tab-separated-values'),
+}
+
+HEADER = [
+    'employee_id', 'username', 'name', 'department', 'primary_office', 'date', 'status', 'type',
+    'office_id', 'check_in_time', 'check_out_time', 'total_hours', 'is_half_day', 'leave_type', 'leave_period',
+]
+INCOMPLETE_ROW = ['EXPORT INCOMPLETE: an error interrupted this export after the rows above; discard the file and export again']
+
+logger = logging.getLogger(__name__)
+
+
+def _approved_leave(employee_ids, start, end):
+    """{employee_id: {date: (request_type, half_day_period)}} for approved leave in the range"""
+    days = {}
+    leaves = EmployeeRequest.objects.filter(
+        employee_id__in=employee_ids,
+        request_type__in=['full_day', 'half_day'],
+        status='approved',
+        start_date__lte=end,
+        end_date__gte=start,
+    ).values_list('employee_id', 'start_date', 'end_date', 'request_type', 'half_day_period')
+    for employee_id, leave_start, leave_end, request_type, period in leaves:
+        employee_days = days.setdefault(employee_id, {})
+        day = max(leave_start, start)
+        while day <= min(leave_end, end):
+            # A full-day leave wins over a half-day one on the same date
+            if employee_days.get(day, ('',))[0] != 'full_day':
+                employee_days[day] = (request_type, period or '')
+            day += timedelta(days=1)
+    return days
+
+
+def _leave_row(employee, day, leave):
+    return [*employee, day, 'leave', '', '', '', '', 0, leave[0] == 'half_day', *leave]
+
+
+def _employee_rows(employee, records, leave_days):
+    """One employee's rows in date order: their records, plus leave days that have no record"""
+    pending = sorted(leave_days)
+    i = 0
+    for record_date, record_status, record_type, office_id, check_in, check_out, hours, half_day in records:
+        while i < len(pending) and pending[i] < record_date:
+            yield _leave_row(employee, pending[i], leave_days[pending[i]])
+            i += 1
+        if i < len(pending) and pending[i] == record_date:
+            i += 1
+        leave_type, leave_period = leave_days.get(record_date, ('', ''))
+        yield [*employee, record_date, record_status, record_type, office_id or '', check_in or '', check_out or '',
+               hours, half_day or leave_type == 'half_day', leave_type, leave_period]
+    for day in pending[i:]:
+        yield _leave_row(employee, day, leave_days[day])
+
+
+def payroll_rows(employees, start, end):
+    """Export rows for the employees queryset between start and end (inclusive), header first"""
+    yield HEADER
+    employees = employees.order_by('id').values_list('id', 'username', 'name', 'department', 'primary_office')
+    last_id = 0
+    while True:
+        chunk = list(employees.filter(id__gt=last_id)[:EMPLOYEE_CHUNK_SIZE])
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        ids = [row[0] for row in chunk]
+        leave_days = _approved_leave(ids, start, end)
+        records = AttendanceRecord.objects.filter(
+            employee_id__in=ids, date__gte=start, date__lte=end
+        ).order_by('employee_id', 'date').values_list(
+            'employee_id', 'date', 'status', 'type', 'office_id', 'check_in_time', 'check_out_time',
+            'total_hours', 'is_half_day',
+        ).iterator(chunk_size=RECORD_CHUNK_SIZE)
+        by_employee = groupby(records, key=lambda row: row[0])
+        group_id, group_rows = next(by_employee, (None, ()))
+        for employee in chunk:
+            if group_id != employee[0]:
+                yield from _employee_rows(employee, (), leave_days.get(employee[0], {}))
+                continue
+            yield from _employee_rows(employee, (row[1:] for row in group_rows), leave_days.get(employee[0], {}))
+            group_id, group_rows = next(by_employee, (None, ()))
+
+
+def _encode(rows, dialect):
+    """Yield the rows as text, BATCH_SIZE lines per chunk written to the client"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, dialect=dialect)
+    try:
+        for batch in iter(lambda: list(islice(rows, BATCH_SIZE)), []):
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except Exception:
+        # The 200 status is already sent: mark the file, then break the transfer so clients see an error
+        logger.exception('Payroll export failed after the response started')
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(INCOMPLETE_ROW)
+        yield buffer.getvalue()
+        raise
+
+
+def payroll_export_response(employees, start, end, file_type='csv'):
+    """Streaming export response; errors while reading the first batch raise in the calling view"""
+    dialect, content_type = DIALECTS[file_type]
+    rows = payroll_rows(employees, start, end)
+    rows = chain(list(islice(rows, BATCH_SIZE)), rows)
+    response = StreamingHttpResponse(
+        _encode(rows, dialect),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="attendance_{start}_{end}.{file_type}"'
+    return response
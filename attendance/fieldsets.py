@@ -0,0 +1,75 @@
+"""
+Sparse Fieldsets
+List endpoints accept ?fields=a,b,c (only these keys) and/or ?exclude=a,b (all but these).
+Each endpoint declares its output keys with the model columns they read, so one selection
+drives both the query (.only(), select_related, annotations, prefetches) and the serializer.
+"""
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class Output:
+    """
+    One output key: the ORM paths it loads and how its value is computed.
+    value(obj, request) defaults to the attribute named like the key.
+    """
+
+    def __init__(self, *columns, value=None, annotate=None, prefetch=()):
+        self.columns = columns
+        self.value = value
+        self.annotate = annotate or {}
+        self.prefetch = prefetch
+
+    def render(self, key, obj, request):
+        if self.value is None:
+            return getattr(obj, key)
+        return self.value(obj, request)
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+class FieldSet:
+    def __init__(self, outputs, always=('id',)):
+        self.outputs = outputs
+        self.always = always  # Columns every query needs (ordering, pagination keys)
+
+    def select(self, request):
+        """Output keys chosen by the request's fields=/exclude=, in declaration order"""
+        fields = _split(request.GET.get('fields'))
+        exclude = _split(request.GET.get('exclude'))
+        unknown = (set(fields) | set(exclude)) - set(self.outputs)
+        if unknown:
+            raise InvalidFields(
+                f"Unknown field(s): {', '.join(sorted(unknown))}. Available: {', '.join(self.outputs)}"
+            )
+        return [key for key in self.outputs if (not fields or key in fields) and key not in exclude]
+
+    def apply(self, queryset, keys):
+        """Load only the columns, joins, annotations and prefetches the selected keys read"""
+        columns = set(self.always)
+        annotations = {}
+        prefetch = []
+        for key in keys:
+            output = self.outputs[key]
+            columns.update(output.columns)
+            annotations.update(output.annotate)
+            prefetch.extend(p for p in output.prefetch if p not in prefetch)
+
+        related = sorted({column.split('__')[0] for column in columns if '__' in column})
+        columns.update(related)  # A deferred relation cannot be followed by select_related
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        queryset = queryset.only(*columns)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def serialize(self, obj, keys, request=None):
+        return {key: self.outputs[key].render(key, obj, request) for key in keys}
@@ -0,0 +1,281 @@
+"""
+Office Geofence Index
+In-memory spatial index over active office locations.
+Offices are stored as unit-sphere (x, y, z) vectors in a KD-tree so that
+"nearest office" and "offices within radius" are answered in O(log n);
+exact distances use NumPy-vectorized haversine.
+"""
+import threading
+import time
+
+import numpy as np
+
+from .models import OfficeLocation
+
+
+EARTH_RADIUS_M = 6371000.0
+INDEX_TTL_SECONDS = 300  # Safety net for workers that did not see the save signal
+MAX_GPS_ACCURACY_M = 200.0  # Largest reported GPS error credited towards a geofence (the old client-side limit)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Vectorized haversine distance in meters (inputs in degrees, broadcastable)"""
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lng1 = np.radians(np.asarray(lng1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lng2 = np.radians(np.asarray(lng2, dtype=np.float64))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def accuracy_tolerance(accuracy):
+    """Meters of reported GPS error to allow on top of a geofence radius, capped at MAX_GPS_ACCURACY_M"""
+    try:
+        accuracy = float(accuracy or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    if not accuracy > 0:  # Also rejects NaN
+        return 0.0
+    return min(accuracy, MAX_GPS_ACCURACY_M)
+
+
+def to_unit_xyz(lat, lng):
+    """Convert degrees to unit-sphere cartesian coordinates, shape (..., 3)"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def _chord_for_distance(meters):
+    """Straight-line unit-sphere distance equivalent to a great-circle distance"""
+    angle = min(float(meters) / EARTH_RADIUS_M, np.pi)
+    return 2.0 * np.sin(angle / 2.0)
+
+
+class OfficeIndex:
+    """KD-tree over office coordinates with per-office geofence radii."""
+
+    def __init__(self, offices):
+        offices = list(offices)
+        self.ids = [o['id'] for o in offices]
+        self.names = [o['name'] for o in offices]
+        self.lat = np.array([o['latitude'] for o in offices], dtype=np.float64)
+        self.lng = np.array([o['longitude'] for o in offices], dtype=np.float64)
+        self.radius = np.array([o['radius_meters'] for o in offices], dtype=np.float64)
+        self.xyz = to_unit_xyz(self.lat, self.lng).reshape(-1, 3)
+        self.max_radius = float(self.radius.max()) if offices else 0.0
+        self._position = {office_id: i for i, office_id in enumerate(self.ids)}
+
+        # Flat node arrays: point index, split axis, left child, right child (-1 = none)
+        self._point = []
+        self._axis = []
+        self._left = []
+        self._right = []
+        self._root = self._build(np.arange(len(self.ids)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build(self, indices):
+        if len(indices) == 0:
+            return -1
+        points = self.xyz[indices]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        order = indices[np.argsort(points[:, axis], kind='stable')]
+        mid = len(order) // 2
+
+        node = len(self._point)
+        self._point.append(int(order[mid]))
+        self._axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._left[node] = self._build(order[:mid])
+        self._right[node] = self._build(order[mid + 1:])
+        return node
+
+    def _nearest_node(self, q):
+        best_i, best_d2 = -1, np.inf
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            i = self._point[node]
+            d2 = float(np.sum((self.xyz[i] - q) ** 2))
+            if d2 < best_d2:
+                best_i, best_d2 = i, d2
+            diff = q[self._axis[node]] - self.xyz[i][self._axis[node]]
+            near, far = (self._left[node], self._right[node]) if diff < 0 else (self._right[node], self._left[node])
+            # Visit the far side only if the splitting plane is closer than the best match
+            if diff * diff < best_d2:
+                stack.append(far)
+            stack.append(near)
+        return best_i
+
+    def _ball(self, q, chord):
+        found = []
+        chord2 = chord * chord
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            i = self._point[node]
+            if float(np.sum((self.xyz[i] - q) ** 2)) <= chord2:
+                found.append(i)
+            diff = q[self._axis[node]] - self.xyz[i][self._axis[node]]
+            if diff <= chord:
+                stack.append(self._left[node])
+            if diff >= -chord:
+                stack.append(self._right[node])
+        return found
+
+    def nearest(self, lat, lng):
+        """Return (office_id, distance_m, in_range) for the closest active office, or None"""
+        if not self.ids:
+            return None
+        i = self._nearest_node(to_unit_xyz(lat, lng))
+        distance = float(haversine_m(lat, lng, self.lat[i], self.lng[i]))
+        return self.ids[i], distance, distance <= self.radius[i]
+
+    def within(self, lat, lng, radius_m=None, tolerance_m=0.0):
+        """
+        Offices around a point, closest first, as [(office_id, distance_m)].
+        With radius_m=None each office's own geofence radius is used, widened by tolerance_m.
+        """
+        if not self.ids:
+            return []
+        search = (self.max_radius if radius_m is None else radius_m) + tolerance_m
+        candidates = np.array(self._ball(to_unit_xyz(lat, lng), _chord_for_distance(search)), dtype=np.intp)
+        if len(candidates) == 0:
+            return []
+        distances = haversine_m(lat, lng, self.lat[candidates], self.lng[candidates])
+        limits = self.radius[candidates] if radius_m is None else np.full(len(candidates), float(radius_m))
+        keep = distances <= limits + tolerance_m
+        hits = sorted(zip(distances[keep].tolist(), candidates[keep].tolist()))
+        return [(self.ids[i], d) for d, i in hits]
+
+    def distance_to(self, office_id, lat, lng, tolerance_m=0.0):
+        """Return (distance_m, in_range) to a specific office, or None if it is not indexed"""
+        i = self._position.get(office_id)
+        if i is None:
+            return None
+        distance = float(haversine_m(lat, lng, self.lat[i], self.lng[i]))
+        return distance, distance - tolerance_m <= self.radius[i]
+
+    def office(self, office_id):
+        """Indexed coordinates for an office, or None"""
+        i = self._position.get(office_id)
+        if i is None:
+            return None
+        return {
+            'id': office_id,
+            'name': self.names[i],
+            'latitude': float(self.lat[i]),
+            'longitude': float(self.lng[i]),
+            'radius_meters': int(self.radius[i]),
+        }
+
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def build_office_index():
+    """Load active offices (one query) and build a fresh index"""
+    offices = OfficeLocation.objects.filter(
+        is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).values('id', 'name', 'latitude', 'longitude', 'radius_meters')
+    return OfficeIndex({
+        'id': o['id'],
+        'name': o['name'],
+        'latitude': float(o['latitude']),
+        'longitude': float(o['longitude']),
+        'radius_meters': o['radius_meters'],
+    } for o in offices)
+
+
+def get_office_index():
+    """Return the cached office index, rebuilding it when invalidated or stale"""
+    global _index, _index_built_at
+    index = _index
+    if index is None or time.monotonic() - _index_built_at > INDEX_TTL_SECONDS:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index_built_at > INDEX_TTL_SECONDS:
+                _index = build_office_index()
+                _index_built_at = time.monotonic()
+            index = _index
+    return index
+
+
+def invalidate_office_index():
+    """Drop the cached index; the next lookup rebuilds it"""
+    global _index
+    _index = None
+
+
+def evaluate_points(index, lats, lngs, chunk_size=4096):
+    """
+    Evaluate many points against every office geofence at once.
+    Returns (office_idx, distance_m) arrays: the index of the nearest office whose
+    geofence contains each point (-1 when outside all) and that point's distance
+    to its nearest office. Work is chunked to bound the points x offices matrix.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    inside = np.full(len(lats), -1, dtype=np.intp)
+    nearest_distance = np.full(len(lats), np.inf)
+    if not len(index) or not len(lats):
+        return inside, nearest_distance
+
+    for start in range(0, len(lats), chunk_size):
+        stop = start + chunk_size
+        distances = haversine_m(
+            lats[start:stop, None], lngs[start:stop, None],
+            index.lat[None, :], index.lng[None, :],
+        )
+        nearest_distance[start:stop] = distances.min(axis=1)
+        # Mask out-of-range offices, then pick the closest remaining one per point
+        masked = np.where(distances <= index.radius[None, :], distances, np.inf)
+        closest = masked.argmin(axis=1)
+        hit = np.isfinite(masked[np.arange(len(closest)), closest])
+        inside[start:stop] = np.where(hit, closest, -1)
+
+    return inside, nearest_distance
+
+
+def geofence_transitions(index, inside, timestamps=None):
+    """
+    Enter/exit events along a trace, given per-point containment from evaluate_points.
+    Points are walked in timestamp order (input order when timestamps is None).
+    """
+    order = np.argsort(np.asarray(timestamps, dtype=np.float64), kind='stable') \
+        if timestamps is not None else np.arange(len(inside))
+    ordered = inside[order]
+    if not len(ordered):
+        return []
+
+    # Positions where the containing office differs from the previous point
+    changes = np.flatnonzero(ordered[1:] != ordered[:-1]) + 1
+    events = []
+    if ordered[0] >= 0:
+        events.append(('enter', int(ordered[0]), int(order[0])))
+    for pos in changes.tolist():
+        previous, current = int(ordered[pos - 1]), int(ordered[pos])
+        if previous >= 0:
+            events.append(('exit', previous, int(order[pos])))
+        if current >= 0:
+            events.append(('enter', current, int(order[pos])))
+
+    return [{
+        'event': event,
+        'office_id': index.ids[office],
+        'point_index': point,
+        'timestamp': None if timestamps is None else timestamps[point],
+    } for event, office, point in events]
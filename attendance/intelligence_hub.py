@@ -4,8 +4,10 @@ Provides forecasting, trend analysis, and personnel insights
 """
 
 from datetime import datetime, timedelta
-from django.db.models import Count, Q
-from .models import AttendanceRecord, Employee
+from django.db.models import Count, F, Q, Sum
+from .models import AttendanceRecord, DailyAttendanceSummary, Employee
+from .rollups import daily_present_counts
+from .assignments import effective_assignments, get_assignment_map
 import statistics
 import json
 import os
@@ -41,15 +43,8 @@ def calculate_daily_attendance_rates(days=30):
     if total_employees == 0:
         return [0] * days
     
-    # Get all attendance counts in one query
-    daily_counts = AttendanceRecord.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date,
-        status__in=['present', 'wfh', 'client']
-    ).values('date').annotate(count=Count('id')).order_by('date')
-    
-    # Map results to a dictionary
-    counts_map = {item['date']: item['count'] for item in daily_counts}
+    # Daily counts from the rollup table
+    counts_map = daily_present_counts(start_date, end_date)
     
     daily_data = []
     current_date = end_date
@@ -175,9 +170,9 @@ def train_forecast_model():
     add_log(f"System identified {all_employees_count} active employees.")
     add_log("Analyzing historical attendance records...")
         
-    daily_counts = AttendanceRecord.objects.filter(
-        status__in=['present', 'wfh', 'client']
-    ).values('date').annotate(count=Count('id')).order_by('date')
+    daily_counts = [
+        {'date': day, 'count': count} for day, count in daily_present_counts().items() if count
+    ]
     
     if not daily_counts:
         add_log("ERROR: Database is empty or no valid attendance records found.")
@@ -282,12 +277,7 @@ def get_trend_data(days=30):
     total_employees = Employee.objects.filter(role='employee').count()
     
     # Get counts for all days in range (including weekends)
-    daily_counts = AttendanceRecord.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date,
-        status__in=['present', 'wfh', 'client']
-    ).values('date').annotate(count=Count('id'))
-    counts_map = {item['date']: item['count'] for item in daily_counts}
+    counts_map = daily_present_counts(start_date, end_date)
     
     trend_data = []
     
@@ -382,13 +372,40 @@ def search_personnel(query=None, department=None, min_attendance=None, max_atten
     return results
 
 
-def get_company_overview(days=30):
+def iter_employee_stats(start_date, end_date, total_working_days):
+    """Per-employee attendance counts for the overview, best attendance first, read in chunks"""
+    in_range = Q(attendance_records__date__gte=start_date, attendance_records__date__lte=end_date)
+    employees = Employee.objects.filter(role='employee').annotate(
+        present_days=Count('attendance_records', filter=in_range & Q(attendance_records__status__in=['present', 'wfh', 'client'])),
+        absent_days=Count('attendance_records', filter=in_range & Q(attendance_records__status='absent')),
+        leave_days=Count('attendance_records', filter=in_range & Q(attendance_records__status='leave')),
+        wfh_days=Count('attendance_records', filter=in_range & Q(attendance_records__type='wfh')),
+    ).order_by('-present_days', 'id').values(
+        'id', 'name', 'department', 'present_days', 'absent_days', 'leave_days', 'wfh_days'
+    )
+
+    for emp in employees.iterator(chunk_size=2000):
+        attendance_rate = (emp['present_days'] / total_working_days * 100) if total_working_days > 0 else 0
+        yield {
+            'id': emp['id'],
+            'name': emp['name'],
+            'department': emp['department'],
+            'attendance_rate': round(attendance_rate, 1),
+            'present_days': emp['present_days'],
+            'absent_days': emp['absent_days'],
+            'leave_days': emp['leave_days'],
+            'wfh_days': emp['wfh_days'],
+            'total_days': total_working_days
+        }
+
+
+def get_company_overview(days=30, stream_employees=False):
     """
     Get comprehensive company-wide attendance analytics (OPTIMIZED)
     Returns: {
         summary: overall stats,
         departments: department-wise breakdown,
-        employees: individual employee data,
+        employees: individual employee data (a generator when stream_employees is set),
         trends: daily trends
     }
     """
@@ -416,14 +433,15 @@ def get_company_overview(days=30):
     # Use aggregate queries instead of individual counts
     from django.db.models import Sum, Case, When, IntegerField
     
-    attendance_stats = AttendanceRecord.objects.filter(
+    summary_rows = DailyAttendanceSummary.objects.filter(
         date__gte=start_date,
         date__lte=end_date
-    ).aggregate(
-        total_present=Count('id', filter=Q(status__in=['present', 'wfh', 'client'])),
-        total_absent=Count('id', filter=Q(status='absent')),
-        total_leave=Count('id', filter=Q(status='leave')),
-        total_half_day=Count('id', filter=Q(is_half_day=True))
+    )
+    attendance_stats = summary_rows.aggregate(
+        total_present=Sum(F('present') + F('wfh') + F('client')),
+        total_absent=Sum('absent'),
+        total_leave=Sum('leave'),
+        total_half_day=Sum('half_day_marked')
     )
     
     # Get forecast for accuracy
@@ -436,26 +454,40 @@ def get_company_overview(days=30):
     
     overall_attendance_rate = (total_present / total_possible_attendance * 100) if total_possible_attendance > 0 else 0
     
-    # Department-wise breakdown using bulk query
-    departments = all_employees.values_list('department', flat=True).distinct()
+    # Department-wise breakdown by effective department: headcount as of today, and rollup
+    # totals with the present days of temporarily tagged employees moved to the tagged department
+    assignment_map = get_assignment_map()
+    dept_counts = {}
+    for assignment in effective_assignments(all_employees.values_list('id', 'department', 'role'), end_date).values():
+        dept_counts[assignment['department']] = dept_counts.get(assignment['department'], 0) + 1
+    dept_counts = dict(sorted(dept_counts.items(), key=lambda item: item[0] or ''))
+    dept_present_map = dict(summary_rows.filter(role='employee').values_list('department').annotate(
+        count=Sum(F('present') + F('wfh') + F('client'))
+    ))
+    tagged = assignment_map.tagged_employees(start_date, end_date)
+    if tagged:
+        tagged_present = AttendanceRecord.objects.filter(
+            employee_id__in=tagged,
+            employee__role='employee',
+            date__gte=start_date,
+            date__lte=end_date,
+            status__in=['present', 'wfh', 'client'],
+        ).values_list('employee_id', 'date', 'employee__department')
+        for employee_id, day, department in tagged_present:
+            tag = assignment_map.tag_for(employee_id, day)
+            if tag and tag[0] != department:
+                dept_present_map[department] = (dept_present_map.get(department) or 0) - 1
+                dept_present_map[tag[0]] = (dept_present_map.get(tag[0]) or 0) + 1
     department_stats = []
     
     best_dept = 'N/A'
     best_rate = 0
     
-    for dept in departments:
+    for dept, dept_count in dept_counts.items():
         if not dept:
             continue
         
-        dept_count = all_employees.filter(department=dept).count()
-        
-        dept_present = AttendanceRecord.objects.filter(
-            employee__department=dept,
-            employee__role='employee',
-            date__gte=start_date,
-            date__lte=end_date,
-            status__in=['present', 'wfh', 'client']
-        ).count()
+        dept_present = dept_present_map.get(dept) or 0
         
         dept_possible = dept_count * total_working_days
         dept_rate = (dept_present / dept_possible * 100) if dept_possible > 0 else 0
@@ -471,58 +503,10 @@ def get_company_overview(days=30):
     # Sort departments by attendance rate
     department_stats.sort(key=lambda x: x['attendance_rate'], reverse=True)
     
-    # Employee-level data using optimized query with prefetch
-    employee_data = []
-    
-    # Get all attendance records in bulk
-    attendance_records = AttendanceRecord.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date,
-        employee__role='employee'
-    ).values('employee_id', 'status', 'type', 'is_half_day')
-    
-    # Create a dictionary to store employee stats
-    emp_stats = {}
-    for record in attendance_records:
-        emp_id = record['employee_id']
-        if emp_id not in emp_stats:
-            emp_stats[emp_id] = {
-                'present': 0,
-                'absent': 0,
-                'leave': 0,
-                'wfh': 0
-            }
-        
-        if record['status'] in ['present', 'wfh', 'client']:
-            emp_stats[emp_id]['present'] += 1
-        elif record['status'] == 'absent':
-            emp_stats[emp_id]['absent'] += 1
-        elif record['status'] == 'leave':
-            emp_stats[emp_id]['leave'] += 1
-        
-        if record['type'] == 'wfh':
-            emp_stats[emp_id]['wfh'] += 1
-    
-    # Build employee data list
-    for emp in all_employees:
-        stats = emp_stats.get(emp.id, {'present': 0, 'absent': 0, 'leave': 0, 'wfh': 0})
-        
-        attendance_rate = (stats['present'] / total_working_days * 100) if total_working_days > 0 else 0
-        
-        employee_data.append({
-            'id': emp.id,
-            'name': emp.name,
-            'department': emp.department,
-            'attendance_rate': round(attendance_rate, 1),
-            'present_days': stats['present'],
-            'absent_days': stats['absent'],
-            'leave_days': stats['leave'],
-            'wfh_days': stats['wfh'],
-            'total_days': total_working_days
-        })
-    
-    # Sort employees by attendance rate
-    employee_data.sort(key=lambda x: x['attendance_rate'], reverse=True)
+    # Employee-level data: one aggregate query, ordered by the database
+    employee_data = iter_employee_stats(start_date, end_date, total_working_days)
+    if not stream_employees:
+        employee_data = list(employee_data)
     
     # Get trend data (already optimized)
     trend_data = get_trend_data(days)
@@ -567,17 +551,16 @@ def get_company_overview(days=30):
     peak_day = days_of_week[peak_day_idx]
     
     # NEW: Late Arrival Trend (Check-ins after 9:30 AM)
-    late_time = datetime.strptime('09:30:00', '%H:%M:%S').time()
-    all_recent_checkins = AttendanceRecord.objects.filter(
-        date__gte=start_date,
-        check_in_time__isnull=False
+    checkin_stats = DailyAttendanceSummary.objects.filter(date__gte=start_date).aggregate(
+        total=Sum('check_ins'),
+        late=Sum('late_check_ins')
     )
-    total_checkins = all_recent_checkins.count()
-    late_checkins = all_recent_checkins.filter(check_in_time__gt=late_time).count()
+    total_checkins = checkin_stats['total'] or 0
+    late_checkins = checkin_stats['late'] or 0
     late_rate = round((late_checkins / total_checkins * 100), 1) if total_checkins > 0 else 0
     
     # NEW: Corporate WFH Ratio
-    total_wfh = sum(e['wfh_days'] for e in employee_data)
+    total_wfh = summary_rows.filter(role='employee').aggregate(wfh=Sum('type_wfh'))['wfh'] or 0
     wfh_ratio = round((total_wfh / total_present * 100), 1) if total_present > 0 else 0
     
     # NEW: At-Risk Departments (Below 60% average)
@@ -0,0 +1,181 @@
+"""
+Interval Lookups
+Date ranges of EmployeeRequest and TemporaryTag rows, kept in memory per employee as start-sorted
+lists with a running maximum of end dates, so "which ranges cover day D / overlap [A, B]" is a
+bisect plus a short backwards walk instead of a start_date/end_date scan.
+An employee's intervals are loaded on first use (a department is loaded with one query) and
+dropped when one of their rows is saved or deleted. Other workers drop their copies when the
+table's shared version changes (see cache_versions), which every lookup checks first.
+"""
+import threading
+import time
+from bisect import bisect_right
+
+from django.db import transaction
+
+from .cache_versions import SharedVersion
+from .models import Employee, EmployeeRequest, TemporaryTag
+
+
+INDEX_TTL_SECONDS = 300  # Safety net for queryset updates that skipped invalidate()
+
+
+class EmployeeIntervals:
+    """One employee's rows (dicts with start_date/end_date), sorted by start date"""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: (row['start_date'], row['id']))
+        self.starts = [row['start_date'] for row in self.rows]
+        self.max_ends = []  # max_ends[i]: latest end date among rows[:i + 1]
+        for row in self.rows:
+            self.max_ends.append(max(row['end_date'], self.max_ends[-1]) if self.max_ends else row['end_date'])
+        self.loaded_at = time.monotonic()
+
+    def overlapping(self, start, end):
+        """Rows whose range intersects [start, end], in start date order"""
+        found = []
+        i = bisect_right(self.starts, end) - 1  # Rows after i start too late
+        while i >= 0 and self.max_ends[i] >= start:  # Rows up to i all end too early
+            if self.rows[i]['end_date'] >= start:
+                found.append(self.rows[i])
+            i -= 1
+        found.reverse()
+        return found
+
+    def covering(self, day):
+        return self.overlapping(day, day)
+
+
+class IntervalIndex:
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = ['id', 'employee_id', 'start_date', 'end_date', *fields]
+        self.version = SharedVersion(model._meta.db_table)
+        self._version = None  # Shared version the cached intervals were loaded under
+        self._employees = {}
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        """Drop the cache if another worker committed a change since it was loaded"""
+        version = self.version.current()
+        if version != self._version:
+            with self._lock:
+                self._employees.clear()
+                self._version = version
+        return version
+
+    def _fresh(self, employee_id):
+        intervals = self._employees.get(employee_id)
+        if intervals is not None and time.monotonic() - intervals.loaded_at <= INDEX_TTL_SECONDS:
+            return intervals
+        return None
+
+    def _load(self, employee_ids, version):
+        """Load the given employees' intervals with one query"""
+        grouped = {employee_id: [] for employee_id in employee_ids}
+        for row in self.model.objects.filter(employee_id__in=employee_ids).values(*self.fields):
+            grouped[row['employee_id']].append(row)
+        loaded = {employee_id: EmployeeIntervals(rows) for employee_id, rows in grouped.items()}
+        with self._lock:
+            if version == self._version:  # Rows read before a newer bump are not cached
+                self._employees.update(loaded)
+        return loaded
+
+    def employee(self, employee_id):
+        employee_id = int(employee_id)
+        version = self._sync()
+        intervals = self._fresh(employee_id)
+        if intervals is None:
+            intervals = self._load([employee_id], version)[employee_id]
+        return intervals
+
+    def covering(self, employee_id, day):
+        """An employee's rows whose range contains day"""
+        return self.employee(employee_id).covering(day)
+
+    def overlapping(self, employee_id, start, end):
+        """An employee's rows whose range intersects [start, end]"""
+        return self.employee(employee_id).overlapping(start, end)
+
+    def preload(self, employee_ids):
+        """{employee_id: EmployeeIntervals}, loading every employee not cached with one query"""
+        version = self._sync()
+        intervals = {employee_id: self._fresh(employee_id) for employee_id in employee_ids}
+        missing = [employee_id for employee_id, cached in intervals.items() if cached is None]
+        if missing:
+            intervals.update(self._load(missing, version))
+        return intervals
+
+    def department_overlapping(self, department, start, end):
+        """{employee_id: rows} for every employee of a department with rows intersecting [start, end]"""
+        employee_ids = department_members(department)
+        intervals = self.preload(employee_ids)
+        found = {}
+        for employee_id in employee_ids:
+            rows = intervals[employee_id].overlapping(start, end)
+            if rows:
+                found[employee_id] = rows
+        return found
+
+    def department_covering(self, department, day):
+        return self.department_overlapping(department, day, day)
+
+    def invalidate(self, employee_ids=None):
+        """
+        Drop cached intervals (all of them when employee_ids is None) once the transaction commits,
+        and bump the shared version so other workers drop theirs.
+        """
+        def drop():
+            with self._lock:
+                if employee_ids is None:
+                    self._employees.clear()
+                else:
+                    for employee_id in employee_ids:
+                        self._employees.pop(employee_id, None)
+        transaction.on_commit(drop)
+        self.version.bump()
+
+
+request_intervals = IntervalIndex(EmployeeRequest, ['request_type', 'status', 'half_day_period'])
+tag_intervals = IntervalIndex(TemporaryTag, ['department', 'role'])
+
+
+_departments = None
+_departments_loaded_at = 0.0
+_departments_version = None
+_departments_lock = threading.Lock()
+departments_version = SharedVersion('employee_departments')
+
+
+def _departments_stale(version):
+    return (
+        _departments is None
+        or _departments_version != version
+        or time.monotonic() - _departments_loaded_at > INDEX_TTL_SECONDS
+    )
+
+
+def department_members(department):
+    """Ids of the employees in a department, from a cached department -> ids map"""
+    global _departments, _departments_loaded_at, _departments_version
+    version = departments_version.current()
+    departments = _departments
+    if _departments_stale(version):
+        with _departments_lock:
+            if _departments_stale(version):
+                members = {}
+                for employee_id, employee_department in Employee.objects.values_list('id', 'department'):
+                    members.setdefault(employee_department, []).append(employee_id)
+                _departments = members
+                _departments_loaded_at = time.monotonic()
+                _departments_version = version
+            departments = _departments
+    return departments.get(department, [])
+
+
+def invalidate_departments():
+    def drop():
+        global _departments
+        _departments = None
+    transaction.on_commit(drop)
+    departments_version.bump()
@@ -0,0 +1,68 @@
+"""
+Scheduled Jobs
+Periodic work that used to run on request threads. Registered with the scheduler on import;
+run by `manage.py run_scheduler`. Times are local (settings.TIME_ZONE).
+"""
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from .models import TrainingLog
+from .scheduler import JOBS, job, last_success
+
+
+MAX_CATCH_UP_DAYS = 31  # Days of absentee marking made up after the scheduler was down
+
+
+@job('mark_absentees', '0 18 * * *', catch_up=True)
+def mark_absentees(stdout):
+    """Create absent records for every day whose 18:00 slot has passed since the last successful run"""
+    trigger = JOBS['mark_absentees'].trigger
+    latest = trigger.previous(timezone.now())
+    if latest is None:
+        return
+    end = timezone.localtime(latest).date()
+    start = end
+    previous = last_success(JOBS['mark_absentees'])
+    if previous is not None:
+        done = trigger.previous(previous.started_at)
+        if done is not None:
+            start = max(timezone.localtime(done).date() + timedelta(days=1), end - timedelta(days=MAX_CATCH_UP_DAYS))
+    if start > end:
+        stdout.write(f"Absentees already marked up to {end}\n")
+        return
+    call_command('auto_mark_absent', from_date=start.isoformat(), to_date=end.isoformat(), stdout=stdout)
+
+
+@job('refresh_rollups', '30 0 * * *')
+def refresh_rollups(stdout):
+    """Recompute the last week of daily attendance summaries (catches raw SQL edits and imports)"""
+    call_command('rebuild_rollups', since=7, workers=1, stdout=stdout)
+
+
+@job('detect_client_visits', '15 0 * * *')
+def detect_client_visits(stdout):
+    """Cluster yesterday's GPS trails into client visits"""
+    call_command('detect_client_visits', stdout=stdout)
+
+
+@job('train_forecast', '0 2 * * 0', lease_seconds=3 * 3600)
+def train_forecast(stdout):
+    """Retrain the intelligence hub forecast model on the full history"""
+    from .intelligence_hub import train_forecast_model
+
+    result = train_forecast_model()
+    if not result['success']:
+        raise RuntimeError(result['message'])
+
+    summary = result['summary']
+    TrainingLog.objects.create(
+        trained_by=None,
+        data_points=summary.get('data_points', 0),
+        average_rate=summary.get('average_rate', 0.0),
+        stability_factor=summary.get('stability_factor', 0.0),
+        logs=result.get('logs', []),
+        summary=summary
+    )
+    stdout.write(f"Trained on {summary.get('data_points', 0)} data points\n")
@@ -1,44 +1,132 @@
-from django.core.management.base import BaseCommand
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, DateField, DateTimeField, Exists, OuterRef, Q, Value
+from django.db.models.constants import OnConflict
 from django.utils import timezone
-from datetime import datetime
-from attendance.models import Employee, AttendanceRecord
+
+from attendance.models import AttendanceRecord, Employee, EmployeeRequest
+from attendance.rollups import SummaryDelta, record_counts
+
+
+# Columns of an absent placeholder besides employee and date
+ABSENT_ROW = {
+    'status': 'absent',
+    'type': 'office',  # default type for absent
+    'total_hours': 0,
+    'is_half_day': False,
+}
+
 
 class Command(BaseCommand):
-    help = 'Automatically mark employees absent if they haven\'t checked in for the current day'
+    help = (
+        'Mark active employees absent on working days where they have no attendance record. '
+        'Weekends, days before the joining date and approved full-day leave are skipped.'
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument('--date', type=str, help='Target date in YYYY-MM-DD format')
+        parser.add_argument('--date', type=str, help='Target date in YYYY-MM-DD format (default: today)')
+        parser.add_argument('--from', dest='from_date', type=str, help='Range start in YYYY-MM-DD format')
+        parser.add_argument('--to', dest='to_date', type=str, help='Range end in YYYY-MM-DD format (inclusive)')
+        parser.add_argument('--include-weekends', action='store_true', help='Also mark Saturdays and Sundays')
+        parser.add_argument('--chunk-employees', type=int, default=500, help='Employees inserted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Count missing days without writing')
 
     def handle(self, *args, **options):
-        now = timezone.localtime(timezone.now())
-        
-        if options['date']:
-            target_date = datetime.strptime(options['date'], '%Y-%m-%d').date()
-        else:
-            # By default, mark for the current day. 
-            # If run at 12:01 AM on the 23rd, it marks for the 23rd.
-            target_date = now.date()
-        
-        self.stdout.write(f"Running auto-absent for date: {target_date}")
-        
-        # Get all active employees
-        active_employees = Employee.objects.filter(is_active=True)
-        
+        try:
+            if options['from_date'] or options['to_date']:
+                start = datetime.strptime(options['from_date'] or options['to_date'], '%Y-%m-%d').date()
+                end = datetime.strptime(options['to_date'] or options['from_date'], '%Y-%m-%d').date()
+            elif options['date']:
+                start = end = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            else:
+                # If run at 12:01 AM on the 23rd, it marks for the 23rd.
+                start = end = timezone.localtime(timezone.now()).date()
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+        if end < start:
+            raise CommandError('--to must not be before --from')
+
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        if not options['include_weekends']:
+            days = [d for d in days if d.weekday() < 5]
+        self.stdout.write(f"Running auto-absent from {start} to {end} ({len(days)} days)")
+        if not days:
+            return
+
+        started = time.monotonic()
+        employee_ids = list(Employee.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+        chunk = max(1, options['chunk_employees'])
         absent_count = 0
-        for employee in active_employees:
-            # Check if record already exists for this date
-            exists = AttendanceRecord.objects.filter(
-                employee=employee,
-                date=target_date
-            ).exists()
-            
-            if not exists:
-                AttendanceRecord.objects.create(
-                    employee=employee,
-                    date=target_date,
-                    status='absent',
-                    type='office' # default type for absent
-                )
-                absent_count += 1
-        
-        self.stdout.write(self.style.SUCCESS(f"Successfully marked {absent_count} employees as absent for {target_date}"))
+        for day in days:
+            for i in range(0, len(employee_ids), chunk):
+                missing = self._missing(employee_ids[i:i + chunk], day)
+                if options['dry_run']:
+                    absent_count += missing.count()
+                else:
+                    absent_count += self._mark_absent(missing, day)
+
+        elapsed = time.monotonic() - started
+        verb = 'Would mark' if options['dry_run'] else 'Successfully marked'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {absent_count} absent employee-days from {start} to {end} in {elapsed:.2f}s"
+        ))
+
+    def _missing(self, employee_ids, day):
+        """Employees of a chunk with no record and no approved full-day leave on day (anti-joins in SQL)"""
+        return Employee.objects.filter(
+            Q(profile__date_of_joining__isnull=True) | Q(profile__date_of_joining__lte=day),
+            id__in=employee_ids,
+        ).filter(
+            ~Exists(AttendanceRecord.objects.filter(employee=OuterRef('pk'), date=day)),
+            ~Exists(EmployeeRequest.objects.filter(
+                employee=OuterRef('pk'),
+                request_type='full_day',
+                status='approved',
+                start_date__lte=day,
+                end_date__gte=day,
+            )),
+        ).order_by()
+
+    def _mark_absent(self, missing, day):
+        """INSERT ... SELECT the absent rows for day and count them into the summary; returns rows inserted"""
+        now = timezone.now()
+        meta = AttendanceRecord._meta
+        constants = {
+            'date': Value(day, output_field=DateField()),
+            **{name: Value(value, output_field=meta.get_field(name)) for name, value in ABSENT_ROW.items()},
+            'created_at': Value(now, output_field=DateTimeField()),
+            'updated_at': Value(now, output_field=DateTimeField()),
+        }
+        select = missing.annotate(**{f'absent_{name}': value for name, value in constants.items()}).values_list(
+            'id', *[f'absent_{name}' for name in constants]
+        )
+        select_sql, params = select.query.sql_with_params()
+
+        qn = connection.ops.quote_name
+        fields = [meta.get_field(name) for name in ['employee', *constants]]
+        # Ignore conflicts: a check-in that lands meanwhile wins over the absent placeholder
+        on_conflict = connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)
+        sql = (
+            f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} {qn(meta.db_table)} "
+            f"({', '.join(qn(field.column) for field in fields)}) {select_sql} {on_conflict}"
+        )
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+            # Raw inserts send no signals: add the new rows to their summary slices only
+            inserted = AttendanceRecord.objects.filter(
+                date=day, created_at=now, status=ABSENT_ROW['status']
+            ).order_by().values('employee__department', 'employee__role').annotate(n=Count('id'))
+            counts = record_counts({**ABSENT_ROW, 'check_in_time': None})
+            delta = SummaryDelta()
+            total = 0
+            for row in inserted:
+                key = (day, row['employee__department'] or '', row['employee__role'] or '', '')
+                delta.add_counts(key, counts, row['n'])
+                total += row['n']
+            delta.apply()
+        return total
@@ -0,0 +1,82 @@
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.visits import (
+    DEFAULT_EPS_M, DEFAULT_MIN_DWELL_S, detect_visits, rebuild_visits,
+)
+
+
+class Command(BaseCommand):
+    help = 'Cluster stored GPS trails into dwell visits and rewrite the client_visits table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, help='Single date in YYYY-MM-DD format (default: yesterday)')
+        parser.add_argument('--from', dest='from_date', type=str, help='Range start in YYYY-MM-DD format')
+        parser.add_argument('--to', dest='to_date', type=str, help='Range end in YYYY-MM-DD format (inclusive)')
+        parser.add_argument('--employee', type=int, action='append', help='Limit to employee id (repeatable)')
+        parser.add_argument('--eps', type=float, default=DEFAULT_EPS_M, help='Cluster radius in meters')
+        parser.add_argument('--min-dwell', type=int, default=DEFAULT_MIN_DWELL_S // 60, help='Minimum visit length in minutes')
+        parser.add_argument('--benchmark', type=int, metavar='N',
+                            help='Time clustering on synthetic traces for N surveyors instead of touching the DB')
+
+    def handle(self, *args, **options):
+        params = {'eps_m': options['eps'], 'min_dwell_s': options['min_dwell'] * 60}
+
+        if options['benchmark']:
+            return self._benchmark(options['benchmark'], params)
+
+        try:
+            if options['from_date'] or options['to_date']:
+                start = datetime.strptime(options['from_date'] or options['to_date'], '%Y-%m-%d').date()
+                end = datetime.strptime(options['to_date'] or options['from_date'], '%Y-%m-%d').date()
+            elif options['date']:
+                start = end = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            else:
+                start = end = timezone.localtime(timezone.now()).date() - timedelta(days=1)
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+        if end < start:
+            raise CommandError('--to must not be before --from')
+
+        self.stdout.write(f"Detecting visits from {start} to {end}")
+        started = time.monotonic()
+        employee_days, visits = rebuild_visits(start, end, options['employee'], **params)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {visits} visits from {employee_days} employee-days in {elapsed:.2f}s"
+        ))
+
+    def _benchmark(self, surveyors, params):
+        """Synthetic day per surveyor: 1 point / 15s over 9h, with 6 stops of 20-60 min"""
+        rng = np.random.default_rng(42)
+        day_start = 1_700_000_000.0
+        traces = []
+        for _ in range(surveyors):
+            epoch = day_start + np.arange(0, 9 * 3600, 15, dtype=np.float64)
+            lat = np.empty(len(epoch))
+            lng = np.empty(len(epoch))
+            cursor = np.array([28.5 + rng.random() * 0.2, 77.1 + rng.random() * 0.2])
+            stop_starts = set(rng.choice(len(epoch) - 240, size=6, replace=False).tolist())
+            stopped_until = -1
+            for i in range(len(epoch)):
+                if i in stop_starts:
+                    stopped_until = i + int(rng.integers(80, 240))
+                if i > stopped_until:
+                    cursor = cursor + rng.normal(0, 0.0004, size=2)  # ~40m per step while moving
+                lat[i], lng[i] = cursor + rng.normal(0, 0.00005, size=2)  # ~5m GPS jitter
+            traces.append((lat, lng, epoch))
+
+        points = sum(len(t[0]) for t in traces)
+        started = time.monotonic()
+        visits = sum(len(detect_visits(lat, lng, epoch, **params)) for lat, lng, epoch in traces)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmark: {surveyors} surveyors, {points} points, {visits} visits in {elapsed:.2f}s "
+            f"({points / elapsed if elapsed else 0:,.0f} points/s)"
+        ))
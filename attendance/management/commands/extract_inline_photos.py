@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from attendance.models import AttendanceRecord
+from attendance.photo_store import PHOTO_DIR, REF_PREFIX, PhotoError, check_photo, is_photo_ref, store_photo
+
+PHOTO_FIELDS = ('check_in_photo', 'check_out_photo')
+
+
+class Command(BaseCommand):
+    help = 'Move legacy inline base64 check-in/check-out photos into the photo blob store (resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Rows per batch/transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many rows (0 = no limit)')
+        parser.add_argument('--checkpoint', type=str, help='Checkpoint file path')
+        parser.add_argument('--reset', action='store_true', help='Ignore the checkpoint and start from the first row')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Decode and verify every photo and report, without writing anything')
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        dry_run = options['dry_run']
+        checkpoint_path = options['checkpoint'] or os.path.join(
+            settings.MEDIA_ROOT, PHOTO_DIR, '.extract_checkpoint.json'
+        )
+
+        state = {'last_id': 0, 'rows': 0, 'photos': 0, 'failed': 0, 'changed': 0, 'bytes_reclaimed': 0}
+        if not options['reset'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                state.update(json.load(f))
+            self.stdout.write(f"Resuming after record id {state['last_id']}")
+
+        # Rows holding anything other than a blob reference (NULL/empty are skipped)
+        needs_extract = Q()
+        for field in PHOTO_FIELDS:
+            needs_extract |= (
+                Q(**{f'{field}__isnull': False})
+                & ~Q(**{field: ''})
+                & ~Q(**{f'{field}__startswith': REF_PREFIX})
+            )
+
+        started = time.monotonic()
+        run_rows = 0
+        run_bytes = 0
+
+        while True:
+            # Keyset cursor: each batch is an index range scan on the primary key
+            batch = list(
+                AttendanceRecord.objects
+                .filter(needs_extract, id__gt=state['last_id'])
+                .order_by('id')
+                .values_list('id', *PHOTO_FIELDS)[:chunk_size]
+            )
+            if not batch:
+                break
+
+            updates = []
+            for record_id, *values in batch:
+                for field, value in zip(PHOTO_FIELDS, values):
+                    if not value or is_photo_ref(value):
+                        continue
+                    try:
+                        # A dry run decodes and verifies the image too, so it reports the same failures
+                        ref = check_photo(value) if dry_run else store_photo(value)
+                    except PhotoError as e:
+                        state['failed'] += 1
+                        self.stderr.write(f"Record {record_id} {field}: {e}")
+                        continue
+                    updates.append((record_id, field, value, ref))
+
+            # Short per-batch transaction; only one photo column is written per statement, and only
+            # while it still holds the value read above, so a check-in/check-out that lands meanwhile wins
+            applied = updates
+            if updates and not dry_run:
+                applied = []
+                with transaction.atomic():
+                    for record_id, field, value, ref in updates:
+                        if AttendanceRecord.objects.filter(id=record_id, **{field: value}).update(**{field: ref}):
+                            applied.append((record_id, field, value, ref))
+                state['changed'] += len(updates) - len(applied)
+            for _, _, value, ref in applied:
+                state['photos'] += 1
+                saved = len(value) - len(ref)
+                state['bytes_reclaimed'] += saved
+                run_bytes += saved
+
+            state['last_id'] = batch[-1][0]
+            state['rows'] += len(batch)
+            run_rows += len(batch)
+
+            if not dry_run:
+                self._save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"  up to id {state['last_id']}: {run_rows} rows, "
+                f"{run_rows / elapsed if elapsed else 0:.1f} rows/s, "
+                f"{run_bytes / (1024 * 1024):.2f} MB reclaimed"
+            )
+
+            if options['limit'] and run_rows >= options['limit']:
+                self.stdout.write("Row limit reached; re-run to continue from the checkpoint")
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry run] ' if dry_run else ''}Processed {run_rows} rows in {elapsed:.1f}s "
+            f"({run_rows / elapsed if elapsed else 0:.1f} rows/s). "
+            f"Photos {'to extract' if dry_run else 'extracted'}: {state['photos']}, failed: {state['failed']}, "
+            f"changed meanwhile: {state['changed']}, "
+            f"reclaimed: {state['bytes_reclaimed'] / (1024 * 1024):.2f} MB total"
+        ))
+        if run_bytes and not dry_run and connection.vendor == 'sqlite':
+            self.stdout.write("Run VACUUM on the SQLite database to return the freed pages to the filesystem")
+
+    def _save_checkpoint(self, path, state):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
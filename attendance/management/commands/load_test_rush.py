@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import random
+import secrets
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, Employee, OfficeLocation
+from attendance.write_behind import get_write_behind_queue
+
+
+USERNAME_PREFIX = 'loadtest_'
+CURVES = ('uniform', 'peak', 'ramp')
+SESSION_HOURS = 9  # Check-ins are backdated this far before check-out, past the 4.5h minimum
+APPLY_WAIT_SECONDS = 5  # How long to wait for the write-behind queue to apply a check-in
+
+
+def arrival_offsets(count, duration, curve, rng):
+    """Sorted arrival times in seconds within [0, duration) following the named curve"""
+    if curve == 'uniform':
+        offsets = rng.uniform(0, duration, count)
+    elif curve == 'peak':
+        # Most people arrive around the middle of the window (the 9 AM spike)
+        offsets = np.clip(rng.normal(duration / 2, duration / 6, count), 0, duration)
+    else:
+        # Arrivals keep accelerating until the end of the window
+        offsets = rng.triangular(0, duration, duration, count)
+    return np.sort(offsets)
+
+
+class EndpointStats:
+    """Latency, status and query counters for one endpoint"""
+
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.statuses = defaultdict(int)
+        self.errors = 0
+        self.lock_errors = 0
+        self.first_started = None
+        self.last_finished = None
+        self._lock = threading.Lock()
+
+    def record(self, started, finished, status_code, queries, body):
+        with self._lock:
+            self._record(started, finished, status_code, queries, body)
+
+    def _record(self, started, finished, status_code, queries, body):
+        self.latencies.append(finished - started)
+        self.queries.append(queries)
+        self.statuses[str(status_code)] += 1
+        if status_code >= 500:
+            self.errors += 1
+        if 'database is locked' in body:
+            self.lock_errors += 1
+        self.first_started = started if self.first_started is None else min(self.first_started, started)
+        self.last_finished = finished if self.last_finished is None else max(self.last_finished, finished)
+
+    def summary(self):
+        if not self.latencies:
+            return {'requests': 0}
+        latencies = np.array(self.latencies) * 1000
+        elapsed = (self.last_finished - self.first_started) or 1e-9
+        return {
+            'requests': len(self.latencies),
+            'status_counts': dict(self.statuses),
+            'errors': self.errors,
+            'lock_errors': self.lock_errors,
+            'throughput_rps': round(len(self.latencies) / elapsed, 2),
+            'latency_ms': {
+                'mean': round(float(latencies.mean()), 2),
+                'p50': round(float(np.percentile(latencies, 50)), 2),
+                'p95': round(float(np.percentile(latencies, 95)), 2),
+                'p99': round(float(np.percentile(latencies, 99)), 2),
+                'max': round(float(latencies.max()), 2),
+            },
+            'queries': {
+                'mean': round(float(np.mean(self.queries)), 2),
+                'max': int(np.max(self.queries)),
+            },
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a morning-rush arrival curve of check-ins against the configured database and report '
+        'latency percentiles, throughput, lock errors and query counts per endpoint. '
+        'Uses loadtest_* employees (created when missing, with a random password per run) and resets their '
+        'attendance for today and yesterday; they are deactivated when the run ends, or deleted with --cleanup. '
+        'Refuses to run outside DEBUG or a test_* database unless --i-know-this-is-not-production is given. Check-ins of employees who also '
+        'check out are backdated (untimed) so check-out exercises the real write, not the minimum-hours rejection.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=500, help='Number of simulated employees')
+        parser.add_argument('--duration', type=float, default=60, help='Length of the arrival window in seconds')
+        parser.add_argument('--curve', choices=CURVES, default='peak', help='Shape of the arrival curve')
+        parser.add_argument('--concurrency', type=int, default=32, help='Maximum requests in flight')
+        parser.add_argument('--type', dest='att_type', choices=['office', 'wfh', 'client'], default='wfh',
+                            help='Attendance type sent with check-ins (office uses active office coordinates)')
+        parser.add_argument('--checkout-ratio', type=float, default=0.2,
+                            help='Fraction of employees who also call check-out after checking in')
+        parser.add_argument('--admin-pollers', type=int, default=2, help='Concurrent admin_summary pollers')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between admin_summary polls')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for arrivals')
+        parser.add_argument('--output', type=str, help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Delete the loadtest employees and their attendance when the run ends')
+        parser.add_argument('--i-know-this-is-not-production', dest='not_production', action='store_true',
+                            help='Run even though DEBUG is off and the database is not a test database')
+
+    def handle(self, *args, **options):
+        if options['employees'] < 1 or options['duration'] <= 0 or options['concurrency'] < 1:
+            raise CommandError('--employees, --duration and --concurrency must be positive')
+        if not (settings.DEBUG or self._is_test_database() or options['not_production']):
+            raise CommandError(
+                f"Refusing to load test {connection.vendor} database {str(connection.settings_dict['NAME'])!r} "
+                'with DEBUG off: it creates accounts and deletes attendance. '
+                'Pass --i-know-this-is-not-production if this database is disposable.'
+            )
+
+        employees = self._prepare_employees(options['employees'])
+        poller_id = employees[0]  # admin_summary shows non-managers the company-wide view
+        offices = []
+        if options['att_type'] == 'office':
+            offices = list(OfficeLocation.objects.filter(
+                is_active=True, latitude__isnull=False, longitude__isnull=False
+            ).values_list('id', 'latitude', 'longitude'))
+            if not offices:
+                raise CommandError('--type office needs at least one active office with coordinates')
+
+        rng = np.random.default_rng(options['seed'])
+        arrivals = arrival_offsets(len(employees), options['duration'], options['curve'], rng)
+        checkouts = set(rng.choice(employees, int(len(employees) * options['checkout_ratio']), replace=False).tolist())
+
+        self.stdout.write(
+            f"Replaying {len(employees)} check-ins over {options['duration']}s "
+            f"({options['curve']} curve, concurrency {options['concurrency']})"
+        )
+        stats = {name: EndpointStats() for name in ('mark_attendance', 'today_attendance', 'check_out', 'admin_summary')}
+        started_at = timezone.now()
+        started = time.perf_counter()
+        self.checkouts_skipped = 0
+        try:
+            asyncio.run(self._run(employees, arrivals, checkouts, offices, poller_id, stats, options))
+        finally:
+            self._release_employees(employees, options['cleanup'])
+        wall = time.perf_counter() - started
+
+        report = {
+            'run': {
+                'started_at': started_at.isoformat(),
+                'commit': self._git_commit(),
+                'db_vendor': connection.vendor,
+                'write_behind': bool(get_write_behind_queue()),
+                'employees': len(employees),
+                'duration_s': options['duration'],
+                'curve': options['curve'],
+                'concurrency': options['concurrency'],
+                'type': options['att_type'],
+                'checkout_ratio': options['checkout_ratio'],
+                'checkouts_skipped': self.checkouts_skipped,
+                'admin_pollers': options['admin_pollers'],
+                'wall_time_s': round(wall, 3),
+            },
+            'endpoints': {name: endpoint.summary() for name, endpoint in sorted(stats.items())},
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _prepare_employees(self, count):
+        """Ensure active loadtest employees exist and clear their attendance for today and yesterday"""
+        existing = dict(Employee.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).values_list('username', 'id'))
+        # A fresh unguessable password each run, so the accounts cannot be logged into while they are active
+        password = make_password(secrets.token_urlsafe(24))
+        missing = [
+            Employee(
+                username=f'{USERNAME_PREFIX}{i}',
+                password=password,
+                name=f'Load Test {i}',
+                email=f'{USERNAME_PREFIX}{i}@example.com',
+                phone='0000000000',
+                department='Surveyors',  # No check-in time window, so runs work at any hour
+                primary_office='LT',
+                role='employee',
+            )
+            for i in range(count) if f'{USERNAME_PREFIX}{i}' not in existing
+        ]
+        Employee.objects.bulk_create(missing, batch_size=500)
+
+        employees = Employee.objects.filter(username__in=[f'{USERNAME_PREFIX}{i}' for i in range(count)])
+        employees.update(is_active=True, password=password, role='employee')  # Earlier runs made loadtest_0 an admin
+        ids = list(employees.order_by('id').values_list('id', flat=True))
+        today = timezone.localtime(timezone.now()).date()
+        # Backdated sessions can start yesterday
+        AttendanceRecord.objects.filter(employee_id__in=ids, date__in=[today, today - timedelta(days=1)]).delete()
+        return ids
+
+    def _release_employees(self, ids, delete):
+        """Keep loadtest accounts from staying usable after the run"""
+        employees = Employee.objects.filter(id__in=ids, username__startswith=USERNAME_PREFIX)
+        if delete:
+            employees.delete()
+            self.stdout.write(f"Deleted {len(ids)} loadtest employees and their attendance")
+        else:
+            employees.update(is_active=False)
+            self.stdout.write(f"Deactivated {len(ids)} loadtest employees (--cleanup deletes them)")
+
+    def _backdate_check_in(self, employee_id):
+        """
+        Move an employee's open session SESSION_HOURS into the past, outside the timed
+        requests, so check-out passes the minimum-hours rule. Returns False if no session appeared.
+        """
+        deadline = time.monotonic() + APPLY_WAIT_SECONDS
+        while True:
+            record = AttendanceRecord.objects.filter(
+                employee_id=employee_id, check_in_time__isnull=False, check_out_time__isnull=True
+            ).order_by('-date').first()
+            if record or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)  # Write-behind mode: the writer thread has not applied the check-in yet
+        if record is None:
+            return False
+        session_start = timezone.localtime(timezone.now()) - timedelta(hours=SESSION_HOURS)
+        record.date = session_start.date()
+        record.check_in_time = session_start.time().replace(microsecond=0)
+        record.save(update_fields=['date', 'check_in_time', 'updated_at'])
+        return True
+
+    async def _run(self, employees, arrivals, checkouts, offices, poller_id, stats, options):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=options['concurrency'] + options['admin_pollers'])
+        local = threading.local()
+        limit = asyncio.Semaphore(options['concurrency'])
+        t0 = loop.time()
+
+        def call(name, method, path, payload):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client(raise_request_exception=False)
+            began = time.perf_counter()
+            with CaptureQueriesContext(connections['default']) as queries:
+                if method == 'post':
+                    response = client.post(path, payload, content_type='application/json')
+                else:
+                    response = client.get(path, payload)
+            finished = time.perf_counter()
+            body = response.content.decode('utf-8', 'replace') if response.status_code >= 400 else ''
+            stats[name].record(began, finished, response.status_code, len(queries), body)
+
+        async def request(name, method, path, payload):
+            async with limit:
+                await loop.run_in_executor(executor, call, name, method, path, payload)
+
+        async def employee_flow(employee_id, offset):
+            await asyncio.sleep(max(0.0, t0 + offset - loop.time()))
+            payload = {'employee_id': employee_id, 'type': options['att_type'], 'status': options['att_type']}
+            if offices:
+                office_id, lat, lng = random.choice(offices)
+                payload['status'] = 'present'
+                payload['office_id'] = office_id
+                payload['location'] = {'latitude': float(lat), 'longitude': float(lng)}
+            await request('mark_attendance', 'post', '/api/mark-attendance', payload)
+            await request('today_attendance', 'get', '/api/today-attendance', {'employee_id': employee_id})
+            if employee_id in checkouts:
+                # Untimed setup: without it every check-out is rejected for working 0h
+                if await loop.run_in_executor(executor, self._backdate_check_in, employee_id):
+                    await request('check_out', 'post', '/api/check-out', {'employee_id': employee_id})
+                else:
+                    self.checkouts_skipped += 1
+
+        done = asyncio.Event()
+
+        async def admin_poller():
+            while not done.is_set():
+                await request('admin_summary', 'get', '/api/admin-summary', {'user_id': poller_id})
+                try:
+                    await asyncio.wait_for(done.wait(), options['poll_interval'])
+                except asyncio.TimeoutError:
+                    pass
+
+        pollers = [asyncio.create_task(admin_poller()) for _ in range(options['admin_pollers'])]
+        await asyncio.gather(*(employee_flow(e, o) for e, o in zip(employees, arrivals.tolist())))
+        done.set()
+        await asyncio.gather(*pollers)
+        executor.shutdown(wait=True)
+
+    @staticmethod
+    def _is_test_database():
+        name = str(connection.settings_dict['NAME'])
+        return os.path.basename(name).startswith('test_') or name == ':memory:' or 'mode=memory' in name
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
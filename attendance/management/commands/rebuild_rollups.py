@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from attendance.rollups import month_partitions, replace_partition, summarize_partition
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily attendance summary table from attendance_records, one month per unit of work. '
+        'Worker processes aggregate months in parallel; this process upserts the results.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_date', type=str, help='Range start in YYYY-MM-DD format')
+        parser.add_argument('--to', dest='to_date', type=str, help='Range end in YYYY-MM-DD format (inclusive)')
+        parser.add_argument('--since', type=int, metavar='DAYS', help='Only rebuild the last N days')
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Worker processes aggregating months')
+
+    def handle(self, *args, **options):
+        today = timezone.localtime(timezone.now()).date()
+        try:
+            if options['since'] is not None:
+                start, end = today - timedelta(days=options['since']), today
+            elif options['from_date'] or options['to_date']:
+                start = datetime.strptime(options['from_date'] or options['to_date'], '%Y-%m-%d').date()
+                end = datetime.strptime(options['to_date'] or options['from_date'], '%Y-%m-%d').date()
+            else:
+                bounds = AttendanceRecord.objects.aggregate(start=Min('date'), end=Max('date'))
+                if bounds['start'] is None:
+                    self.stdout.write('No attendance records to summarize')
+                    return
+                start, end = bounds['start'], bounds['end']
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+        if end < start:
+            raise CommandError('--to must not be before --from')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+
+        partitions = month_partitions(start, end)
+        workers = min(options['workers'], len(partitions))
+        self.stdout.write(f"Rebuilding daily summaries from {start} to {end} "
+                          f"({len(partitions)} months, {workers} workers)")
+
+        started = time.monotonic()
+        self.records = self.rows = 0
+        if workers > 1:
+            connections.close_all()  # Never share a connection with forked workers
+            with multiprocessing.get_context().Pool(workers, initializer=_init_worker) as pool:
+                for done, result in enumerate(pool.imap_unordered(summarize_partition, partitions), 1):
+                    self._write(done, len(partitions), started, *result)
+        else:
+            for done, partition in enumerate(partitions, 1):
+                self._write(done, len(partitions), started, *summarize_partition(partition))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {self.rows} summary rows from {self.records} attendance records in {elapsed:.2f}s "
+            f"({self.records / elapsed if elapsed else 0:,.0f} records/s)"
+        ))
+
+    def _write(self, done, total, started, partition, rows):
+        replace_partition(partition, rows)
+        self.rows += len(rows)
+        self.records += sum(row.total for row in rows)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"  {done}/{total} months ({partition[0]:%Y-%m}), {self.rows} summary rows, "
+            f"{self.records / elapsed if elapsed else 0:,.0f} records/s"
+        )
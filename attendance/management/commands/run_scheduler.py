@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance import jobs  # noqa: F401  (registers the jobs)
+from attendance.models import ScheduledJobRun
+from attendance.scheduler import JOBS, NODE_ID, due_jobs, missed_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Run scheduled jobs (absentee marking, rollup refresh, visit detection, model training) on their '
+        'cron triggers. Safe to start on several nodes: each slot runs on whichever node claims it first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help='List registered jobs with their last run and exit')
+        parser.add_argument('--run', metavar='JOB', action='append',
+                            help='Run a job now (repeatable) instead of following the schedule')
+        parser.add_argument('--once', action='store_true', help='Run the jobs due this minute, then exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self._list()
+
+        if options['run']:
+            unknown = [name for name in options['run'] if name not in JOBS]
+            if unknown:
+                raise CommandError(f"Unknown job(s): {', '.join(unknown)}. Available: {', '.join(sorted(JOBS))}")
+            for name in options['run']:
+                self._run(JOBS[name], slot=None)
+            return
+
+        self.stdout.write(f"Scheduler {NODE_ID} started with {len(JOBS)} jobs")
+        running = {}
+        for job, slot in missed_jobs(timezone.now()):
+            self.stdout.write(f"{job.name}: catching up missed {timezone.localtime(slot):%Y-%m-%d %H:%M} run")
+            thread = threading.Thread(target=self._run, args=(job, slot), name=f'job-{job.name}')
+            thread.start()
+            running[job.name] = thread
+        try:
+            while True:
+                slot = timezone.now().replace(second=0, microsecond=0)
+                for job in due_jobs(slot):
+                    if job.name in running and running[job.name].is_alive():
+                        self.stdout.write(f"{job.name}: previous run still in progress, skipping {slot:%H:%M}")
+                        continue
+                    thread = threading.Thread(target=self._run, args=(job, slot), name=f'job-{job.name}')
+                    thread.start()
+                    running[job.name] = thread
+                if options['once']:
+                    break
+                next_slot = slot + timedelta(minutes=1)
+                time.sleep(max(0.0, (next_slot - timezone.now()).total_seconds()))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping; waiting for running jobs to finish')
+        for thread in running.values():
+            thread.join()
+
+    def _run(self, job, slot):
+        run = run_job(job, slot)
+        if run is None:
+            self.stdout.write(f"{job.name}: claimed by another node, skipped")
+        elif run.status == 'success':
+            self.stdout.write(self.style.SUCCESS(f"{job.name}: finished in {run.duration_seconds}s"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{job.name}: failed after {run.duration_seconds}s (run {run.id})"))
+
+    def _list(self):
+        for name, job in sorted(JOBS.items()):
+            last = ScheduledJobRun.objects.filter(job=name).first()
+            last_text = (
+                f"last {last.status} at {timezone.localtime(last.started_at):%Y-%m-%d %H:%M}" if last else 'never run'
+            )
+            self.stdout.write(f"{name:<22} {str(job.trigger):<14} {last_text}  {job.description}")
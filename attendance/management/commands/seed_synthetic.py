@@ -0,0 +1,456 @@
+import multiprocessing
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+import django
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from attendance.models import (
+    AttendanceRecord, DepartmentOfficeAccess, Employee, EmployeeProfile, EmployeeRequest,
+    OfficeLocation, Task, TaskComment, TemporaryTag,
+)
+from attendance.rollups import rebuild_daily_summary
+
+
+USERNAME_PREFIX = 'syn_'
+OFFICE_PREFIX = 'SYN'
+
+# Share of headcount per department
+DEPARTMENT_WEIGHTS = {
+    'Surveyors': 0.35, 'IT': 0.20, 'Growth': 0.15, 'Accounts': 0.10, 'HR': 0.08, 'Others': 0.12,
+}
+CITY_CENTRES = [
+    (28.6139, 77.2090), (19.0760, 72.8777), (12.9716, 77.5946), (17.3850, 78.4867),
+    (13.0827, 80.2707), (22.5726, 88.3639), (18.5204, 73.8567), (23.0225, 72.5714),
+]
+FIXED_HOLIDAYS = [(1, 26), (8, 15), (10, 2), (12, 25)]  # Republic Day, Independence Day, Gandhi Jayanti, Christmas
+
+ABSENT_RATE = 0.03
+WFH_RATE = 0.08           # Approved WFH days for non-surveyors
+LEAVE_DAYS_PER_YEAR = 15
+HALF_DAY_RATE = 0.02
+EARLY_LEAVE_RATE = 0.10   # Check-outs before 8h become half days
+
+ATTENDANCE_COLUMNS = [
+    'employee', 'date', 'check_in_time', 'check_out_time', 'type', 'status', 'office',
+    'total_hours', 'is_half_day', 'notes', 'created_at', 'updated_at',
+]
+
+
+def working_calendar(start, end, rng):
+    """Weekdays in [start, end] minus national holidays and 6 random festival days per year"""
+    holidays = set()
+    for year in range(start.year, end.year + 1):
+        holidays.update(date(year, m, d) for m, d in FIXED_HOLIDAYS)
+        first = date(year, 1, 1).toordinal()
+        holidays.update(date.fromordinal(first + int(o)) for o in rng.choice(365, 6, replace=False))
+    days = []
+    current = start
+    while current <= end:
+        if current.weekday() < 5 and current not in holidays:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def _leave_blocks(workdays, count, rng):
+    """Pick non-overlapping runs of 1-4 consecutive working days totalling about `count` days"""
+    taken = np.zeros(len(workdays), dtype=bool)
+    blocks = []
+    remaining = count
+    attempts = 0
+    while remaining > 0 and attempts < count * 4 and len(workdays) > 5:
+        attempts += 1
+        length = min(int(rng.integers(1, 5)), remaining)
+        start = int(rng.integers(0, len(workdays) - length))
+        if taken[start:start + length].any():
+            continue
+        taken[start:start + length] = True
+        blocks.append((start, start + length - 1))
+        remaining -= length
+    return blocks
+
+
+def seed_employee_chunk(args):
+    """Generate requests and attendance for a slice of employees; runs in the parent or a pool worker"""
+    employees, workdays, today, seed, batch_size = args
+    rng = np.random.default_rng(seed)
+    now = timezone.now()
+
+    requests = []
+    records = []
+    for employee_id, department, office_id, manager_id, first_day in employees:
+        days = workdays[first_day:]
+        if not days:
+            continue
+        status = np.full(len(days), 'client' if department == 'Surveyors' else 'present', dtype=object)
+        att_type = np.full(len(days), 'client' if department == 'Surveyors' else 'office', dtype=object)
+        half_day = np.zeros(len(days), dtype=bool)
+
+        # Approved leave in short blocks, mirrored as 'leave' attendance rows
+        for a, b in _leave_blocks(days, int(LEAVE_DAYS_PER_YEAR * len(days) / 250), rng):
+            requests.append(_request(employee_id, 'full_day', days[a], days[b], manager_id, today, now, rng))
+            status[a:b + 1] = 'leave'
+
+        free = np.flatnonzero(status != 'leave')
+        half = rng.choice(free, int(len(free) * HALF_DAY_RATE), replace=False) if len(free) else []
+        for i in half:
+            requests.append(_request(employee_id, 'half_day', days[i], days[i], manager_id, today, now, rng))
+            status[i] = 'half_day'
+            half_day[i] = True
+
+        if department != 'Surveyors':
+            free = np.flatnonzero(status == 'present')
+            wfh = rng.choice(free, int(len(free) * WFH_RATE), replace=False) if len(free) else []
+            for i in wfh:
+                requests.append(_request(employee_id, 'wfh', days[i], days[i], manager_id, today, now, rng))
+                status[i] = att_type[i] = 'wfh'
+
+        absent = np.isin(status, ['present', 'client']) & (rng.random(len(days)) < ABSENT_RATE)
+        status[absent] = 'absent'
+
+        # Arrival around 9:20 (+/- 20 min), shifts of ~8.7h with a tail of early leavers
+        check_in = np.clip(rng.normal(9 * 60 + 20, 20, len(days)), 7 * 60, 12 * 60)
+        hours = np.where(rng.random(len(days)) < EARLY_LEAVE_RATE,
+                         rng.uniform(4.5, 8, len(days)), rng.normal(8.7, 0.4, len(days)))
+        hours = np.clip(hours, 4.5, 11.5)
+        for i, day in enumerate(days):
+            if day > today:
+                break
+            day_status = status[i]
+            if day_status in ('leave', 'absent'):
+                records.append((
+                    employee_id, day, None, None, 'office', day_status, None, 0, False,
+                    'Approved full_day request' if day_status == 'leave' else None, now, now,
+                ))
+                continue
+            worked = round(float(hours[i]) / 2, 2) if half_day[i] else round(float(hours[i]), 2)
+            start_min = check_in[i] + (240 if half_day[i] and rng.random() < 0.5 else 0)
+            in_time = time(int(start_min // 60), int(start_min % 60))
+            out_min = start_min + worked * 60
+            out_time = None if day == today else time(int(out_min // 60) % 24, int(out_min % 60))
+            if day_status in ('present', 'client') and worked < 8:
+                day_status = 'half_day'
+            records.append((
+                employee_id, day, in_time, out_time, att_type[i], day_status,
+                office_id if att_type[i] == 'office' else None,
+                0 if out_time is None else worked, bool(half_day[i]), None, now, now,
+            ))
+
+        # Some upcoming leave still waiting for review
+        if rng.random() < 0.1:
+            begins = today + timedelta(days=int(rng.integers(1, 30)))
+            requests.append(_request(employee_id, 'full_day', begins, begins, manager_id, today, now, rng))
+
+    with transaction.atomic():
+        EmployeeRequest.objects.bulk_create(requests, batch_size=batch_size)
+        RowWriter(AttendanceRecord, ATTENDANCE_COLUMNS).write(records, batch_size)
+    connection.close()
+    return len(records), len(requests)
+
+
+class RowWriter:
+    """
+    executemany() INSERTs from plain tuples. bulk_create spends most of its time
+    preparing every value of every row; here each field converts a distinct value once.
+    """
+
+    def __init__(self, model, field_names):
+        meta = model._meta
+        qn = connection.ops.quote_name
+        self.fields = [meta.get_field(name) for name in field_names]
+        self.caches = [{} for _ in self.fields]
+        self.sql = (
+            f"INSERT INTO {qn(meta.db_table)} ({', '.join(qn(f.column) for f in self.fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(self.fields))})"
+        )
+
+    def _prepare(self, row):
+        values = []
+        for value, field, cache in zip(row, self.fields, self.caches):
+            try:
+                values.append(cache[value])
+            except KeyError:
+                cache[value] = prepared = field.get_db_prep_save(value, connection)
+                values.append(prepared)
+        return values
+
+    def write(self, rows, batch_size):
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(self.sql, [self._prepare(row) for row in rows[start:start + batch_size]])
+
+
+def _request(employee_id, request_type, start, end, manager_id, today, now, rng):
+    reviewed = start <= today
+    return EmployeeRequest(
+        employee_id=employee_id,
+        request_type=request_type,
+        start_date=start,
+        end_date=end,
+        reason='Synthetic request',
+        status='approved' if reviewed else 'pending',
+        half_day_period=('first_half' if rng.random() < 0.5 else 'second_half') if request_type == 'half_day' else None,
+        reviewed_by_id=manager_id if reviewed else None,
+        reviewed_at=now if reviewed else None,
+    )
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic deployment (syn_* employees, SYN offices, years of attendance, '
+        'requests, tasks with comments and temporary tags) for benchmarking analytics'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help='Number of employees to create')
+        parser.add_argument('--offices', type=int, default=10, help='Number of offices to create')
+        parser.add_argument('--years', type=float, default=1, help='Years of history ending today')
+        parser.add_argument('--tasks-per-manager', type=int, default=20, help='Tasks created by each manager')
+        parser.add_argument('--chunk-employees', type=int, default=50, help='Employees generated per unit of work')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT statement')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes for attendance generation (ignored on SQLite, which has one writer)')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated synthetic data first')
+
+    def handle(self, *args, **options):
+        if options['employees'] < 1 or options['offices'] < 1 or options['years'] <= 0:
+            raise CommandError('--employees, --offices and --years must be positive')
+
+        started = clock.monotonic()
+        rng = np.random.default_rng(options['seed'])
+
+        if options['clear']:
+            self._clear()
+        elif Employee.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError('Synthetic data already exists; rerun with --clear to replace it')
+
+        today = timezone.localtime(timezone.now()).date()
+        start = today - timedelta(days=int(options['years'] * 365))
+        workdays = working_calendar(start, today, rng)
+
+        offices = self._create_offices(options['offices'], rng)
+        employees = self._create_employees(options['employees'], offices, len(workdays), rng, options['batch_size'])
+        self.stdout.write(f"Created {len(offices)} offices and {len(employees)} employees")
+
+        records, requests = self._seed_attendance(employees, workdays, today, options)
+        self.stdout.write(f"Created {records} attendance records and {requests} requests")
+
+        # Bulk inserts skip the summary signals
+        summaries = rebuild_daily_summary(start, today)
+        self.stdout.write(f"Rebuilt {summaries} daily summary rows")
+
+        tasks, comments = self._create_tasks(employees, options['tasks_per_manager'], start, today, rng, options['batch_size'])
+        tags = self._create_tags(employees, start, today, rng, options['batch_size'])
+        self.stdout.write(f"Created {tasks} tasks, {comments} comments and {tags} temporary tags")
+
+        elapsed = clock.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Synthetic data ready in {elapsed:.1f}s ({records / elapsed if elapsed else 0:,.0f} attendance rows/s)"
+        ))
+
+    def _clear(self):
+        employees = Employee.objects.filter(username__startswith=USERNAME_PREFIX)
+        # Delete the big tables with plain DELETEs before the cascading employee delete.
+        # Attendance has summary signals, which would make the ORM fetch every row first.
+        ids_sql, ids_params = employees.values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {AttendanceRecord._meta.db_table} WHERE employee_id IN ({ids_sql})', ids_params
+            )
+        EmployeeRequest.objects.filter(employee__in=employees).delete()
+        TaskComment.objects.filter(author__in=employees).delete()
+        Task.objects.filter(created_by__in=employees).delete()
+        TemporaryTag.objects.filter(employee__in=employees).delete()
+        EmployeeProfile.objects.filter(employee__in=employees).delete()
+        employees.update(manager=None)
+        employees.delete()
+        OfficeLocation.objects.filter(id__startswith=OFFICE_PREFIX).delete()
+        self.stdout.write('Cleared previous synthetic data')
+
+    def _create_offices(self, count, rng):
+        offices = []
+        for i in range(count):
+            lat, lng = CITY_CENTRES[i % len(CITY_CENTRES)]
+            offices.append(OfficeLocation(
+                id=f'{OFFICE_PREFIX}{i:04d}',
+                name=f'Synthetic Office {i}',
+                address=f'{i} Synthetic Road',
+                latitude=round(lat + rng.normal(0, 0.05), 6),
+                longitude=round(lng + rng.normal(0, 0.05), 6),
+                radius_meters=int(rng.choice([50, 100, 200, 300])),
+            ))
+        OfficeLocation.objects.bulk_create(offices)
+
+        access = [
+            DepartmentOfficeAccess(department=department, office=office)
+            for department in DEPARTMENT_WEIGHTS
+            for office in offices if rng.random() < 0.6
+        ]
+        DepartmentOfficeAccess.objects.bulk_create(access, ignore_conflicts=True)
+        return [o.id for o in offices]
+
+    def _create_employees(self, count, offices, n_workdays, rng, batch_size):
+        """Create employees, one manager per ~10 staff in each department, and profiles"""
+        password = make_password('synthetic')
+        departments = rng.choice(list(DEPARTMENT_WEIGHTS), count, p=list(DEPARTMENT_WEIGHTS.values()))
+        roles = np.where(rng.random(count) < 0.1, 'manager', 'employee').astype(object)
+        roles[:max(1, count // 2000)] = 'admin'
+
+        staff = [
+            Employee(
+                username=f'{USERNAME_PREFIX}{i}',
+                password=password,
+                name=f'Synthetic Employee {i}',
+                email=f'{USERNAME_PREFIX}{i}@synthetic.local',
+                phone=f'9{i:09d}',
+                department=departments[i],
+                primary_office=offices[int(rng.integers(len(offices)))],
+                role=roles[i],
+            )
+            for i in range(count)
+        ]
+        Employee.objects.bulk_create(staff, batch_size=batch_size)
+        created = list(Employee.objects.filter(username__startswith=USERNAME_PREFIX)
+                       .values('id', 'department', 'primary_office', 'role').order_by('id'))
+
+        managers = {}
+        for e in created:
+            if e['role'] == 'manager':
+                managers.setdefault(e['department'], []).append(e['id'])
+        updates = []
+        for e in created:
+            pool = managers.get(e['department'])
+            if e['role'] == 'employee' and pool:
+                e['manager_id'] = pool[int(rng.integers(len(pool)))]
+                updates.append(Employee(id=e['id'], manager_id=e['manager_id']))
+            else:
+                e['manager_id'] = None
+        Employee.objects.bulk_update(updates, ['manager'], batch_size=batch_size)
+
+        today = timezone.localtime(timezone.now()).date()
+        EmployeeProfile.objects.bulk_create([
+            EmployeeProfile(
+                employee_id=e['id'],
+                gender=str(rng.choice(['male', 'female', 'other'], p=[0.55, 0.43, 0.02])),
+                date_of_birth=today - timedelta(days=int(rng.integers(22 * 365, 58 * 365))),
+            )
+            for e in created
+        ], batch_size=batch_size)
+
+        # A fifth of the workforce joined partway through the history
+        for e in created:
+            e['first_day'] = int(rng.integers(0, max(n_workdays, 1))) if rng.random() < 0.2 else 0
+        return created
+
+    def _seed_attendance(self, employees, workdays, today, options):
+        chunk = max(1, options['chunk_employees'])
+        jobs = [
+            (
+                [(e['id'], e['department'], e['primary_office'], e['manager_id'], e['first_day'])
+                 for e in employees[i:i + chunk]],
+                workdays, today, options['seed'] + i, options['batch_size'],
+            )
+            for i in range(0, len(employees), chunk)
+        ]
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write('SQLite allows a single writer; generating attendance in this process')
+            workers = 1
+
+        records = requests = 0
+        if workers > 1:
+            connections.close_all()  # Never share a connection with forked workers
+            with multiprocessing.get_context().Pool(workers, initializer=_init_worker) as pool:
+                for done, (r, q) in enumerate(pool.imap_unordered(seed_employee_chunk, jobs), 1):
+                    records, requests = records + r, requests + q
+                    self._progress(done, len(jobs), records)
+        else:
+            for done, job in enumerate(jobs, 1):
+                r, q = seed_employee_chunk(job)
+                records, requests = records + r, requests + q
+                self._progress(done, len(jobs), records)
+        return records, requests
+
+    def _progress(self, done, total, records):
+        if done == total or done % max(1, total // 20) == 0:
+            self.stdout.write(f"  {done}/{total} chunks, {records} attendance rows")
+
+    def _create_tasks(self, employees, per_manager, start, today, rng, batch_size):
+        reports = {}
+        for e in employees:
+            if e['manager_id']:
+                reports.setdefault(e['manager_id'], []).append(e['id'])
+        span = max((today - start).days, 1)
+
+        tasks, assignee_sets = [], []
+        for manager_id, team in reports.items():
+            for _ in range(per_manager):
+                created = start + timedelta(days=int(rng.integers(span)))
+                state = str(rng.choice(['todo', 'in_progress', 'completed'], p=[0.2, 0.2, 0.6]))
+                started = timezone.make_aware(datetime.combine(created, time(10))) if state != 'todo' else None
+                tasks.append(Task(
+                    title=f'Synthetic task {len(tasks)}',
+                    description='Generated for benchmarking',
+                    status=state,
+                    priority=str(rng.choice(['low', 'medium', 'high', 'urgent'], p=[0.3, 0.4, 0.2, 0.1])),
+                    manager_id=manager_id,
+                    created_by_id=manager_id,
+                    due_date=created + timedelta(days=int(rng.integers(3, 30))),
+                    accuracy=int(rng.integers(60, 101)) if state == 'completed' else None,
+                    started_at=started,
+                    completed_at=started + timedelta(days=int(rng.integers(1, 20))) if state == 'completed' else None,
+                ))
+                assignee_sets.append(rng.choice(team, min(len(team), int(rng.integers(1, 5))), replace=False).tolist())
+        tasks = Task.objects.bulk_create(tasks, batch_size=batch_size)
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            task_ids = [t.id for t in tasks]
+        else:
+            task_ids = list(Task.objects.filter(title__startswith='Synthetic task ')
+                            .order_by('id').values_list('id', flat=True))
+
+        Through = Task.assignees.through
+        links = [Through(task_id=t, employee_id=e) for t, members in zip(task_ids, assignee_sets) for e in members]
+        Through.objects.bulk_create(links, batch_size=batch_size)
+
+        comments = []
+        for task_id, members, task in zip(task_ids, assignee_sets, tasks):
+            for _ in range(int(rng.integers(0, 6))):
+                comments.append(TaskComment(
+                    task_id=task_id,
+                    author_id=int(rng.choice(members + [task.manager_id])),
+                    content='Synthetic progress update',
+                ))
+        TaskComment.objects.bulk_create(comments, batch_size=batch_size)
+        return len(tasks), len(comments)
+
+    def _create_tags(self, employees, start, today, rng, batch_size):
+        """Temporary department moves of 1-4 weeks for about 5% of staff"""
+        span = max((today - start).days, 1)
+        tags = []
+        for e in employees:
+            if e['role'] != 'employee' or rng.random() >= 0.05:
+                continue
+            for _ in range(int(rng.integers(1, 3))):
+                begins = start + timedelta(days=int(rng.integers(span)))
+                tags.append(TemporaryTag(
+                    employee_id=e['id'],
+                    department=str(rng.choice([d for d in DEPARTMENT_WEIGHTS if d != e['department']])),
+                    role='employee',
+                    start_date=begins,
+                    end_date=begins + timedelta(days=int(rng.integers(7, 29))),
+                ))
+        TemporaryTag.objects.bulk_create(tags, batch_size=batch_size)
+        return len(tags)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0023_remove_attendancerecord_lunch_end_lat_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationTrail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('raw_point_count', models.IntegerField(default=0)),
+                ('point_count', models.IntegerField(default=0)),
+                ('points', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_trails', to='attendance.employee')),
+            ],
+            options={
+                'db_table': 'location_trails',
+                'indexes': [models.Index(fields=['employee', 'date'], name='location_tr_employe_91048a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0024_locationtrail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientVisit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('dwell_minutes', models.FloatField()),
+                ('point_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='client_visits', to='attendance.employee')),
+                ('office', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='visits', to='attendance.officelocation')),
+            ],
+            options={
+                'db_table': 'client_visits',
+                'indexes': [models.Index(fields=['employee', 'date'], name='client_visi_employe_6e531f_idx'), models.Index(fields=['date'], name='client_visi_date_49933a_idx')],
+            },
+        ),
+    ]
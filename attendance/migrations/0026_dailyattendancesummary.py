@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:34
+
+from datetime import time
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_summary(apps, schema_editor):
+    """Aggregate the existing attendance records into the new table (mirrors rollups.COUNTERS)"""
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    DailyAttendanceSummary = apps.get_model('attendance', 'DailyAttendanceSummary')
+    counters = {
+        'total': None,
+        'present': Q(status='present'),
+        'half_day': Q(status='half_day'),
+        'wfh': Q(status='wfh'),
+        'client': Q(status='client'),
+        'absent': Q(status='absent'),
+        'leave': Q(status='leave'),
+        'type_office': Q(type='office'),
+        'type_wfh': Q(type='wfh'),
+        'type_client': Q(type='client'),
+        'half_day_marked': Q(is_half_day=True),
+        'check_ins': Q(check_in_time__isnull=False),
+        'late_check_ins': Q(check_in_time__gt=time(9, 30)),
+    }
+    rows = AttendanceRecord.objects.order_by().values(
+        'date', 'employee__department', 'employee__role', 'office_id'
+    ).annotate(hours=Sum('total_hours'), **{name: Count('id', filter=q) for name, q in counters.items()})
+
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(DailyAttendanceSummary(
+            date=row['date'],
+            department=row['employee__department'] or '',
+            role=row['employee__role'] or '',
+            office=row['office_id'] or '',
+            total_hours=row['hours'] or 0,
+            **{name: row[name] for name in counters},
+        ))
+        if len(batch) >= 1000:
+            DailyAttendanceSummary.objects.bulk_create(batch)
+            batch = []
+    DailyAttendanceSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0025_clientvisit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department', models.CharField(max_length=20)),
+                ('role', models.CharField(max_length=20)),
+                ('office', models.CharField(blank=True, default='', max_length=10)),
+                ('total', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('half_day', models.IntegerField(default=0)),
+                ('wfh', models.IntegerField(default=0)),
+                ('client', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('leave', models.IntegerField(default=0)),
+                ('type_office', models.IntegerField(default=0)),
+                ('type_wfh', models.IntegerField(default=0)),
+                ('type_client', models.IntegerField(default=0)),
+                ('half_day_marked', models.IntegerField(default=0)),
+                ('check_ins', models.IntegerField(default=0)),
+                ('late_check_ins', models.IntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'daily_attendance_summary',
+                'unique_together': {('date', 'department', 'role', 'office')},
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
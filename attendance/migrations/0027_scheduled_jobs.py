@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0026_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJobLock',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('owner', models.CharField(blank=True, default='', max_length=200)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_slot', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'scheduled_job_locks',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduledJobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100)),
+                ('slot', models.DateTimeField(blank=True, null=True)),
+                ('node', models.CharField(max_length=200)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('success', 'Success'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('output', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'db_table': 'scheduled_job_runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['job', 'started_at'], name='scheduled_j_job_49a11a_idx')],
+            },
+        ),
+    ]
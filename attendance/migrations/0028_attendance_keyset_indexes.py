@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0027_scheduled_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendancerecord',
+            name='attendance__employe_6b3da7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='attendancerecord',
+            name='attendance__date_19baa0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='attendancerecord',
+            name='attendance__type_f86ff2_idx',
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['employee', 'date', 'id'], name='attendance__employe_b46e27_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'id'], name='attendance__date_f81417_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['type', 'date', 'id'], name='attendance__type_2f830d_idx'),
+        ),
+    ]
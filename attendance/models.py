@@ -61,27 +61,8 @@ class Employee(models.Model):
 
     def get_current_assignment(self):
         """Check for active temporary tags and return current department and role"""
-        from django.utils import timezone
-        today = timezone.localtime(timezone.now()).date()
-        
-        active_tag = TemporaryTag.objects.filter(
-            employee=self,
-            start_date__lte=today,
-            end_date__gte=today
-        ).first()
-        
-        if active_tag:
-            return {
-                'department': active_tag.department,
-                'role': active_tag.role,
-                'is_temporary': True
-            }
-            
-        return {
-            'department': self.department,
-            'role': self.role,
-            'is_temporary': False
-        }
+        from .assignments import effective_assignment
+        return effective_assignment(self.id, self.department, self.role)
 
 
 class EmployeeProfile(models.Model):
@@ -200,8 +181,8 @@ class AttendanceRecord(models.Model):
     office = models.ForeignKey(OfficeLocation, on_delete=models.SET_NULL, null=True, blank=True, related_name='attendance_records')
     check_in_location = models.JSONField(null=True, blank=True)
     check_out_location = models.JSONField(null=True, blank=True)
-    check_in_photo = models.TextField(null=True, blank=True)  # Base64 or file path
-    check_out_photo = models.TextField(null=True, blank=True)  # Base64 or file path
+    check_in_photo = models.TextField(null=True, blank=True)  # Photo store reference (legacy rows: base64)
+    check_out_photo = models.TextField(null=True, blank=True)  # Photo store reference (legacy rows: base64)
 
     total_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0.00)
     is_half_day = models.BooleanField(default=False)
@@ -212,10 +193,11 @@ class AttendanceRecord(models.Model):
     class Meta:
         db_table = 'attendance_records'
         unique_together = [['employee', 'date']]
+        # (..., date, id) keys match the keyset pagination order of attendance_records
         indexes = [
-            models.Index(fields=['employee', 'date']),
-            models.Index(fields=['date']),
-            models.Index(fields=['type']),
+            models.Index(fields=['employee', 'date', 'id']),
+            models.Index(fields=['date', 'id']),
+            models.Index(fields=['type', 'date', 'id']),
             models.Index(fields=['status']),
         ]
 
@@ -415,3 +397,132 @@ class TrainingLog(models.Model):
 
     def __str__(self):
         return f"Training Log {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} - Accuracy: {self.stability_factor}"
+
+
+class LocationTrail(models.Model):
+    """One simplified GPS track segment; points are a packed (float32 lat, float32 lng, int32 offset) array"""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='location_trails')
+    date = models.DateField()
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    raw_point_count = models.IntegerField(default=0)
+    point_count = models.IntegerField(default=0)
+    points = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'location_trails'
+        indexes = [
+            models.Index(fields=['employee', 'date']),
+        ]
+
+    def __str__(self):
+        return f"Trail: {self.employee.username} {self.date} ({self.point_count} pts)"
+
+
+class ClientVisit(models.Model):
+    """Dwell visit detected from a field employee's GPS trail (office set when inside an office geofence)"""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='client_visits')
+    date = models.DateField()
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    dwell_minutes = models.FloatField()
+    point_count = models.IntegerField(default=0)
+    office = models.ForeignKey(OfficeLocation, on_delete=models.SET_NULL, null=True, blank=True, related_name='visits')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'client_visits'
+        indexes = [
+            models.Index(fields=['employee', 'date']),
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"Visit: {self.employee.username} {self.date} ({self.dwell_minutes} min)"
+
+
+class DailyAttendanceSummary(models.Model):
+    """Rollup of attendance_records per (date, department, role, office), kept current by signals"""
+    date = models.DateField()
+    department = models.CharField(max_length=20)
+    role = models.CharField(max_length=20)
+    office = models.CharField(max_length=10, blank=True, default='')  # OfficeLocation id, '' for records without an office
+
+    total = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+    half_day = models.IntegerField(default=0)
+    wfh = models.IntegerField(default=0)
+    client = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    leave = models.IntegerField(default=0)
+    type_office = models.IntegerField(default=0)
+    type_wfh = models.IntegerField(default=0)
+    type_client = models.IntegerField(default=0)
+    half_day_marked = models.IntegerField(default=0)  # is_half_day flag, independent of status
+    check_ins = models.IntegerField(default=0)
+    late_check_ins = models.IntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_attendance_summary'
+        unique_together = [['date', 'department', 'role', 'office']]  # Also serves date-range scans
+
+    def __str__(self):
+        return f"Summary: {self.date} {self.department}/{self.role} @ {self.office or '-'}"
+
+
+class ScheduledJobLock(models.Model):
+    """Leader lock per scheduled job; a node runs a slot only after claiming it here"""
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=200, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_slot = models.DateTimeField(null=True, blank=True)  # Latest cron slot claimed by any node
+
+    class Meta:
+        db_table = 'scheduled_job_locks'
+
+    def __str__(self):
+        return f"Job Lock: {self.name} ({self.owner or 'free'})"
+
+
+class ScheduledJobRun(models.Model):
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+
+    job = models.CharField(max_length=100)
+    slot = models.DateTimeField(null=True, blank=True)  # Cron slot being served; empty for manual runs
+    node = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    output = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'scheduled_job_runs'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"Job Run: {self.job} {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class CacheVersion(models.Model):
+    """Counter shared by all workers; bumped when the data behind a process-local cache changes"""
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'cache_versions'
+
+    def __str__(self):
+        return f"Cache Version: {self.name} v{self.version}"
@@ -0,0 +1,64 @@
+"""
+Keyset Pagination
+Pages are read with WHERE (date, id) < (last date, last id) ORDER BY date DESC, id DESC,
+so deep pages cost the same as the first one and no total count is needed.
+The cursor handed to clients is an opaque base64 token of the last row's key.
+"""
+import base64
+import json
+from datetime import date
+
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row_date, row_id):
+    raw = json.dumps([row_date.isoformat(), row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        row_date, row_id = json.loads(raw)
+        return date.fromisoformat(row_date), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a limit query parameter, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE)) if value else default
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_order(queryset, cursor=None):
+    """The queryset in (date DESC, id DESC) order, starting after the cursor's row"""
+    queryset = queryset.order_by('-date', '-id')
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date__lt=after_date) | Q(date=after_date, id__lt=after_id))
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of a queryset in (date DESC, id DESC) order.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = keyset_order(queryset, cursor)
+    rows = list(queryset[:limit + 1])  # One extra row tells whether another page exists
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.date, last.id)
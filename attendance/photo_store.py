@@ -0,0 +1,152 @@
+"""
+Attendance Photo Store
+Content-addressed on-disk storage for check-in/check-out photos with thumbnails.
+Records keep only a short reference ("blob:<sha256>.<ext>") instead of base64.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+PHOTO_DIR = 'attendance_photos'
+REF_PREFIX = 'blob:'
+THUMBNAIL_SIZES = {
+    'sm': 128,   # list rows / avatars
+    'md': 480,   # detail popups
+}
+THUMBNAIL_QUALITY = 80
+MAX_PHOTO_BYTES = 5 * 1024 * 1024  # 5MB, matches DATA_UPLOAD_MAX_MEMORY_SIZE
+
+_REF_RE = re.compile(r'^blob:([0-9a-f]{64})\.(jpg|png|webp)$')
+_DATA_URL_RE = re.compile(r'^data:image/[\w.+-]+;base64,', re.IGNORECASE)
+_FORMAT_EXT = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+class PhotoError(ValueError):
+    """Raised when a submitted photo cannot be decoded or stored."""
+
+
+def is_photo_ref(value):
+    """Return True if value is a blob store reference rather than inline data"""
+    return bool(value) and bool(_REF_RE.match(value))
+
+
+def decode_photo(data):
+    """Decode a base64 string or data URL into raw image bytes"""
+    if not data or not isinstance(data, str):
+        raise PhotoError('Photo data is empty')
+
+    payload = _DATA_URL_RE.sub('', data.strip(), count=1)
+    payload = ''.join(payload.split())
+    try:
+        raw = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise PhotoError('Photo is not valid base64')
+
+    if not raw:
+        raise PhotoError('Photo data is empty')
+    if len(raw) > MAX_PHOTO_BYTES:
+        raise PhotoError('Photo exceeds 5MB limit')
+    return raw
+
+
+def _blob_dir(digest):
+    return os.path.join(settings.MEDIA_ROOT, PHOTO_DIR, digest[:2])
+
+
+def _blob_name(digest, ext, size=None):
+    return f"{digest}_{size}.jpg" if size else f"{digest}.{ext}"
+
+
+def _write_atomic(path, payload):
+    """Write bytes to path via a temp file so readers never see partial files"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _make_thumbnail(image, max_side):
+    thumb = image.copy()
+    thumb.thumbnail((max_side, max_side))
+    if thumb.mode not in ('RGB', 'L'):
+        thumb = thumb.convert('RGB')
+    buf = io.BytesIO()
+    thumb.save(buf, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def _open_image(raw):
+    """Fully decode raw image bytes; returns (image, file extension)"""
+    try:
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        raise PhotoError('Photo is not a valid image')
+
+    ext = _FORMAT_EXT.get(image.format)
+    if not ext:
+        raise PhotoError(f'Unsupported photo format: {image.format}')
+    return image, ext
+
+
+def store_photo_bytes(raw):
+    """
+    Write raw image bytes into the blob store and generate thumbnails.
+    Identical photos hash to the same blob, so re-uploads cost nothing.
+    Returns the short reference to keep on the record.
+    """
+    image, ext = _open_image(raw)
+
+    digest = hashlib.sha256(raw).hexdigest()
+    blob_dir = _blob_dir(digest)
+    os.makedirs(blob_dir, exist_ok=True)
+
+    original_path = os.path.join(blob_dir, _blob_name(digest, ext))
+    if not os.path.exists(original_path):
+        _write_atomic(original_path, raw)
+
+    # Respect camera orientation so thumbnails are upright
+    image = ImageOps.exif_transpose(image)
+    for size, max_side in THUMBNAIL_SIZES.items():
+        thumb_path = os.path.join(blob_dir, _blob_name(digest, ext, size))
+        if not os.path.exists(thumb_path):
+            _write_atomic(thumb_path, _make_thumbnail(image, max_side))
+
+    return f"{REF_PREFIX}{digest}.{ext}"
+
+
+def store_photo(data):
+    """Decode a base64 photo from the client and store it, returning its reference"""
+    return store_photo_bytes(decode_photo(data))
+
+
+def check_photo(data):
+    """Validate a base64 photo exactly as store_photo does and return its reference, writing nothing"""
+    raw = decode_photo(data)
+    _, ext = _open_image(raw)
+    return f"{REF_PREFIX}{hashlib.sha256(raw).hexdigest()}.{ext}"
+
+
+def photo_path(ref, size=None):
+    """Relative media path for a reference; size is None for the original or a THUMBNAIL_SIZES key"""
+    match = _REF_RE.match(ref or '')
+    if not match:
+        return None
+    digest, ext = match.groups()
+    return f"{PHOTO_DIR}/{digest[:2]}/{_blob_name(digest, ext, size)}"
+
+
+def photo_url(ref, size=None, request=None):
+    """Public URL for a reference (absolute when a request is supplied)"""
+    path = photo_path(ref, size)
+    if not path:
+        return None
+    url = settings.MEDIA_URL + path
+    return request.build_absolute_uri(url) if request else url
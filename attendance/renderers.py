@@ -0,0 +1,64 @@
+"""
+Response Renderers
+FastJSONRenderer encodes with orjson when it is installed (falling back to DRF's json encoder),
+producing the same bytes as JSONRenderer for everything the API returns. UUIDs are encoded natively;
+dates, times, Decimals and numpy values go through DRF's encoder hook, so datetimes are formatted
+exactly as the installed DRF version formats them.
+MessagePackRenderer answers clients that send Accept: application/msgpack.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_encode_default = JSONEncoder().default  # datetime -> ISO 8601, Decimal -> float, numpy -> tolist(), lazy strings, querysets
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps_json(value):
+    """
+    Compact UTF-8 JSON bytes, matching DRF's JSONRenderer output (U+2028/9 escaped).
+    Unlike json.dumps with allow_nan=False, orjson writes NaN and Infinity as null.
+    """
+    if orjson is not None:
+        try:
+            data = orjson.dumps(value, default=_encode_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; let the stdlib encoder decide
+        else:
+            if b'\xe2\x80\xa8' in data or b'\xe2\x80\xa9' in data:
+                data = data.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+            return data
+    return JSONRenderer().render(value)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps_json(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True, datetime=False)
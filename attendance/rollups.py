@@ -0,0 +1,307 @@
+"""
+Daily Attendance Rollups
+DailyAttendanceSummary holds one row per (date, department, role, office) so dashboards
+read a few hundred rollup rows instead of re-aggregating attendance_records.
+Writes keep it current incrementally: a changed record takes its old contribution off one row
+and adds its new one with `column = column + delta` upserts in the writing transaction, so
+concurrent check-ins in a department never overwrite each other's counts. Full re-aggregation
+is left to rebuild_daily_summary (the rebuild_rollups command and bulk loads).
+"""
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import AttendanceRecord, DailyAttendanceSummary, Employee
+
+
+LATE_CHECK_IN = time(9, 30)
+
+# Summary column -> filter over attendance_records (None counts every record)
+COUNTERS = {
+    'total': None,
+    'present': Q(status='present'),
+    'half_day': Q(status='half_day'),
+    'wfh': Q(status='wfh'),
+    'client': Q(status='client'),
+    'absent': Q(status='absent'),
+    'leave': Q(status='leave'),
+    'type_office': Q(type='office'),
+    'type_wfh': Q(type='wfh'),
+    'type_client': Q(type='client'),
+    'half_day_marked': Q(is_half_day=True),
+    'check_ins': Q(check_in_time__isnull=False),
+    'late_check_ins': Q(check_in_time__gt=LATE_CHECK_IN),
+}
+SUMMARY_FIELDS = [*COUNTERS, 'total_hours']
+SUMMARY_KEY = ['date', 'department', 'role', 'office']
+UPSERT_FIELDS = [*SUMMARY_KEY, *SUMMARY_FIELDS, 'updated_at']
+
+# Record columns that decide which summary row a record counts in and what it adds there
+RECORD_STATE_FIELDS = ['employee_id', 'date', 'office_id', 'status', 'type', 'is_half_day', 'check_in_time', 'total_hours']
+
+
+def aggregate_summaries(records):
+    """Group an AttendanceRecord queryset into unsaved DailyAttendanceSummary rows (one query)"""
+    annotations = {name: Count('id', filter=q) for name, q in COUNTERS.items()}
+    annotations['hours'] = Sum('total_hours')
+    rows = records.order_by().values(
+        'date', 'employee__department', 'employee__role', 'office_id'
+    ).annotate(**annotations)
+
+    return [DailyAttendanceSummary(
+        date=row['date'],
+        department=row['employee__department'] or '',
+        role=row['employee__role'] or '',
+        office=row['office_id'] or '',
+        total_hours=row['hours'] or 0,
+        **{name: row[name] for name in COUNTERS},
+    ) for row in rows]
+
+
+def _upsert_sql(increment=False):
+    """Upsert on the summary key; increment=True adds the values to an existing row instead"""
+    meta = DailyAttendanceSummary._meta
+    qn = connection.ops.quote_name
+    table = qn(meta.db_table)
+    columns = [qn(meta.get_field(name).column) for name in UPSERT_FIELDS]
+    key = [qn(meta.get_field(name).column) for name in SUMMARY_KEY]
+    *counters, updated_at = columns[len(SUMMARY_KEY):]
+    if increment:
+        updates = [f'{col} = {table}.{col} + EXCLUDED.{col}' for col in counters]
+    else:
+        updates = [f'{col} = EXCLUDED.{col}' for col in counters]
+    updates.append(f'{updated_at} = EXCLUDED.{updated_at}')
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(key)}) "
+        f"DO UPDATE SET {', '.join(updates)}"
+    )
+
+
+def _prepared_params(rows, now):
+    """executemany() parameters for UPSERT_FIELDS, each distinct value prepared once"""
+    fields = [DailyAttendanceSummary._meta.get_field(name) for name in UPSERT_FIELDS]
+    caches = [{} for _ in fields]
+    params = []
+    for row in rows:
+        row.updated_at = now
+        values = []
+        for field, cache in zip(fields, caches):
+            value = getattr(row, field.attname)
+            try:
+                values.append(cache[value])
+            except KeyError:
+                cache[value] = prepared = field.get_db_prep_save(value, connection)
+                values.append(prepared)
+        params.append(values)
+    return params
+
+
+def write_summaries(rows, batch_size=1000):
+    """Bulk upsert summary rows on their (date, department, role, office) key"""
+    if not rows:
+        return
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        # MySQL upserts on any unique key and rejects an explicit conflict target
+        unique_fields = SUMMARY_KEY if connection.features.supports_update_conflicts_with_target else None
+        DailyAttendanceSummary.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=[*SUMMARY_FIELDS, 'updated_at'],
+        )
+        return
+
+    # executemany() with each distinct value prepared once; bulk_create spends most of a
+    # rebuild preparing the same small counters over and over
+    params = _prepared_params(rows, timezone.now())
+    sql = _upsert_sql()
+    with connection.cursor() as cursor:
+        for start in range(0, len(params), batch_size):
+            cursor.executemany(sql, params[start:start + batch_size])
+
+
+def record_state(record):
+    """The RECORD_STATE_FIELDS values of a record instance, or None when some are deferred"""
+    try:
+        return {name: record.__dict__[name] for name in RECORD_STATE_FIELDS}
+    except KeyError:
+        return None
+
+
+def _field(name):
+    return AttendanceRecord._meta.get_field(name)
+
+
+def record_counts(state):
+    """What one record adds to each summary column; mirrors the COUNTERS filters"""
+    status, att_type = state['status'], state['type']
+    check_in = _field('check_in_time').to_python(state['check_in_time'])
+    hours_field = _field('total_hours')
+    hours = hours_field.to_python(state['total_hours'] or 0).quantize(Decimal(1).scaleb(-hours_field.decimal_places))
+    return {
+        'total': 1,
+        'present': int(status == 'present'),
+        'half_day': int(status == 'half_day'),
+        'wfh': int(status == 'wfh'),
+        'client': int(status == 'client'),
+        'absent': int(status == 'absent'),
+        'leave': int(status == 'leave'),
+        'type_office': int(att_type == 'office'),
+        'type_wfh': int(att_type == 'wfh'),
+        'type_client': int(att_type == 'client'),
+        'half_day_marked': int(bool(state['is_half_day'])),
+        'check_ins': int(check_in is not None),
+        'late_check_ins': int(check_in is not None and check_in > LATE_CHECK_IN),
+        'total_hours': hours,
+    }
+
+
+def _contribution(state):
+    """(employee_id, date, office, counts) a record state adds to the summary, None for no record"""
+    if state is None:
+        return None
+    return (
+        state['employee_id'],
+        _field('date').to_python(state['date']),
+        state['office_id'] or '',
+        tuple(record_counts(state).values()),
+    )
+
+
+def employee_slices(employee_ids):
+    """{employee_id: (department, role)} for the given employees (one query)"""
+    return {
+        employee_id: (department, role)
+        for employee_id, department, role in Employee.objects.filter(id__in=employee_ids).values_list(
+            'id', 'department', 'role'
+        )
+    }
+
+
+class SummaryDelta:
+    """Net changes to summary rows, collected per (date, department, role, office) and written together"""
+
+    def __init__(self):
+        self.buckets = {}
+
+    def add_counts(self, key, counts, sign=1):
+        bucket = self.buckets.setdefault(key, dict.fromkeys(SUMMARY_FIELDS, 0))
+        for name, amount in counts.items():
+            bucket[name] += amount * sign
+
+    def add(self, employee_slice, state, sign=1):
+        """Count a record state (sign=-1 takes it back) in its employee's (department, role) slice"""
+        department, role = employee_slice
+        employee_id, day, office, _ = _contribution(state)
+        self.add_counts((day, department or '', role or '', office), record_counts(state), sign)
+
+    def apply(self):
+        """Write the collected changes; returns the number of summary rows touched"""
+        # Sorted so concurrent writers lock summary rows in the same order and cannot deadlock
+        changes = sorted((key, bucket) for key, bucket in self.buckets.items() if any(bucket.values()))
+        self.buckets = {}
+        if not changes:
+            return 0
+
+        if connection.vendor in ('sqlite', 'postgresql'):
+            rows = [
+                DailyAttendanceSummary(**dict(zip(SUMMARY_KEY, key)), **amounts)
+                for key, amounts in changes
+            ]
+            with connection.cursor() as cursor:
+                cursor.executemany(_upsert_sql(increment=True), _prepared_params(rows, timezone.now()))
+            return len(changes)
+
+        for key, amounts in changes:
+            _increment(dict(zip(SUMMARY_KEY, key)), amounts)
+        return len(changes)
+
+
+def _increment(bucket, amounts):
+    """Add amounts to one summary row with F() expressions, creating the row if it is missing"""
+    summary = DailyAttendanceSummary.objects.filter(**bucket)
+    increments = {name: F(name) + amount for name, amount in amounts.items() if amount}
+    if summary.update(**increments, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            DailyAttendanceSummary.objects.create(**bucket, **amounts)
+    except IntegrityError:
+        summary.update(**increments, updated_at=timezone.now())  # Created meanwhile by another writer
+
+
+def apply_record_changes(changes, slices=None):
+    """
+    Move records' summary contributions from their old to their new state, given
+    (old_state, new_state) pairs with None for a side where the record does not exist.
+    slices may provide {employee_id: (department, role)}; others are looked up.
+    Returns the number of summary rows touched. Call it in the transaction that wrote the records.
+    """
+    changes = [(old, new) for old, new in changes if _contribution(old) != _contribution(new)]
+    if not changes:
+        return 0
+    slices = dict(slices or {})
+    employee_ids = {state['employee_id'] for pair in changes for state in pair if state is not None}
+    missing = employee_ids - set(slices)
+    if missing:
+        slices.update(employee_slices(missing))
+
+    delta = SummaryDelta()
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is not None and state['employee_id'] in slices:
+                delta.add(slices[state['employee_id']], state, sign)
+    return delta.apply()
+
+
+def month_partitions(start_date, end_date):
+    """Split [start_date, end_date] into (first, last) day pairs, one per calendar month"""
+    partitions = []
+    first = start_date
+    while first <= end_date:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(next_month - timedelta(days=1), end_date)
+        partitions.append((first, last))
+        first = next_month
+    return partitions
+
+
+def summarize_partition(partition):
+    """Aggregate one (first, last) date range; safe to run in a worker process"""
+    first, last = partition
+    return partition, aggregate_summaries(AttendanceRecord.objects.filter(date__gte=first, date__lte=last))
+
+
+def replace_partition(partition, rows):
+    """Swap the summary rows of a date range for freshly aggregated ones"""
+    first, last = partition
+    with transaction.atomic():
+        DailyAttendanceSummary.objects.filter(date__gte=first, date__lte=last).delete()
+        write_summaries(rows)
+
+
+def rebuild_daily_summary(start_date, end_date):
+    """Backfill the summary for a date range, a month at a time. Returns rows written."""
+    written = 0
+    for partition in month_partitions(start_date, end_date):
+        partition, rows = summarize_partition(partition)
+        replace_partition(partition, rows)
+        written += len(rows)
+    return written
+
+
+def daily_present_counts(start_date=None, end_date=None):
+    """{date: records with status present/wfh/client}, read from the summary table"""
+    rows = DailyAttendanceSummary.objects.all()
+    if start_date:
+        rows = rows.filter(date__gte=start_date)
+    if end_date:
+        rows = rows.filter(date__lte=end_date)
+    rows = rows.values('date').annotate(count=Sum(F('present') + F('wfh') + F('client'))).order_by('date')
+    return {row['date']: row['count'] for row in rows}
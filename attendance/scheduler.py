@@ -0,0 +1,185 @@
+"""
+Job Scheduler
+Registry of periodic jobs with cron-style triggers, run by the run_scheduler command.
+Every node may run the scheduler: a job slot is executed by whichever node first claims
+the job's row in scheduled_job_locks, and each execution is recorded in scheduled_job_runs.
+Jobs registered with catch_up=True also run their latest unclaimed slot when a scheduler starts.
+"""
+import io
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduledJobLock, ScheduledJobRun
+
+
+logger = logging.getLogger(__name__)
+
+NODE_ID = f'{socket.gethostname()}:{os.getpid()}'
+MAX_OUTPUT_CHARS = 20000
+
+
+class CronTrigger:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week) in local time.
+    Fields accept *, numbers, ranges (a-b), steps (*/n, a-b/n) and comma lists;
+    day-of-week runs 0-6 from Sunday (7 is also Sunday).
+    """
+
+    BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.BOUNDS)
+        ]
+        self.weekdays = {day % 7 for day in weekdays}
+        # Standard cron: when both day fields are restricted, either one may match
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            step = int(step) if step else 1
+            if spec == '*':
+                start, end = low, 6 if high == 7 else high  # * on day-of-week means 0-6
+            elif '-' in spec:
+                start, end = (int(v) for v in spec.split('-', 1))
+            else:
+                start = end = int(spec)
+                if step > 1:
+                    end = high
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f'Invalid cron field {field!r}')
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, moment):
+        """True when the local minute of `moment` is one of the trigger's slots"""
+        moment = timezone.localtime(moment)
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def previous(self, moment, max_days=8):
+        """The latest slot at or before `moment`, looking back at most max_days; None if there is none"""
+        slot = moment.replace(second=0, microsecond=0)
+        for _ in range(max_days * 24 * 60):
+            if self.matches(slot):
+                return slot
+            slot -= timedelta(minutes=1)
+        return None
+
+    def __str__(self):
+        return self.expression
+
+
+class Job:
+    def __init__(self, name, func, trigger, lease_seconds, description, catch_up=False):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.lease = timedelta(seconds=lease_seconds)
+        self.description = description
+        self.catch_up = catch_up  # Run the latest missed slot when a scheduler starts
+
+
+JOBS = {}
+
+
+def job(name, cron, lease_seconds=3600, catch_up=False):
+    """Register the decorated function as a scheduled job; it is called with a text stream for its output"""
+    trigger = CronTrigger(cron)
+
+    def register(func):
+        JOBS[name] = Job(name, func, trigger, lease_seconds, (func.__doc__ or '').strip(), catch_up)
+        return func
+    return register
+
+
+def due_jobs(moment):
+    return [j for j in JOBS.values() if j.trigger.matches(moment)]
+
+
+def missed_jobs(moment):
+    """(job, slot) for catch-up jobs whose latest slot before `moment` no node has claimed"""
+    claimed = dict(ScheduledJobLock.objects.values_list('name', 'last_slot'))
+    missed = []
+    for j in JOBS.values():
+        slot = j.trigger.previous(moment) if j.catch_up else None
+        if slot is not None and (claimed.get(j.name) is None or claimed[j.name] < slot):
+            missed.append((j, slot))
+    return missed
+
+
+def last_success(job):
+    """The latest successful ScheduledJobRun of a job, or None"""
+    return ScheduledJobRun.objects.filter(job=job.name, status='success').order_by('-started_at').first()
+
+
+def acquire_lock(job, slot=None, node=NODE_ID):
+    """
+    Claim a job for this node with a single conditional UPDATE. The claim fails while another
+    node holds an unexpired lease, or when the cron slot has already been claimed.
+    """
+    ScheduledJobLock.objects.bulk_create([ScheduledJobLock(name=job.name)], ignore_conflicts=True)
+    now = timezone.now()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    claim = ScheduledJobLock.objects.filter(free, name=job.name)
+    changes = {'owner': node, 'locked_until': now + job.lease}
+    if slot is not None:
+        claim = claim.filter(Q(last_slot__isnull=True) | Q(last_slot__lt=slot))
+        changes['last_slot'] = slot
+    return claim.update(**changes) == 1
+
+
+def release_lock(job, node=NODE_ID):
+    ScheduledJobLock.objects.filter(name=job.name, owner=node).update(owner='', locked_until=None)
+
+
+def run_job(job, slot=None, node=NODE_ID):
+    """
+    Run a job under its leader lock and record the run. Returns the ScheduledJobRun,
+    or None if another node owns the job (or already ran this slot).
+    """
+    close_old_connections()
+    if not acquire_lock(job, slot, node):
+        return None
+
+    run = ScheduledJobRun.objects.create(job=job.name, slot=slot, node=node, started_at=timezone.now())
+    started = time.monotonic()
+    output = io.StringIO()
+    try:
+        result = job.func(output)
+        if result is not None:
+            output.write(f'{result}\n')
+        run.status = 'success'
+    except Exception:
+        logger.exception('Scheduled job %s failed', job.name)
+        output.write(traceback.format_exc())
+        run.status = 'failed'
+    finally:
+        run.finished_at = timezone.now()
+        run.duration_seconds = round(time.monotonic() - started, 3)
+        run.output = output.getvalue()[-MAX_OUTPUT_CHARS:]
+        run.save(update_fields=['status', 'finished_at', 'duration_seconds', 'output'])
+        release_lock(job, node)
+        close_old_connections()
+    return run
@@ -0,0 +1,114 @@
+"""
+Model signal handlers that keep in-memory caches and rollup tables in sync with the database.
+Connected from AttendanceConfig.ready().
+"""
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AttendanceRecord, DailyAttendanceSummary, Employee, EmployeeRequest, OfficeLocation, TemporaryTag
+from .geofence import invalidate_office_index
+from .intervals import invalidate_departments, request_intervals, tag_intervals
+from .assignments import invalidate_assignment_map
+from .rollups import RECORD_STATE_FIELDS, SUMMARY_FIELDS, SummaryDelta, apply_record_changes, record_state
+
+
+@receiver(post_save, sender=OfficeLocation)
+@receiver(post_delete, sender=OfficeLocation)
+def office_location_changed(sender, **kwargs):
+    """Rebuild the geofence index after any office is added, edited or removed"""
+    invalidate_office_index()
+
+
+@receiver(post_delete, sender=OfficeLocation)
+def office_location_deleted(sender, instance, **kwargs):
+    """Records of a deleted office are set to no office with an UPDATE, which sends no signals"""
+    delta = SummaryDelta()
+    rows = DailyAttendanceSummary.objects.filter(office=instance.id).select_for_update()
+    for row in rows:
+        counts = {name: getattr(row, name) for name in SUMMARY_FIELDS}
+        delta.add_counts((row.date, row.department, row.role, ''), counts)
+    rows.delete()
+    delta.apply()
+
+
+@receiver(post_init, sender=AttendanceRecord)
+def remember_record_state(sender, instance, **kwargs):
+    # Only rows loaded from the database are counted in the summary already
+    instance._summary_state = record_state(instance) if instance.pk is not None else None
+
+
+@receiver(pre_save, sender=AttendanceRecord)
+def load_record_state(sender, instance, **kwargs):
+    """A record loaded with deferred fields reads its stored values before they are overwritten"""
+    if instance._state.adding or instance._summary_state is not None:
+        return
+    instance._summary_state = AttendanceRecord.objects.filter(pk=instance.pk).values(*RECORD_STATE_FIELDS).first()
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def attendance_record_saved(sender, instance, created, **kwargs):
+    """Move the record's summary contribution from its previous values to the saved ones"""
+    old = None if created else instance._summary_state
+    new = record_state(instance)
+    if new is None:
+        new = AttendanceRecord.objects.filter(pk=instance.pk).values(*RECORD_STATE_FIELDS).first()
+    instance._summary_state = new
+    apply_record_changes([(old, new)], _loaded_slice(instance))
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def attendance_record_deleted(sender, instance, **kwargs):
+    old = instance._summary_state or record_state(instance)
+    instance._summary_state = None
+    if old is not None:
+        apply_record_changes([(old, None)], _loaded_slice(instance))
+
+
+def _loaded_slice(record):
+    """The record's employee slice when the employee is already loaded, so no lookup is needed"""
+    employee = record._state.fields_cache.get('employee')
+    if employee is None or employee.id != record.employee_id:
+        return None
+    return {employee.id: (employee.department, employee.role)}
+
+
+@receiver(post_save, sender=EmployeeRequest)
+@receiver(post_delete, sender=EmployeeRequest)
+def employee_request_changed(sender, instance, **kwargs):
+    request_intervals.invalidate([instance.employee_id])
+
+
+@receiver(post_save, sender=TemporaryTag)
+@receiver(post_delete, sender=TemporaryTag)
+def temporary_tag_changed(sender, instance, **kwargs):
+    tag_intervals.invalidate([instance.employee_id])
+    invalidate_assignment_map()
+
+
+@receiver(post_init, sender=Employee)
+def remember_employee_slice(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields (.only()) are not fetched for every loaded row
+    instance._summary_slice = (instance.__dict__.get('department'), instance.__dict__.get('role'))
+
+
+@receiver(post_save, sender=Employee)
+def employee_changed(sender, instance, created, **kwargs):
+    """Move an employee's history to the new slice after a department or role change"""
+    # The department member map of the interval lookups follows department changes
+    old = getattr(instance, '_summary_slice', (None, None))
+    new = (instance.department, instance.role)
+    instance._summary_slice = new
+    if created or old[0] != new[0]:
+        invalidate_departments()
+    if created or None in old or old == new:
+        return
+    delta = SummaryDelta()
+    for state in AttendanceRecord.objects.filter(employee_id=instance.id).values(*RECORD_STATE_FIELDS):
+        delta.add(old, state, -1)
+        delta.add(new, state)
+    delta.apply()
+
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    invalidate_departments()
@@ -0,0 +1,80 @@
+"""
+Streaming JSON Responses
+Large list endpoints write their envelope as rows are read: any iterator value in the payload
+(e.g. serialized rows over queryset.iterator()) is emitted as a JSON array a batch at a time
+through StreamingHttpResponse, so memory stays flat however many rows match.
+Output is byte-compatible with DRF's JSONRenderer (compact, UTF-8, U+2028/9 escaped).
+Clients that negotiated another renderer (e.g. MessagePack) get a regular, fully built Response.
+
+The first batch of every array is read before the response is returned, so a failing query
+still reaches the view's error handling and becomes a 500. Once streaming has started the
+status is already sent: a later failure closes the array and ends the object with an
+"error" key, never truncated JSON. Streamed payloads cannot use that key themselves, so
+clients can tell an interrupted response by its presence alone.
+"""
+import logging
+from collections.abc import Iterator
+from itertools import chain, islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+
+from .renderers import dumps_json
+
+
+STREAM_CHUNK_SIZE = 2000  # Rows fetched per database round trip
+BATCH_SIZE = 500          # Rows encoded per chunk written to the client
+
+ERROR_KEY = 'error'  # Only ever written by an interrupted stream
+STREAM_ERROR = b',"' + ERROR_KEY.encode() + b'":"Response interrupted, please retry"}'
+
+logger = logging.getLogger(__name__)
+
+
+def _stream_array(rows, batch_size):
+    yield b'['
+    batch = []
+    separator = b''
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield separator + dumps_json(batch)[1:-1]
+            separator, batch = b',', []
+    if batch:
+        yield separator + dumps_json(batch)[1:-1]
+    yield b']'
+
+
+def _stream_object(payload, batch_size):
+    separator = b'{'
+    for key, value in payload.items():
+        yield separator + dumps_json(key) + b':'
+        separator = b','
+        if isinstance(value, Iterator):
+            try:
+                yield from _stream_array(value, batch_size)
+            except Exception:
+                # Batches are written whole, so closing the array here leaves valid JSON
+                logger.exception('Streaming "%s" failed after the response started', key)
+                yield b']' + STREAM_ERROR
+                return
+        else:
+            yield dumps_json(value)
+    yield b'{}' if separator == b'{' else b'}'
+
+
+def streaming_json_response(request, payload, batch_size=BATCH_SIZE):
+    """
+    Stream a dict as JSON; iterator values become arrays written as they are consumed.
+    Their first batch is read here, so errors up to that point raise in the calling view.
+    """
+    if ERROR_KEY in payload:
+        raise ValueError(f'"{ERROR_KEY}" is reserved for interrupted streams')
+    if request.accepted_renderer.format != 'json':
+        return Response({key: list(value) if isinstance(value, Iterator) else value
+                         for key, value in payload.items()})
+    payload = {
+        key: chain(list(islice(value, batch_size)), value) if isinstance(value, Iterator) else value
+        for key, value in payload.items()
+    }
+    return StreamingHttpResponse(_stream_object(payload, batch_size), content_type='application/json')
@@ -0,0 +1,63 @@
+from datetime import date, time
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from attendance.models import AttendanceRecord, DailyAttendanceSummary, EmployeeProfile, EmployeeRequest
+
+from .test_checkin import make_employee
+
+
+class AutoMarkAbsentTests(TestCase):
+    def setUp(self):
+        self.alice = make_employee('alice')
+        self.bob = make_employee('bob', department='HR')
+
+    def mark(self, *args, **options):
+        call_command('auto_mark_absent', *args, stdout=StringIO(), **options)
+
+    def absent_days(self, employee):
+        return sorted(AttendanceRecord.objects.filter(employee=employee, status='absent').values_list('date', flat=True))
+
+    def test_range_skips_weekends_and_existing_records(self):
+        AttendanceRecord.objects.create(employee=self.alice, date=date(2026, 3, 6), status='present',
+                                        type='office', check_in_time=time(9, 0))
+        self.mark('--from', '2026-03-05', '--to', '2026-03-09')  # Thursday to Monday
+        self.assertEqual(self.absent_days(self.alice), [date(2026, 3, 5), date(2026, 3, 9)])
+        self.assertEqual(self.absent_days(self.bob), [date(2026, 3, 5), date(2026, 3, 6), date(2026, 3, 9)])
+        self.assertEqual(AttendanceRecord.objects.get(employee=self.alice, date=date(2026, 3, 6)).status, 'present')
+
+        self.mark('--from', '2026-03-05', '--to', '2026-03-09')
+        self.assertEqual(AttendanceRecord.objects.count(), 6)
+
+    def test_include_weekends(self):
+        self.mark('--date', '2026-03-07', '--include-weekends')
+        self.assertEqual(self.absent_days(self.alice), [date(2026, 3, 7)])
+
+    def test_leave_joining_date_and_inactive_employees(self):
+        EmployeeRequest.objects.create(employee=self.alice, request_type='full_day', status='approved',
+                                       start_date=date(2026, 3, 2), end_date=date(2026, 3, 3))
+        EmployeeProfile.objects.create(employee=self.bob, date_of_joining=date(2026, 3, 3))
+        carol = make_employee('carol')
+        carol.is_active = False
+        carol.save()
+        self.mark('--from', '2026-03-02', '--to', '2026-03-04')
+        self.assertEqual(self.absent_days(self.alice), [date(2026, 3, 4)])
+        self.assertEqual(self.absent_days(self.bob), [date(2026, 3, 3), date(2026, 3, 4)])
+        self.assertEqual(self.absent_days(carol), [])
+
+    def test_counts_absentees_into_the_summary(self):
+        self.mark('--date', '2026-03-02')
+        row = DailyAttendanceSummary.objects.get(date=date(2026, 3, 2), department='IT')
+        self.assertEqual((row.total, row.absent, row.type_office), (1, 1, 1))
+
+    def test_dry_run_writes_nothing(self):
+        self.mark('--from', '2026-03-02', '--to', '2026-03-06', '--dry-run')
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_rejects_bad_ranges(self):
+        with self.assertRaises(CommandError):
+            self.mark('--from', '2026-03-06', '--to', '2026-03-02')
+        with self.assertRaises(CommandError):
+            self.mark('--date', '06/03/2026')
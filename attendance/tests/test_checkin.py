@@ -0,0 +1,58 @@
+from datetime import date, time
+
+from django.test import TestCase
+
+from attendance.checkin import upsert_check_in, upsert_check_ins
+from attendance.models import AttendanceRecord, Employee
+
+
+DAY = date(2026, 3, 2)
+
+
+def make_employee(username, department='IT', role='employee'):
+    return Employee.objects.create(
+        username=username, password='x', name=username.title(), email=f'{username}@example.com',
+        phone='0', department=department, primary_office='HQ', role=role,
+    )
+
+
+class UpsertCheckInTests(TestCase):
+    def setUp(self):
+        self.employee = make_employee('alice')
+
+    def check_in(self, employee=None, at=time(9, 5), **extra):
+        return upsert_check_in(
+            employee_id=(employee or self.employee).id, date=DAY, check_in_time=at,
+            type='office', status='present', **extra,
+        )
+
+    def test_creates_the_day_row(self):
+        record_id = self.check_in(location='12.9,77.6')
+        record = AttendanceRecord.objects.get(id=record_id)
+        self.assertEqual((record.employee_id, record.date, record.status), (self.employee.id, DAY, 'present'))
+        self.assertEqual(record.check_in_time, time(9, 5))
+        self.assertEqual(record.check_in_location, '12.9,77.6')
+
+    def test_second_check_in_is_refused(self):
+        first = self.check_in()
+        self.assertIsNone(self.check_in(at=time(10, 0)))
+        record = AttendanceRecord.objects.get()
+        self.assertEqual((record.id, record.check_in_time), (first, time(9, 5)))
+
+    def test_takes_over_an_absent_placeholder(self):
+        placeholder = AttendanceRecord.objects.create(
+            employee=self.employee, date=DAY, status='absent', type='office', total_hours=0,
+        )
+        self.assertEqual(self.check_in(), placeholder.id)
+        placeholder.refresh_from_db()
+        self.assertEqual((placeholder.status, placeholder.check_in_time), ('present', time(9, 5)))
+
+    def test_batch_applies_each_employee_once(self):
+        bob = make_employee('bob')
+        self.check_in(employee=bob)
+        applied = upsert_check_ins([
+            {'employee_id': employee.id, 'date': DAY, 'check_in_time': time(9, 0), 'type': 'office', 'status': 'present'}
+            for employee in (self.employee, bob)
+        ])
+        self.assertEqual(list(applied), [self.employee.id])
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
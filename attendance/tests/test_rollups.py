@@ -0,0 +1,85 @@
+from datetime import date, time
+from decimal import Decimal
+
+from django.test import TestCase
+
+from attendance.checkin import upsert_check_in
+from attendance.models import AttendanceRecord, DailyAttendanceSummary, OfficeLocation
+from attendance.rollups import SUMMARY_FIELDS, SUMMARY_KEY, aggregate_summaries, rebuild_daily_summary
+
+from .test_checkin import make_employee
+
+
+DAY = date(2026, 3, 2)
+
+
+def summary_rows(rows):
+    return {
+        tuple(getattr(row, name) for name in SUMMARY_KEY): {name: getattr(row, name) for name in SUMMARY_FIELDS}
+        for row in rows
+    }
+
+
+class DailySummaryTests(TestCase):
+    def setUp(self):
+        self.office = OfficeLocation.objects.create(
+            id='HQ', name='Head Office', address='-', latitude=Decimal('12.9'), longitude=Decimal('77.6'),
+        )
+        self.alice = make_employee('alice')
+        self.bob = make_employee('bob', department='HR')
+
+    def assertSummaryMatchesRecords(self):
+        """The incrementally maintained table equals a fresh aggregate of the records"""
+        expected = summary_rows(aggregate_summaries(AttendanceRecord.objects.all()))
+        actual = {
+            key: counts
+            for key, counts in summary_rows(DailyAttendanceSummary.objects.all()).items()
+            if any(counts.values())  # Rows whose records all moved away are left at zero
+        }
+        self.assertEqual(actual, expected)
+
+    def record(self, employee, day=DAY, **fields):
+        return AttendanceRecord.objects.create(
+            employee=employee, date=day, **{'status': 'present', 'type': 'office', 'total_hours': 0, **fields}
+        )
+
+    def test_saves_and_deletes_apply_deltas(self):
+        record = self.record(self.alice, office=self.office, check_in_time=time(9, 45))
+        self.record(self.bob, status='absent')
+        self.assertSummaryMatchesRecords()
+        row = DailyAttendanceSummary.objects.get(department='IT')
+        self.assertEqual((row.total, row.present, row.late_check_ins, row.office), (1, 1, 1, 'HQ'))
+
+        record.status, record.total_hours, record.check_out_time = 'half_day', Decimal('4.25'), time(14, 0)
+        record.save()
+        self.assertSummaryMatchesRecords()
+        record.delete()
+        self.assertSummaryMatchesRecords()
+
+    def test_check_in_takeover_moves_the_placeholder(self):
+        self.record(self.alice, status='absent')
+        upsert_check_in(employee_id=self.alice.id, date=DAY, check_in_time=time(9, 0),
+                        type='office', status='present', office_id='HQ')
+        upsert_check_in(employee_id=self.bob.id, date=DAY, check_in_time=time(9, 0), type='wfh', status='wfh')
+        self.assertSummaryMatchesRecords()
+        self.assertEqual(DailyAttendanceSummary.objects.get(department='IT', office='HQ').present, 1)
+
+    def test_department_change_moves_history(self):
+        self.record(self.alice)
+        self.record(self.alice, day=date(2026, 3, 3), status='wfh', type='wfh')
+        self.alice.department = 'Accounts'
+        self.alice.save()
+        self.assertSummaryMatchesRecords()
+        self.assertFalse(DailyAttendanceSummary.objects.filter(department='IT', total__gt=0).exists())
+
+    def test_office_delete_moves_rows_to_no_office(self):
+        self.record(self.alice, office=self.office)
+        self.office.delete()
+        self.assertSummaryMatchesRecords()
+        self.assertEqual(DailyAttendanceSummary.objects.get(department='IT', total__gt=0).office, '')
+
+    def test_rebuild_replaces_the_range(self):
+        self.record(self.alice)
+        AttendanceRecord.objects.update(status='leave')  # update() sends no signals
+        rebuild_daily_summary(DAY, DAY)
+        self.assertSummaryMatchesRecords()
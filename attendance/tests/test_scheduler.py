@@ -0,0 +1,108 @@
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from attendance import jobs  # noqa: F401  (registers the jobs)
+from attendance.models import AttendanceRecord, ScheduledJobLock, ScheduledJobRun
+from attendance.scheduler import JOBS, CronTrigger, Job, acquire_lock, missed_jobs, release_lock, run_job
+
+from .test_checkin import make_employee
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class CronTriggerTests(TestCase):
+    def test_fields(self):
+        trigger = CronTrigger('*/15 9-17 * * 1-5')
+        self.assertTrue(trigger.matches(local(2026, 3, 2, 9, 45)))  # Monday
+        self.assertFalse(trigger.matches(local(2026, 3, 2, 9, 50)))
+        self.assertFalse(trigger.matches(local(2026, 3, 2, 18, 0)))
+        self.assertFalse(trigger.matches(local(2026, 3, 1, 9, 45)))  # Sunday
+
+    def test_restricted_day_fields_match_either(self):
+        trigger = CronTrigger('0 0 1 * 1')  # The 1st of the month or any Monday
+        self.assertTrue(trigger.matches(local(2026, 4, 1, 0, 0)))  # Wednesday the 1st
+        self.assertTrue(trigger.matches(local(2026, 3, 2, 0, 0)))  # Monday the 2nd
+        self.assertFalse(trigger.matches(local(2026, 3, 3, 0, 0)))
+
+    def test_seven_is_sunday(self):
+        self.assertTrue(CronTrigger('0 2 * * 7').matches(local(2026, 3, 1, 2, 0)))
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '* * 0 * *', '5-1 * * * *', '*/0 * * * *'):
+            with self.assertRaises(ValueError):
+                CronTrigger(expression)
+
+    def test_previous(self):
+        trigger = CronTrigger('0 18 * * *')
+        self.assertEqual(trigger.previous(local(2026, 3, 2, 18, 0, 30)), local(2026, 3, 2, 18, 0))
+        self.assertEqual(trigger.previous(local(2026, 3, 2, 17, 59)), local(2026, 3, 1, 18, 0))
+        self.assertIsNone(CronTrigger('0 0 1 1 *').previous(local(2026, 3, 2, 0, 0)))
+
+
+class LeaderLockTests(TestCase):
+    def setUp(self):
+        self.job = Job('test_job', lambda stdout: None, CronTrigger('0 * * * *'), 60, '')
+        self.slot = local(2026, 3, 2, 9, 0)
+
+    def test_one_node_claims_a_slot(self):
+        self.assertTrue(acquire_lock(self.job, self.slot, node='a'))
+        self.assertFalse(acquire_lock(self.job, self.slot, node='b'))  # Leased
+        release_lock(self.job, node='a')
+        self.assertFalse(acquire_lock(self.job, self.slot, node='b'))  # Slot already served
+        self.assertTrue(acquire_lock(self.job, self.slot + timedelta(hours=1), node='b'))
+
+    def test_expired_lease_can_be_taken_over(self):
+        self.assertTrue(acquire_lock(self.job, node='a'))
+        self.assertFalse(acquire_lock(self.job, node='b'))
+        ScheduledJobLock.objects.filter(name='test_job').update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(acquire_lock(self.job, node='b'))
+
+    def test_run_job_records_failures_and_releases(self):
+        def fail(stdout):
+            stdout.write('starting\n')
+            raise RuntimeError('boom')
+        self.job.func = fail
+        with self.assertLogs('attendance.scheduler', 'ERROR'):
+            run = run_job(self.job, self.slot, node='a')
+        self.assertEqual(run.status, 'failed')
+        self.assertIn('starting', run.output)
+        self.assertIn('RuntimeError: boom', run.output)
+        self.assertEqual(ScheduledJobLock.objects.get(name='test_job').owner, '')
+        self.assertIsNone(run_job(self.job, self.slot, node='b'))
+
+
+class AbsenteeCatchUpTests(TestCase):
+    def setUp(self):
+        self.employee = make_employee('alice')
+        self.job = JOBS['mark_absentees']
+
+    def run_at(self, moment):
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            return run_job(self.job, node='a')
+
+    def absent_days(self):
+        return sorted(AttendanceRecord.objects.filter(employee=self.employee, status='absent').values_list('date', flat=True))
+
+    def test_first_run_marks_the_latest_passed_slot(self):
+        self.assertEqual(self.run_at(local(2026, 3, 5, 10, 0)).status, 'success')  # Thursday morning
+        self.assertEqual(self.absent_days(), [date(2026, 3, 4)])
+
+    def test_marks_every_day_since_the_last_success(self):
+        ScheduledJobRun.objects.create(job='mark_absentees', node='a', status='success',
+                                       started_at=local(2026, 3, 2, 18, 0, 5))
+        self.run_at(local(2026, 3, 5, 18, 1))
+        self.assertEqual(self.absent_days(), [date(2026, 3, 3), date(2026, 3, 4), date(2026, 3, 5)])
+        self.run_at(local(2026, 3, 5, 18, 30))
+        self.assertEqual(len(self.absent_days()), 3)
+
+    def test_startup_runs_unclaimed_catch_up_slots(self):
+        moment = local(2026, 3, 5, 19, 0)
+        self.assertIn((self.job, local(2026, 3, 5, 18, 0)), missed_jobs(moment))
+        acquire_lock(self.job, local(2026, 3, 5, 18, 0), node='a')
+        self.assertNotIn(self.job, [job for job, slot in missed_jobs(moment)])
+        self.assertFalse(any(job.name == 'refresh_rollups' for job, slot in missed_jobs(moment)))
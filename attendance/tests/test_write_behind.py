@@ -0,0 +1,67 @@
+import os
+import tempfile
+from datetime import date, time
+
+from django.test import TransactionTestCase
+
+from attendance.models import AttendanceRecord
+from attendance.write_behind import WriteBehindQueue, _decode, _encode
+
+from .test_checkin import make_employee
+
+
+DAY = date(2026, 3, 2)
+
+
+def check_in_event(employee_id, at=time(9, 0)):
+    return {'op': 'check_in', 'employee_id': employee_id, 'date': DAY, 'check_in_time': at,
+            'type': 'office', 'status': 'present'}
+
+
+class WriteBehindQueueTests(TransactionTestCase):
+    # The writer thread uses its own connection, so rows must be committed for it to see them
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal_path = os.path.join(directory.name, 'write_behind.journal')
+        self.dead_letter_path = os.path.join(directory.name, 'write_behind.dead')
+        self.employee = make_employee('alice')
+
+    def write_journal(self, *lines):
+        with open(self.journal_path, 'w', encoding='utf-8') as journal:
+            journal.write(''.join(line + '\n' for line in lines))
+
+    def run_queue(self):
+        queue = WriteBehindQueue(self.journal_path, dead_letter_path=self.dead_letter_path, interval_ms=1)
+        queue.stop()  # Applies everything buffered before returning
+        return queue
+
+    def test_replays_the_journal_and_truncates_it(self):
+        self.write_journal(_encode(check_in_event(self.employee.id)), '{"op": "check_in", "emp')  # torn last line
+        with self.assertLogs('attendance.write_behind', 'WARNING'):
+            self.run_queue()
+        record = AttendanceRecord.objects.get(employee=self.employee, date=DAY)
+        self.assertEqual(record.check_in_time, time(9, 0))
+        self.assertEqual(os.path.getsize(self.journal_path), 0)
+
+    def test_rejected_event_goes_to_the_dead_letter_file(self):
+        self.write_journal(_encode(check_in_event(999999)), _encode(check_in_event(self.employee.id)))
+        with self.assertLogs('attendance.write_behind', 'ERROR'):
+            self.run_queue()
+        self.assertTrue(AttendanceRecord.objects.filter(employee=self.employee, date=DAY).exists())
+        with open(self.dead_letter_path, encoding='utf-8') as dead_letter:
+            events = [_decode(line) for line in dead_letter]
+        self.assertEqual([event['employee_id'] for event in events], [999999])
+
+    def test_pending_duplicates_are_refused(self):
+        queue = WriteBehindQueue(self.journal_path, dead_letter_path=self.dead_letter_path, interval_ms=60000)
+        try:
+            event = check_in_event(self.employee.id)
+            del event['op']
+            self.assertTrue(queue.submit_check_in(**event))
+            self.assertFalse(queue.submit_check_in(**event))
+            self.assertIsNotNone(queue.pending_open_session(self.employee.id))
+        finally:
+            queue.stop()
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
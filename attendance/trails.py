@@ -0,0 +1,139 @@
+"""
+GPS Trail Store
+Field staff location tracks stored as packed float32/int32 arrays instead of JSON rows.
+Traces are simplified with Douglas-Peucker at ingest, so a full day costs kilobytes.
+"""
+from datetime import datetime
+
+import numpy as np
+from django.utils import timezone
+
+from .models import LocationTrail
+from .geofence import EARTH_RADIUS_M
+
+
+# 12 bytes per point: lat/lng as float32 (~1m precision), seconds since segment start as int32
+POINT_DTYPE = np.dtype([('lat', '<f4'), ('lng', '<f4'), ('t', '<i4')])
+DEFAULT_TOLERANCE_M = 10.0
+MAX_POINTS_PER_INGEST = 50000
+
+
+def pack_points(lats, lngs, offsets):
+    """Pack coordinate/offset arrays into the on-disk blob format"""
+    packed = np.empty(len(lats), dtype=POINT_DTYPE)
+    packed['lat'] = lats
+    packed['lng'] = lngs
+    packed['t'] = offsets
+    return packed.tobytes()
+
+
+def unpack_points(blob):
+    """Inverse of pack_points; returns a structured array with lat, lng, t fields"""
+    return np.frombuffer(bytes(blob), dtype=POINT_DTYPE)
+
+
+def douglas_peucker(lats, lngs, tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    Return a boolean mask of the points kept by Douglas-Peucker simplification.
+    Coordinates are projected to local meters (equirectangular), which is exact
+    enough at the scale of a single day's track.
+    """
+    n = len(lats)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    if n < 3:
+        return keep
+
+    lat0 = np.radians(np.mean(lats))
+    y = np.radians(np.asarray(lats, dtype=np.float64)) * EARTH_RADIUS_M
+    x = np.radians(np.asarray(lngs, dtype=np.float64)) * EARTH_RADIUS_M * np.cos(lat0)
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        seg_len = np.hypot(dx, dy)
+        if seg_len == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(dx * py - dy * px) / seg_len
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
+
+
+def ingest_trail(employee_id, lats, lngs, epoch_seconds, tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    Simplify and store a batch of points. Points are sorted by time and split
+    by local calendar date, producing one LocationTrail segment per day.
+    Returns the created segments.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    epoch = np.asarray(epoch_seconds, dtype=np.float64)
+
+    order = np.argsort(epoch, kind='stable')
+    lats, lngs, epoch = lats[order], lngs[order], epoch[order]
+
+    tz = timezone.get_current_timezone()
+    local_dates = np.array([
+        datetime.fromtimestamp(ts, tz).date().toordinal() for ts in epoch.tolist()
+    ])
+
+    segments = []
+    for day in np.unique(local_dates).tolist():
+        in_day = local_dates == day
+        day_lats, day_lngs, day_epoch = lats[in_day], lngs[in_day], epoch[in_day]
+        keep = douglas_peucker(day_lats, day_lngs, tolerance_m)
+
+        start_ts = float(day_epoch[0])
+        offsets = np.rint(day_epoch[keep] - start_ts).astype(np.int32)
+        segments.append(LocationTrail(
+            employee_id=employee_id,
+            date=datetime.fromordinal(day).date(),
+            started_at=datetime.fromtimestamp(start_ts, tz),
+            ended_at=datetime.fromtimestamp(float(day_epoch[-1]), tz),
+            raw_point_count=int(in_day.sum()),
+            point_count=int(keep.sum()),
+            points=pack_points(day_lats[keep], day_lngs[keep], offsets),
+        ))
+
+    return LocationTrail.objects.bulk_create(segments)
+
+
+def read_trail(employee_id, start_date, end_date=None):
+    """
+    Range read: {date: [[lat, lng, epoch_seconds], ...]} for an employee,
+    with segments merged per day in time order.
+    """
+    end_date = end_date or start_date
+    segments = LocationTrail.objects.filter(
+        employee_id=employee_id,
+        date__gte=start_date,
+        date__lte=end_date,
+    ).order_by('date', 'started_at').values_list('date', 'started_at', 'points')
+
+    days = {}
+    for day, started_at, blob in segments:
+        points = unpack_points(blob)
+        epoch = started_at.timestamp() + points['t'].astype(np.float64)
+        rows = np.column_stack([
+            np.round(points['lat'].astype(np.float64), 6),
+            np.round(points['lng'].astype(np.float64), 6),
+            epoch,
+        ])
+        days.setdefault(str(day), []).extend(rows.tolist())
+
+    return days
+
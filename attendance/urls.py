@@ -12,6 +12,9 @@ urlpatterns = [
     path('office', views.create_office, name='create_office'),
     path('office/<str:office_id>', views.office_detail, name='office_detail'),
     path('check-location', views.check_location, name='check_location'),
+    path('geofence-batch', views.geofence_batch, name='geofence_batch'),
+    path('location-trail', views.location_trail, name='location_trail'),
+    path('client-visits', views.client_visits, name='client_visits'),
     
     # Attendance
     path('mark-attendance', views.mark_attendance, name='mark_attendance'),
@@ -20,12 +23,15 @@ urlpatterns = [
     path('server-time', views.get_server_time, name='get_server_time'),
     path('today-attendance', views.today_attendance, name='today_attendance'),
     path('attendance-records', views.attendance_records, name='attendance_records'),
+    path('attendance-export', views.attendance_export, name='attendance_export'),
     path('monthly-stats', views.monthly_stats, name='monthly_stats'),
+    path('attendance-calendar', views.attendance_calendar, name='attendance_calendar'),
     path('wfh-eligibility', views.wfh_eligibility, name='wfh_eligibility'),
     path('wfh-request', views.wfh_request, name='wfh_request'),
     path('leave-request', views.leave_request, name='leave_request'),
     path('leave-request-approve', views.leave_request_approve, name='leave_request_approve'),
     path('wfh-request-approve', views.wfh_request_approve, name='wfh_request_approve'),
+    path('requests-bulk-approve', views.requests_bulk_approve, name='requests_bulk_approve'),
     path('my-requests', views.my_requests, name='my_requests'),
     
     # Profile
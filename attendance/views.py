@@ -3,8 +3,10 @@ from django.http import JsonResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
-from django.db.models import Q, Count, Sum, Avg
+from django.db import connection, transaction
+from django.db.models import Q, F, Count, Sum, Avg, Prefetch
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
@@ -26,24 +28,28 @@ from datetime import datetime, date, time, timedelta
 from .models import (
     Employee, EmployeeProfile, OfficeLocation, DepartmentOfficeAccess,
     AttendanceRecord, EmployeeRequest, EmployeeDocument, Task, BirthdayWish, TaskComment, Team,
-    TemporaryTag, TrainingLog
+    TemporaryTag, TrainingLog, ClientVisit, DailyAttendanceSummary
 )
 from django.contrib.auth.hashers import make_password, check_password
-
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371000  # Earth radius in meters
-    phi1 = math.radians(float(lat1))
-    phi2 = math.radians(float(lat2))
-    delta_phi = math.radians(float(lat2) - float(lat1))
-    delta_lambda = math.radians(float(lon2) - float(lon1))
-
-    a = math.sin(delta_phi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    return R * c
+from .photo_store import PhotoError, store_photo, is_photo_ref, photo_url
+from .geofence import get_office_index, evaluate_points, geofence_transitions, accuracy_tolerance
+from .trails import ingest_trail, read_trail, MAX_POINTS_PER_INGEST, DEFAULT_TOLERANCE_M
+from .checkin import upsert_check_in
+from .write_behind import get_write_behind_queue
+from .pagination import InvalidCursor, keyset_order, keyset_page, page_size
+from .streaming import STREAM_CHUNK_SIZE, streaming_json_response
+from .fieldsets import FieldSet, InvalidFields, Output
+from .exports import DIALECTS as EXPORT_DIALECTS, payroll_export_response
+from .rollups import RECORD_STATE_FIELDS, apply_record_changes, record_state
+from .intervals import request_intervals
+from .calendars import CALENDAR_COLUMNS, calendar_etag, month_days
+
+
+def _photo_field(value, size, request):
+    """Thumbnail URL for a stored photo reference; legacy inline values pass through"""
+    if is_photo_ref(value):
+        return photo_url(value, size, request)
+    return value or None
 
 
 @api_view(['POST'])
@@ -296,110 +302,389 @@ def offices_list(request):
 @api_view(['POST'])
 @parser_classes([JSONParser])
 def check_location(request):
-    """Check if user location is within office geofence"""
+    """Check if user location is within office geofence (nearest office when office_id is omitted)"""
     data = request.data
     user_lat = data.get('latitude')
     user_lng = data.get('longitude')
     office_id = data.get('office_id')
 
-    if not all([user_lat, user_lng, office_id]):
+    if not all([user_lat, user_lng]):
         return Response({
             'success': False,
-            'message': 'Latitude, longitude, and office_id are required'
+            'message': 'Latitude and longitude are required'
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        office = OfficeLocation.objects.get(id=office_id)
-        distance = calculate_distance(
-            user_lat, user_lng,
-            float(office.latitude), float(office.longitude)
-        )
+        user_lat, user_lng = float(user_lat), float(user_lng)
+        index = get_office_index()
+
+        if not office_id:
+            nearest = index.nearest(user_lat, user_lng)
+            if not nearest:
+                return Response({
+                    'success': False,
+                    'message': 'No active offices configured'
+                }, status=status.HTTP_404_NOT_FOUND)
+            office_id = nearest[0]
+
+        office = index.office(office_id)
+        if not office:
+            return Response({
+                'success': False,
+                'message': 'Office not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        distance, in_range = index.distance_to(office_id, user_lat, user_lng)
 
         return Response({
             'success': True,
+            'office_id': office_id,
             'distance': distance,
-            'in_range': distance <= office.radius_meters,
+            'in_range': bool(in_range),
             'office_location': {
-                'latitude': float(office.latitude),
-                'longitude': float(office.longitude),
-                'radius_meters': office.radius_meters,
+                'latitude': office['latitude'],
+                'longitude': office['longitude'],
+                'radius_meters': office['radius_meters'],
             }
         })
-    except OfficeLocation.DoesNotExist:
+    except (TypeError, ValueError):
         return Response({
             'success': False,
-            'message': 'Office not found'
-        }, status=status.HTTP_404_NOT_FOUND)
+            'message': 'Latitude and longitude must be numbers'
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
             'message': 'Failed to check location'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+MAX_GEOFENCE_BATCH_POINTS = 20000
+
+
+def _parse_trace_timestamp(value):
+    """Epoch seconds/milliseconds or ISO 8601 string -> epoch seconds (float)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) / 1000 if value > 1e11 else float(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed.timestamp()
+
+
 @api_view(['POST'])
 @parser_classes([JSONParser])
-def mark_attendance(request):
+def geofence_batch(request):
+    """Evaluate a GPS trace (thousands of points) against every office geofence in one call"""
+    points = request.data.get('points')
+
+    if not isinstance(points, list) or not points:
+        return Response({
+            'success': False,
+            'message': 'points must be a non-empty list of [latitude, longitude, timestamp]'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if len(points) > MAX_GEOFENCE_BATCH_POINTS:
+        return Response({
+            'success': False,
+            'message': f'At most {MAX_GEOFENCE_BATCH_POINTS} points per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        lats, lngs, raw_timestamps = [], [], []
+        for point in points:
+            if isinstance(point, dict):
+                lat, lng, ts = point.get('latitude'), point.get('longitude'), point.get('timestamp')
+            else:
+                lat, lng, ts = (list(point) + [None])[:3]
+            lats.append(float(lat))
+            lngs.append(float(lng))
+            raw_timestamps.append(ts)
+        epoch = [_parse_trace_timestamp(ts) for ts in raw_timestamps]
+    except (TypeError, ValueError):
+        return Response({
+            'success': False,
+            'message': 'Each point needs numeric latitude/longitude and an optional epoch or ISO timestamp'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        index = get_office_index()
+        inside, nearest_distance = evaluate_points(index, lats, lngs)
+
+        # Order transitions by time only when every point carries a timestamp
+        has_timestamps = all(ts is not None for ts in epoch)
+        transitions = geofence_transitions(index, inside, epoch if has_timestamps else None)
+        for event in transitions:
+            event['timestamp'] = raw_timestamps[event['point_index']]
+
+        return Response({
+            'success': True,
+            'count': len(lats),
+            'office_ids': [index.ids[i] if i >= 0 else None for i in inside.tolist()],
+            'nearest_distance': [round(d, 1) if d != float('inf') else None for d in nearest_distance.tolist()],
+            'inside_count': int((inside >= 0).sum()),
+            'transitions': transitions,
+        })
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'Failed to evaluate geofences'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET', 'POST'])
+@parser_classes([JSONParser])
+def location_trail(request):
+    """Upload (POST) or range-read (GET) the GPS trail of a Surveyor / client-visit employee"""
+    if request.method == 'GET':
+        employee_id = request.GET.get('employee_id')
+        start_date = request.GET.get('start_date') or request.GET.get('date')
+        end_date = request.GET.get('end_date') or start_date
+
+        if not employee_id or not start_date:
+            return Response({
+                'success': False,
+                'message': 'employee_id and date (or start_date/end_date) are required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            employee_id = int(employee_id)
+        except ValueError:
+            return Response({'success': False, 'message': 'employee_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'success': False, 'message': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            return Response({
+                'success': True,
+                'employee_id': employee_id,
+                'trail': read_trail(employee_id, start, end)
+            })
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'Failed to fetch location trail'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     data = request.data
     employee_id = data.get('employee_id')
-    now_local = timezone.localtime(timezone.now())
-    att_date = now_local.date()
-    
-    # 0. Restriction check: 9 AM - 6 PM for non-Surveyors
+    points = data.get('points')
+
+    if not employee_id or not isinstance(points, list) or not points:
+        return Response({
+            'success': False,
+            'message': 'employee_id and a non-empty points list are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if len(points) > MAX_POINTS_PER_INGEST:
+        return Response({
+            'success': False,
+            'message': f'At most {MAX_POINTS_PER_INGEST} points per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         employee = Employee.objects.get(id=employee_id)
-        assignment = employee.get_current_assignment()
-        is_admin = employee.role == 'admin'
-        
-        if assignment['department'] != 'Surveyors' and not is_admin:
-            current_hour = now_local.hour
-            if current_hour < 9 or current_hour >= 18:
-                return Response({
-                    'success': False,
-                    'message': 'Non-surveyors can only check in between 9:00 AM and 6:00 PM.'
-                }, status=status.HTTP_400_BAD_REQUEST)
     except Employee.DoesNotExist:
-        return Response({'success': False, 'message': 'Employee not found'}, status=404)
+        return Response({'success': False, 'message': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    # 1. Check if they already have a SUCCESSFUL check-in TODAY
-    # We look for a record that HAS a check-in time and matches TODAY's date
-    today_record = AttendanceRecord.objects.filter(
-        employee_id=employee_id, 
-        date=att_date
-    ).exclude(status='absent').first()
+    # Only field staff are tracked: Surveyors, or anyone checked in as a client visit today
+    today = timezone.localtime(timezone.now()).date()
+    if employee.get_current_assignment()['department'] != 'Surveyors' and not AttendanceRecord.objects.filter(
+        employee=employee, date=today, type='client'
+    ).exists():
+        return Response({
+            'success': False,
+            'message': 'Location trails are only recorded for Surveyors and client visits'
+        }, status=status.HTTP_403_FORBIDDEN)
 
-    if today_record and today_record.check_in_time:
+    try:
+        lats, lngs, epoch = [], [], []
+        for point in points:
+            if isinstance(point, dict):
+                lat, lng, ts = point.get('latitude'), point.get('longitude'), point.get('timestamp')
+            else:
+                lat, lng, ts = (list(point) + [None])[:3]
+            lats.append(float(lat))
+            lngs.append(float(lng))
+            epoch.append(_parse_trace_timestamp(ts))
+        if any(ts is None for ts in epoch):
+            raise ValueError('timestamp required')
+        tolerance = float(data.get('tolerance_m') or DEFAULT_TOLERANCE_M)
+    except (TypeError, ValueError):
         return Response({
             'success': False,
-            'message': 'Attendance already marked for today'
+            'message': 'Each point needs numeric latitude/longitude and an epoch or ISO timestamp'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    # 2. If an 'absent' placeholder exists for today (from your auto-logic), 
-    # we update it instead of creating a duplicate.
-    absent_record = AttendanceRecord.objects.filter(employee_id=employee_id, date=att_date, status='absent').first()
+    try:
+        segments = ingest_trail(employee.id, lats, lngs, epoch, tolerance)
+        return Response({
+            'success': True,
+            'message': 'Trail stored',
+            'received_points': len(points),
+            'stored_points': sum(seg.point_count for seg in segments),
+            'segments': len(segments)
+        })
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'Failed to store location trail'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def client_visits(request):
+    """List detected client/site visits (precomputed by the detect_client_visits job)"""
+    employee_id = request.GET.get('employee_id')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+
+    user_id = request.GET.get('user_id')
+    user = Employee.objects.filter(id=user_id).first() if user_id else None
+    is_manager = user and user.role == 'manager'
+
+    try:
+        visits_qs = ClientVisit.objects.select_related('employee', 'office')
+
+        if is_manager:
+            visits_qs = visits_qs.filter(Q(employee__manager=user) | Q(employee=user))
+        if employee_id:
+            visits_qs = visits_qs.filter(employee_id=employee_id)
+        if start_date:
+            visits_qs = visits_qs.filter(date__gte=start_date)
+        if end_date:
+            visits_qs = visits_qs.filter(date__lte=end_date)
+        if request.GET.get('client_only') in ['1', 'true', 'True']:
+            visits_qs = visits_qs.filter(office__isnull=True)
+
+        visits_data = [{
+            'id': v.id,
+            'employee_id': v.employee_id,
+            'employee_name': v.employee.name,
+            'date': str(v.date),
+            'start_time': timezone.localtime(v.start_time).strftime('%H:%M:%S'),
+            'end_time': timezone.localtime(v.end_time).strftime('%H:%M:%S'),
+            'latitude': v.latitude,
+            'longitude': v.longitude,
+            'dwell_minutes': v.dwell_minutes,
+            'office_id': v.office_id,
+            'office_name': v.office.name if v.office else None,
+        } for v in visits_qs.order_by('-date', 'employee_id', 'start_time')]
+
+        return Response({
+            'success': True,
+            'count': len(visits_data),
+            'visits': visits_data
+        })
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'Failed to fetch client visits'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@parser_classes([JSONParser])
+def mark_attendance(request):
+    data = request.data
+    employee_id = data.get('employee_id')
+    now_local = timezone.localtime(timezone.now())
+    att_date = now_local.date()
     
+    # 0. Restriction check: 9 AM - 6 PM for non-Surveyors
+    employee = Employee.objects.only('id', 'role', 'department').filter(id=employee_id).first()
+    if not employee:
+        return Response({'success': False, 'message': 'Employee not found'}, status=404)
+
+    current_hour = now_local.hour
+    if (current_hour < 9 or current_hour >= 18) and employee.role != 'admin':
+        # Temporary tags only matter outside the window, so the tag lookup is skipped during the morning rush
+        if employee.get_current_assignment()['department'] != 'Surveyors':
+            return Response({
+                'success': False,
+                'message': 'Non-surveyors can only check in between 9:00 AM and 6:00 PM.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Server-side geofence check for office check-ins (resolves the office if the client did not send one)
+    office_id = data.get('office_id')
+    if data.get('type') == 'office':
+        location = data.get('location') or {}
+        if not isinstance(location, dict) or location.get('latitude') is None or location.get('longitude') is None:
+            return Response({
+                'success': False,
+                'message': 'Location is required for office check-in'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        proximity = check_location_proximity(
+            location['latitude'], location['longitude'], office_id, accuracy=location.get('accuracy')
+        )
+        if not proximity['in_range']:
+            return Response({
+                'success': False,
+                'message': 'You are not within this office geofence' if office_id else 'You are not within any office geofence'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        office_id = proximity['office_id']
+
+    # Decode the photo into the blob store; only the short reference is saved on the record
+    photo_ref = None
+    if data.get('photo'):
+        try:
+            photo_ref = store_photo(data.get('photo'))
+        except PhotoError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # 1. One atomic upsert: creates today's row, or fills an absent/leave placeholder that
+    # has no check-in yet. A row that already has a check-in is left untouched.
+    check_in_time = now_local.time().replace(microsecond=0)
+    check_in = {
+        'employee_id': employee.id,
+        'date': att_date,
+        'check_in_time': check_in_time,
+        'type': data.get('type'),
+        'status': data.get('status'),
+        'office_id': office_id,
+        'location': data.get('location'),
+        'photo': photo_ref,
+        'department': employee.department,
+        'role': employee.role,
+    }
+    queue = get_write_behind_queue()
     try:
-        if absent_record:
-            absent_record.check_in_time = now_local.time().strftime('%H:%M:%S')
-            absent_record.status = data.get('status')
-            absent_record.type = data.get('type')
-            absent_record.check_in_location = data.get('location')
-            absent_record.save()
-            record = absent_record
+        if queue:
+            # Write-behind mode: journal the event and let the writer thread apply it
+            already_marked = AttendanceRecord.objects.filter(
+                employee_id=employee.id, date=att_date, check_in_time__isnull=False
+            ).exists()
+            record_id = None
+            queued = not already_marked and queue.submit_check_in(**check_in)
         else:
-            record = AttendanceRecord.objects.create(
-                employee_id=employee_id,
-                date=att_date,
-                check_in_time=now_local.time().strftime('%H:%M:%S'),
-                type=data.get('type'),
-                status=data.get('status'),
-                check_in_location=data.get('location'),
-                check_in_photo=data.get('photo'),
-                office_id=data.get('office_id')
-            )
-        return Response({'success': True, 'message': 'Checked in successfully'})
+            record_id = upsert_check_in(**check_in)
+            queued = False
     except Exception as e:
         return Response({'success': False, 'message': str(e)}, status=500)
 
+    if not (record_id or queued):
+        return Response({
+            'success': False,
+            'message': 'Attendance already marked for today'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'message': 'Checked in successfully',
+        'queued': queued,
+        'record': {
+            'id': record_id,
+            'date': str(att_date),
+            'check_in_time': check_in_time.strftime('%H:%M:%S'),
+            'type': data.get('type'),
+            'status': data.get('status'),
+            'office_id': office_id,
+        }
+    })
+
 @api_view(['GET'])
 def get_server_time(request):
     """Return the current server time in IST for frontend synchronization"""
@@ -527,20 +812,33 @@ def get_teams(request):
     except Exception as e:
         return Response({'success': False, 'message': str(e)})
 
-def check_location_proximity(lat, lng, office_id):
-    """Helper function to check location proximity"""
+def check_location_proximity(lat, lng, office_id=None, accuracy=None):
+    """
+    Helper function to check location proximity (resolves the containing office when office_id is None).
+    The reported GPS accuracy (capped by accuracy_tolerance) is taken off the distance.
+    """
     try:
-        office = OfficeLocation.objects.get(id=office_id)
-        distance = calculate_distance(
-            lat, lng,
-            float(office.latitude), float(office.longitude)
-        )
+        lat, lng = float(lat), float(lng)
+        tolerance = accuracy_tolerance(accuracy)
+        index = get_office_index()
+        if not office_id:
+            matches = index.within(lat, lng, tolerance_m=tolerance)
+            if not matches:
+                return {'success': True, 'office_id': None, 'in_range': False}
+            office_id, distance = matches[0]
+            return {'success': True, 'office_id': office_id, 'distance': distance, 'in_range': True}
+
+        result = index.distance_to(office_id, lat, lng, tolerance_m=tolerance)
+        if result is None:
+            return {'success': False, 'in_range': False}
+        distance, in_range = result
         return {
             'success': True,
+            'office_id': office_id,
             'distance': distance,
-            'in_range': distance <= office.radius_meters,
+            'in_range': bool(in_range),
         }
-    except:
+    except (TypeError, ValueError):
         return {'success': False, 'in_range': False}
 
 
@@ -549,23 +847,21 @@ def check_wfh_eligibility(employee_id, check_date):
     try:
         check_date_obj = datetime.strptime(check_date, '%Y-%m-%d').date()
         
+        employee_requests = request_intervals.employee(employee_id)
+
         # Check if there is an APPROVED WFH request for this date
-        has_approved_request = EmployeeRequest.objects.filter(
-            employee_id=employee_id,
-            request_type='wfh',
-            start_date__lte=check_date_obj,
-            end_date__gte=check_date_obj,
-            status='approved'
-        ).exists()
+        has_approved_request = any(
+            r['request_type'] == 'wfh' and r['status'] == 'approved'
+            for r in employee_requests.covering(check_date_obj)
+        )
 
         # Count approved WFH requests for the current month (for dashboard stats)
-        current_month_requests = EmployeeRequest.objects.filter(
-            employee_id=employee_id,
-            request_type='wfh',
-            status='approved',
-            start_date__year=check_date_obj.year,
-            start_date__month=check_date_obj.month
-        ).count()
+        month_start = check_date_obj.replace(day=1)
+        month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        current_month_requests = sum(
+            1 for r in employee_requests.overlapping(month_start, month_end)
+            if r['request_type'] == 'wfh' and r['status'] == 'approved' and r['start_date'] >= month_start
+        )
 
         return {
             'has_approved_request': has_approved_request,
@@ -585,34 +881,100 @@ def check_out(request):
     employee_id = data.get('employee_id')
     now_local = timezone.localtime(timezone.now())
     
+    queue = get_write_behind_queue()
+    
     try:
-        # Find the latest record that is NOT checked out
-        # This handles the case where they forgot to check out yesterday
-        record = AttendanceRecord.objects.filter(
-            employee_id=employee_id, 
-            check_out_time__isnull=True
-        ).exclude(status='absent').latest('date')
+        # In write-behind mode the open session, or its check-out, may still be sitting in the queue
+        pending_session = queue.pending_open_session(employee_id) if queue else None
+        if queue and not pending_session and queue.pending_check_out(employee_id):
+            return Response({'success': False, 'message': 'Already checked out'}, status=400)
+        if pending_session:
+            record = None
+            session_date, session_check_in = pending_session['date'], pending_session['check_in_time']
+        else:
+            # Find the latest record that is NOT checked out
+            # This handles the case where they forgot to check out yesterday
+            record = AttendanceRecord.objects.filter(
+                employee_id=employee_id, 
+                check_out_time__isnull=True
+            ).exclude(status='absent').latest('date')
+            session_date, session_check_in = record.date, record.check_in_time
 
         # Logic to handle if the session is too old (e.g., from yesterday)
         # You can choose to auto-close it or allow the checkout now.
         
-        check_in_t = datetime.strptime(str(record.check_in_time), '%H:%M:%S').time()
-        check_in_dt = timezone.make_aware(datetime.combine(record.date, check_in_t))
+        check_in_t = datetime.strptime(str(session_check_in), '%H:%M:%S').time()
+        check_in_dt = timezone.make_aware(datetime.combine(session_date, check_in_t))
         
         worked_hours = round((now_local - check_in_dt).total_seconds() / 3600, 2)
         
         if worked_hours < 4.5:
             return Response({'success': False, 'message': f'Worked only {worked_hours}h. Min 4.5h required.'}, status=400)
 
-        record.check_out_time = now_local.time().strftime('%H:%M:%S')
+        check_out_photo = None
+        if data.get('photo'):
+            try:
+                check_out_photo = store_photo(data.get('photo'))
+            except PhotoError as e:
+                return Response({'success': False, 'message': str(e)}, status=400)
+
+        check_out_time = now_local.time().replace(microsecond=0)
+        day_status = 'half_day' if worked_hours < 8 else 'present'
+
+        if queue:
+            if not queue.submit_check_out(employee_id, session_date, check_out_time, worked_hours, day_status, check_out_photo):
+                # Another request queued this session's check-out first
+                return Response({'success': False, 'message': 'Already checked out'}, status=400)
+            return Response({'success': True, 'message': 'Checked out successfully', 'queued': True})
+
+        if check_out_photo:
+            record.check_out_photo = check_out_photo
+        record.check_out_time = check_out_time.strftime('%H:%M:%S')
         record.total_hours = worked_hours
-        record.status = 'half_day' if worked_hours < 8 else 'present'
+        record.status = day_status
         record.save()
         
         return Response({'success': True, 'message': 'Checked out successfully'})
     except AttendanceRecord.DoesNotExist:
         return Response({'success': False, 'message': 'No active session found.'}, status=404)
 
+def _overlay_pending(record_data, pending, employee_id, today):
+    """Merge queued check-in/check-out events into today's record payload"""
+    check_in, check_out = pending['check_in'], pending['check_out']
+    if check_in and not (record_data and record_data['check_in_time']):
+        office = OfficeLocation.objects.filter(id=check_in['office_id']).values('name', 'address').first() \
+            if check_in['office_id'] else None
+        if record_data is None:
+            gender = EmployeeProfile.objects.filter(employee_id=employee_id).values_list('gender', flat=True).first()
+            record_data = {
+                'id': None,
+                'employee_id': int(employee_id),
+                'date': str(today),
+                'check_out_time': None,
+                'check_out_location': None,
+                'total_hours': 0.0,
+                'gender': gender or 'other',
+            }
+        record_data.update({
+            'check_in_time': str(check_in['check_in_time']),
+            'type': check_in['type'],
+            'status': check_in['status'],
+            'office_id': check_in['office_id'],
+            'office_name': office['name'] if office else None,
+            'office_address': office['address'] if office else None,
+            'check_in_location': check_in['location'],
+        })
+    if check_out and record_data and not record_data['check_out_time']:
+        record_data.update({
+            'check_out_time': str(check_out['check_out_time']),
+            'total_hours': float(check_out['total_hours']),
+            'status': check_out['status'],
+        })
+    if record_data is not None:
+        record_data['pending'] = True
+    return record_data
+
+
 @api_view(['GET'])
 def today_attendance(request):
     """Get today's attendance for an employee"""
@@ -650,15 +1012,19 @@ def today_attendance(request):
                 'total_hours': float(record.total_hours),
                 'gender': getattr(record.employee.profile, 'gender', 'other') if hasattr(record.employee, 'profile') else 'other',
             }
-            return Response({
-                'success': True,
-                'record': record_data
-            })
         else:
-            return Response({
-                'success': True,
-                'record': None
-            })
+            record_data = None
+
+        # Write-behind mode: serve events that are acknowledged but not committed yet
+        queue = get_write_behind_queue()
+        pending = queue.pending_state(employee_id, today) if queue else None
+        if pending:
+            record_data = _overlay_pending(record_data, pending, employee_id, today)
+
+        return Response({
+            'success': True,
+            'record': record_data
+        })
     except Exception as e:
         return Response({
             'success': False,
@@ -666,6 +1032,45 @@ def today_attendance(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _time_str(name):
+    def value(obj, request):
+        field_value = getattr(obj, name)
+        return str(field_value) if field_value else None
+    return value
+
+
+def _profile_attr(name, as_str=False):
+    def value(employee, request):
+        profile = getattr(employee, 'profile', None)
+        field_value = getattr(profile, name) if profile else None
+        return str(field_value) if as_str and field_value else field_value
+    return value
+
+
+ATTENDANCE_RECORD_FIELDS = FieldSet({
+    'id': Output('id'),
+    'employee_id': Output('employee'),
+    'employee_name': Output('employee__name', value=lambda r, request: r.employee.name),
+    'department': Output('employee__department', value=lambda r, request: r.employee.department),
+    'date': Output('date', value=lambda r, request: str(r.date)),
+    'check_in_time': Output('check_in_time', value=_time_str('check_in_time')),
+    'check_out_time': Output('check_out_time', value=_time_str('check_out_time')),
+    'type': Output('type'),
+    'status': Output('status', value=lambda r, request: r.status.lower()),
+    'office_id': Output('office'),
+    'office_name': Output('office__name', value=lambda r, request: r.office.name if r.office else None),
+    'office_address': Output('office__address', value=lambda r, request: r.office.address if r.office else None),
+    'check_in_location': Output('check_in_location'),
+    'check_out_location': Output('check_out_location'),
+    'check_in_photo': Output('check_in_photo', value=lambda r, request: _photo_field(r.check_in_photo, 'md', request)),
+    'check_out_photo': Output('check_out_photo', value=lambda r, request: _photo_field(r.check_out_photo, 'md', request)),
+    'photo_url': Output('check_in_photo', 'check_out_photo',
+                        value=lambda r, request: _photo_field(r.check_out_photo or r.check_in_photo, 'sm', request)),
+    'total_hours': Output('total_hours', value=lambda r, request: float(r.total_hours)),
+    'is_half_day': Output('is_half_day'),
+}, always=('id', 'date'))
+
+
 @api_view(['GET'])
 def attendance_records(request):
     """Get attendance records with filters"""
@@ -673,25 +1078,22 @@ def attendance_records(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     att_type = request.GET.get('type')
-    days_limit = request.GET.get('days_limit')
-    days_offset = int(request.GET.get('days_offset', 0))
+    cursor = request.GET.get('cursor')
+    # Unpaginated unless limit or cursor is given (calendar and export screens read whole ranges)
+    limit = page_size(request.GET.get('limit')) if request.GET.get('limit') or cursor else None
 
     user_id = request.GET.get('user_id')
     user = Employee.objects.filter(id=user_id).first() if user_id else None
     is_manager = user and user.role == 'manager'
 
-    # Auto-mark absentees for today after 12:00pm
-    now = timezone.localtime(timezone.now())
-    today = now.date()
-    if now.hour >= 18:
-        mark_absentees_for_date(today)
-
     try:
-        records_qs = AttendanceRecord.objects.select_related('employee', 'office').all()
+        fields = ATTENDANCE_RECORD_FIELDS.select(request)
+        records_qs = ATTENDANCE_RECORD_FIELDS.apply(AttendanceRecord.objects.all(), fields)
 
         if is_manager:
-            from django.db.models import Q
-            records_qs = records_qs.filter(Q(employee__manager=user) | Q(employee=user))
+            # An id list (not a join with OR) lets each employee's (employee, date, id) index serve the page
+            team_ids = Employee.objects.filter(Q(manager=user) | Q(id=user.id)).values('id')
+            records_qs = records_qs.filter(employee_id__in=team_ids)
 
         if employee_id:
             records_qs = records_qs.filter(employee_id=employee_id)
@@ -702,87 +1104,145 @@ def attendance_records(request):
         if att_type:
             records_qs = records_qs.filter(type=att_type)
 
-        has_more = False
-        if days_limit:
-            days_limit = int(days_limit)
-            # Get unique dates in DESC order
-            unique_dates = records_qs.values_list('date', flat=True).distinct().order_by('-date')
-            total_days = unique_dates.count()
-
-            target_dates = unique_dates[days_offset : days_offset + days_limit]
-            has_more = total_days > (days_offset + days_limit)
-
-            records_qs = records_qs.filter(date__in=target_dates)
+        if limit is None:
+            # Whole ranges (calendar, register export) are streamed instead of built in memory
+            records_qs = keyset_order(records_qs).iterator(chunk_size=STREAM_CHUNK_SIZE)
+            return streaming_json_response(request, {
+                'success': True,
+                'records': (ATTENDANCE_RECORD_FIELDS.serialize(record, fields, request) for record in records_qs),
+                'has_more': False,
+                'next_cursor': None
+            })
 
-        records_qs = records_qs.order_by('-date', '-created_at')
+        records, next_cursor = keyset_page(records_qs, cursor, limit)
 
-        records_data = []
-        for record in records_qs:
-            records_data.append({
-                'id': record.id,
-                'employee_id': record.employee_id,
-                'employee_name': record.employee.name,
-                'department': record.employee.department,
-                'date': str(record.date),
-                'check_in_time': str(record.check_in_time) if record.check_in_time else None,
-                'check_out_time': str(record.check_out_time) if record.check_out_time else None,
-                'type': record.type,
-                'status': record.status.lower(),
-                'office_id': record.office_id,
-                'office_name': record.office.name if record.office else None,
-                'office_address': record.office.address if record.office else None,
-                'check_in_location': record.check_in_location,
-                'check_out_location': record.check_out_location,
-                'check_in_photo': record.check_in_photo,
-                'check_out_photo': record.check_out_photo,
-                'photo_url': record.check_out_photo or record.check_in_photo or None,
-                'total_hours': float(record.total_hours),
-                'is_half_day': record.is_half_day,
-            })
+        records_data = [ATTENDANCE_RECORD_FIELDS.serialize(record, fields, request) for record in records]
 
         return Response({
             'success': True,
             'records': records_data,
-            'has_more': has_more
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor
         })
+    except (InvalidCursor, InvalidFields) as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
             'message': 'Failed to fetch attendance records'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def mark_absentees_for_date(target_date):
+
+@api_view(['GET'])
+def attendance_export(request):
+    """Stream attendance with approved leave as CSV/TSV for payroll (?file_type=csv|tsv)"""
+    file_type = request.GET.get('file_type', 'csv').lower()
+    department = request.GET.get('department')
+    office = request.GET.get('office')
+
+    user_id = request.GET.get('user_id')
+    user = Employee.objects.filter(id=user_id).first() if user_id else None
+
     try:
-        # Check if absentees already marked
-        if AttendanceRecord.objects.filter(
-            date=target_date,
-            status='absent'
-        ).exists():
-            return  # Already processed
+        start = datetime.strptime(request.GET.get('start_date', ''), '%Y-%m-%d').date()
+        end = datetime.strptime(request.GET.get('end_date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'start_date and end_date are required in YYYY-MM-DD format'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if end < start or file_type not in EXPORT_DIALECTS:
+        return Response({
+            'success': False,
+            'message': 'end_date must not be before start_date' if end < start else 'file_type must be csv or tsv'
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-        all_employees = Employee.objects.filter(is_active=True).values_list('id', flat=True)
-        existing_records = AttendanceRecord.objects.filter(date=target_date).values_list('employee_id', flat=True)
+    try:
+        employees = Employee.objects.all()
+        if user and user.role == 'manager':
+            employees = employees.filter(Q(manager=user) | Q(id=user.id))
+        elif user and user.role == 'employee':
+            employees = employees.filter(id=user.id)
+        if department:
+            employees = employees.filter(department=department)
+        if office:
+            employees = employees.filter(primary_office=office)
+
+        return payroll_export_response(employees, start, end, file_type)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'Failed to export attendance records'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        absentees = set(all_employees) - set(existing_records)
 
-        for emp_id in absentees:
-            AttendanceRecord.objects.create(
-                employee_id=emp_id,
-                date=target_date,
-                status='absent',
-                type='office',
-                total_hours=0
-            )
-    except:
-        pass
+WORKING_STATUSES = ['present', 'half_day', 'wfh', 'client']
+
+
+def monthly_stats_by_employee(employee_ids, year, month):
+    """
+    Monthly statistics for many employees ({employee_id: stats}) from one conditional
+    aggregate over attendance grouped by employee plus one over approved requests.
+    employee_ids=None means every active employee.
+    """
+    first = date(year, month, 1)
+    next_first = date(year + month // 12, month % 12 + 1, 1)
+    scope = employee_ids
+    if employee_ids is None:
+        scope = Employee.objects.filter(is_active=True).values('id')  # A subquery, not thousands of parameters
+        employee_ids = list(scope.order_by('id').values_list('id', flat=True))
+
+    records = AttendanceRecord.objects.filter(
+        employee_id__in=scope, date__gte=first, date__lt=next_first
+    ).values('employee_id').annotate(
+        working_days=Count('id', filter=Q(status__in=WORKING_STATUSES)),
+        hours=Sum('total_hours'),
+        half_day_records=Count('id', filter=Q(is_half_day=True)),
+        wfh_days=Count('id', filter=Q(type='wfh')),
+        office_days=Count('id', filter=Q(type='office', status='present')),
+        client_days=Count('id', filter=Q(type='client')),
+        leave_records=Count('id', filter=Q(status='leave')),
+    ).order_by()
+    by_employee = {row['employee_id']: row for row in records}
+
+    # Approved requests are counted by the month they start in
+    requests_by_employee = {
+        row['employee_id']: row
+        for row in EmployeeRequest.objects.filter(
+            employee_id__in=scope, status='approved', start_date__gte=first, start_date__lt=next_first
+        ).values('employee_id').annotate(
+            leave_requests=Count('id', filter=Q(request_type='full_day')),
+            half_day_requests=Count('id', filter=Q(request_type='half_day')),
+        ).order_by()
+    }
+
+    stats = {}
+    for employee_id in employee_ids:
+        row = by_employee.get(employee_id, {})
+        requests_row = requests_by_employee.get(employee_id, {})
+        stats[employee_id] = {
+            'total_working_days': row.get('working_days', 0),
+            'total_hours': float(row.get('hours') or 0),
+            # Frontend overrides absent with request; take whichever source counts more
+            'half_days': max(row.get('half_day_records', 0), requests_row.get('half_day_requests', 0)),
+            'wfh_days': row.get('wfh_days', 0),
+            'office_days': row.get('office_days', 0),
+            'client_days': row.get('client_days', 0),
+            'leave_days': max(row.get('leave_records', 0), requests_row.get('leave_requests', 0)),
+        }
+    return stats
 
 
 @api_view(['GET'])
 def monthly_stats(request):
-    """Get monthly attendance statistics"""
+    """
+    Get monthly attendance statistics. employee_id may also be a comma-separated
+    list of ids or "all", which returns one entry per employee.
+    """
     employee_id = request.GET.get('employee_id')
-    year = request.GET.get('year') or date.today().year
-    month = request.GET.get('month') or date.today().month
 
     if not employee_id:
         return Response({
@@ -790,56 +1250,45 @@ def monthly_stats(request):
             'message': 'Employee ID is required'
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        records = AttendanceRecord.objects.filter(
-            employee_id=employee_id,
-            date__year=year,
-            date__month=month
-        )
-
-        # Count approved leave requests from EmployeeRequest table
-        leave_requests = EmployeeRequest.objects.filter(
-            employee_id=employee_id,
-            request_type='full_day',
-            status='approved',
-            start_date__year=year,
-            start_date__month=month
-        ).count()
+    employee_ids = None
+    if employee_id != 'all':
+        values = [value.strip() for value in employee_id.split(',') if value.strip()]
+        if not values:
+            return Response({
+                'success': False,
+                'message': 'Employee ID is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not all(value.isascii() and value.isdigit() for value in values):
+            return Response({
+                'success': False,
+                'message': 'Invalid employee ID'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        employee_ids = [int(value) for value in values]
 
-        # Count records with status 'leave' in AttendanceRecord (standard fallback)
-        leave_records = records.filter(status='leave').count()
-        
-        # Use simple addition or max? Frontend overrides absent with request.
-        # Most accurate: take total from requests if they are the primary source.
-        total_leave_days = max(leave_records, leave_requests)
+    try:
+        year = int(request.GET.get('year') or date.today().year)
+        month = int(request.GET.get('month') or date.today().month)
+        date(year, month, 1)
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'Invalid year or month'
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Count approved half-day requests from EmployeeRequest table
-        half_day_requests = EmployeeRequest.objects.filter(
-            employee_id=employee_id,
-            request_type='half_day',
-            status='approved',
-            start_date__year=year,
-            start_date__month=month
-        ).count()
+    try:
+        stats = monthly_stats_by_employee(employee_ids, year, month)
 
-        # Count records with is_half_day=True in AttendanceRecord
-        half_day_records = records.filter(is_half_day=True).count()
-        
-        total_half_days = max(half_day_records, half_day_requests)
-
-        stats = {
-            'total_working_days': records.filter(Q(status='present') | Q(status='half_day') | Q(status='wfh') | Q(status='client')).count(),
-            'total_hours': float(records.aggregate(Sum('total_hours'))['total_hours__sum'] or 0),
-            'half_days': total_half_days,
-            'wfh_days': records.filter(type='wfh').count(),
-            'office_days': records.filter(type='office', status='present').count(),
-            'client_days': records.filter(type='client').count(),
-            'leave_days': total_leave_days,
-        }
+        if employee_id == 'all' or ',' in employee_id:
+            return Response({
+                'success': True,
+                'year': year,
+                'month': month,
+                'employees': [{'employee_id': emp_id, **emp_stats} for emp_id, emp_stats in stats.items()]
+            })
 
         return Response({
             'success': True,
-            'stats': stats
+            'stats': stats[employee_ids[0]]
         })
     except Exception as e:
         return Response({
@@ -848,6 +1297,58 @@ def monthly_stats(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+def attendance_calendar(request):
+    """
+    One employee's month for the calendar screen: a day-indexed array merging attendance
+    and requests, plus the monthly statistics. Answers 304 when If-None-Match matches.
+    """
+    employee_id = request.GET.get('employee_id')
+
+    if not employee_id:
+        return Response({
+            'success': False,
+            'message': 'Employee ID is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        employee_id = int(employee_id)
+        today = timezone.localtime(timezone.now()).date()
+        year = int(request.GET.get('year') or today.year)
+        month = int(request.GET.get('month') or today.month)
+        date(year, month, 1)
+    except ValueError:
+        return Response({
+            'success': False,
+            'message': 'Invalid employee ID, year or month'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not Employee.objects.filter(id=employee_id).exists():
+        return Response({'success': False, 'message': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        payload = {
+            'success': True,
+            'employee_id': employee_id,
+            'year': year,
+            'month': month,
+            'columns': CALENDAR_COLUMNS,
+            'days': month_days(employee_id, year, month),
+            'stats': monthly_stats_by_employee([employee_id], year, month)[employee_id],
+        }
+        etag = calendar_etag(payload, request.accepted_renderer.format)
+        response = get_conditional_response(request, etag=etag) or Response(payload)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Vary'] = 'Accept'
+        return response
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'Failed to fetch attendance calendar'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 def wfh_eligibility(request):
     """Check WFH eligibility"""
@@ -1106,6 +1607,23 @@ def check_profile_completeness(request):
         return Response({'success': False, 'message': str(e)}, status=500)
 
 
+EMPLOYEE_PROFILE_FIELDS = FieldSet({
+    'id': Output('id'),
+    'username': Output('username'),
+    'name': Output('name'),
+    'department': Output('department'),
+    'official_email': Output('email', value=lambda e, request: e.email),
+    'official_phone': Output('phone', value=lambda e, request: e.phone),
+    'personal_email': Output('profile__personal_email', value=_profile_attr('personal_email')),
+    'gender': Output('profile__gender', value=_profile_attr('gender')),
+    'date_of_birth': Output('profile__date_of_birth', value=_profile_attr('date_of_birth', as_str=True)),
+    'date_of_joining': Output('profile__date_of_joining', value=_profile_attr('date_of_joining', as_str=True)),
+    'skill_set': Output('profile__skill_set', value=_profile_attr('skill_set')),
+    'reporting_manager': Output('profile__reporting_manager', value=_profile_attr('reporting_manager')),
+    'docs_count': Output(annotate={'docs_count': Count('documents')}),
+})
+
+
 @api_view(['GET'])
 def admin_profiles_list(request):
     """List all employee profiles (admin)"""
@@ -1118,33 +1636,19 @@ def admin_profiles_list(request):
         if is_manager:
             employees_qs = employees_qs.filter(manager=user)
 
-        employees = employees_qs.select_related('profile')\
-            .annotate(docs_count=Count('documents'))\
-            .order_by('id')
-        profiles_data = []
-
-        for emp in employees:
-            profile = getattr(emp, 'profile', None)
-            profiles_data.append({
-                'id': emp.id,
-                'username': emp.username,
-                'name': emp.name,
-                'department': emp.department,
-                'official_email': emp.email,
-                'official_phone': emp.phone,
-                'personal_email': profile.personal_email if profile else None,
-                'gender': profile.gender if profile else None,
-                'date_of_birth': str(profile.date_of_birth) if profile and profile.date_of_birth else None,
-                'date_of_joining': str(profile.date_of_joining) if profile and profile.date_of_joining else None,
-                'skill_set': profile.skill_set if profile else None,
-                'reporting_manager': profile.reporting_manager if profile else None,
-                'docs_count': emp.docs_count,
-            })
+        fields = EMPLOYEE_PROFILE_FIELDS.select(request)
+        employees = EMPLOYEE_PROFILE_FIELDS.apply(employees_qs, fields).order_by('id')
+        profiles_data = [EMPLOYEE_PROFILE_FIELDS.serialize(emp, fields, request) for emp in employees]
 
         return Response({
             'success': True,
             'profiles': profiles_data
         })
+    except InvalidFields as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -1153,6 +1657,21 @@ def admin_profiles_list(request):
 
 
 # Admin Views
+ADMIN_USER_FIELDS = FieldSet({
+    'id': Output('id'),
+    'username': Output('username'),
+    'name': Output('name'),
+    'email': Output('email'),
+    'phone': Output('phone'),
+    'department': Output('department'),
+    'role': Output('role'),
+    'manager_name': Output('manager__name', value=lambda u, request: u.manager.name if u.manager else None),
+    'is_active': Output('is_active'),
+    'date_of_birth': Output('profile__date_of_birth', value=_profile_attr('date_of_birth', as_str=True)),
+    'gender': Output('profile__gender', value=_profile_attr('gender')),
+})
+
+
 @api_view(['GET'])
 def admin_users(request):
     """Get all users (admin)"""
@@ -1161,36 +1680,22 @@ def admin_users(request):
     is_manager = user and user.role == 'manager'
 
     try:
-        users = Employee.objects.all().order_by('-id').prefetch_related('profile')
+        fields = ADMIN_USER_FIELDS.select(request)
+        users = ADMIN_USER_FIELDS.apply(Employee.objects.all(), fields).order_by('-id')
         if is_manager:
             users = users.filter(manager=user)
-        
-        users_data = []
-        for u in users:
-            dob = None
-            gender = None
-            if hasattr(u, 'profile') and u.profile:
-                dob = str(u.profile.date_of_birth) if u.profile.date_of_birth else None
-                gender = u.profile.gender
-            
-            users_data.append({
-                'id': u.id,
-                'username': u.username,
-                'name': u.name,
-                'email': u.email,
-                'phone': u.phone,
-                'department': u.department,
-                'role': u.role,
-                'manager_name': u.manager.name if u.manager else None,
-                'is_active': u.is_active,
-                'date_of_birth': dob,
-                'gender': gender
-            })
+
+        users_data = [ADMIN_USER_FIELDS.serialize(u, fields, request) for u in users]
 
         return Response({
             'success': True,
             'users': users_data
         })
+    except InvalidFields as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -1695,40 +2200,36 @@ def admin_summary(request):
         today = date.today()
 
         employees_qs = Employee.objects.filter(is_active=True)
-        records_qs = AttendanceRecord.objects.filter(date=today)
-        
+        present_statuses = Q(status__in=['present', 'half_day'])
+
         if is_manager:
+            # The rollup has no manager dimension; count the team's records in one aggregate
             employees_qs = employees_qs.filter(manager=user)
-            records_qs = records_qs.filter(employee__manager=user)
+            counts = AttendanceRecord.objects.filter(date=today, employee__manager=user).aggregate(
+                present=Count('id', filter=present_statuses),
+                surveyors=Count('id', filter=present_statuses & Q(employee__department='Surveyors')),
+                absent=Count('id', filter=Q(status='absent')),
+                leave=Count('id', filter=Q(status='leave')),
+                wfh=Count('id', filter=Q(type='wfh')),
+            )
+        else:
+            # Aliases must not shadow the summary columns they sum
+            rollup = DailyAttendanceSummary.objects.filter(date=today).aggregate(
+                present_sum=Sum(F('present') + F('half_day')),
+                surveyors_sum=Sum(F('present') + F('half_day'), filter=Q(department='Surveyors')),
+                absent_sum=Sum('absent'),
+                leave_sum=Sum('leave'),
+                wfh_sum=Sum('type_wfh'),
+            )
+            counts = {key[:-len('_sum')]: value for key, value in rollup.items()}
 
         # Total employees
         total_employees = employees_qs.count()
-
-        # Present today
-        present_today = records_qs.filter(
-            status__in=['present', 'half_day']
-        ).count()
-
-        # Surveyors present today
-        surveyors_present = records_qs.filter(
-            status__in=['present', 'half_day'],
-            employee__department='Surveyors'
-        ).count()
-
-        # Absentees today
-        absentees_today = records_qs.filter(
-            status='absent'
-        ).count()
-
-        # On leave today
-        on_leave_today = records_qs.filter(
-            status='leave'
-        ).count()
-
-        # WFH today
-        wfh_today = records_qs.filter(
-            type='wfh'
-        ).count()
+        present_today = counts['present'] or 0
+        surveyors_present = counts['surveyors'] or 0
+        absentees_today = counts['absent'] or 0
+        on_leave_today = counts['leave'] or 0
+        wfh_today = counts['wfh'] or 0
 
         return Response({
             'success': True,
@@ -2335,6 +2836,21 @@ def send_birthday_wish(request):
 
 
 
+EMPLOYEE_REQUEST_FIELDS = FieldSet({
+    'id': Output('id'),
+    'employee_id': Output('employee'),
+    'employee_name': Output('employee__name', value=lambda q, request: q.employee.name),
+    'username': Output('employee__username', value=lambda q, request: q.employee.username),
+    'type': Output('request_type', value=lambda q, request: q.request_type),
+    'date': Output('start_date', value=lambda q, request: str(q.start_date)),  # Frontend uses this key currently
+    'start_date': Output('start_date', value=lambda q, request: str(q.start_date)),
+    'end_date': Output('end_date', value=lambda q, request: str(q.end_date)),
+    'reason': Output('reason'),
+    'status': Output('status'),
+    'created_at': Output('created_at', value=lambda q, request: q.created_at.isoformat()),
+})
+
+
 @api_view(['GET'])
 def pending_requests(request):
     """Get pending or history (approved/rejected) WFH and leave requests"""
@@ -2344,42 +2860,36 @@ def pending_requests(request):
 
     try:
         status_param = request.GET.get('status', 'pending')
-        
+        fields = EMPLOYEE_REQUEST_FIELDS.select(request)
+        requests_obj = EMPLOYEE_REQUEST_FIELDS.apply(EmployeeRequest.objects.all(), fields)
+
         if status_param == 'history':
             # Get approved and rejected requests
-            requests_obj = EmployeeRequest.objects.filter(
+            requests_obj = requests_obj.filter(
                 status__in=['approved', 'rejected']
-            ).select_related('employee').order_by('-start_date')
+            ).order_by('-start_date')
         else:
             # Get pending requests
-            requests_obj = EmployeeRequest.objects.filter(
+            requests_obj = requests_obj.filter(
                 status='pending'
-            ).select_related('employee').order_by('start_date')
+            ).order_by('start_date')
 
         if is_manager:
             requests_obj = requests_obj.filter(employee__manager=user)
 
-        requests_data = []
-        for req in requests_obj:
-            requests_data.append({
-                'id': req.id,
-                'employee_id': req.employee.id,
-                'employee_name': req.employee.name,
-                'username': req.employee.username,
-                'type': req.request_type,
-                'date': str(req.start_date), # Frontend uses this key currently
-                'start_date': str(req.start_date),
-                'end_date': str(req.end_date),
-                'reason': req.reason,
-                'status': req.status,
-                'created_at': req.created_at.isoformat()
-            })
-
-        return Response({
+        return streaming_json_response(request, {
             'success': True,
-            'count': len(requests_data),
-            'requests': requests_data
+            'count': requests_obj.count(),
+            'requests': (
+                EMPLOYEE_REQUEST_FIELDS.serialize(req, fields, request)
+                for req in requests_obj.iterator(chunk_size=STREAM_CHUNK_SIZE)
+            )
         })
+    except InvalidFields as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -2462,64 +2972,65 @@ def active_tasks(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def _get_admin_task_manager_data():
+def _task_assignees(task, request):
+    return [{'id': assignee.id, 'name': assignee.name} for assignee in task.assignees.all()]
+
+
+def _task_comments(task, request):
+    return [{
+        'id': comment.id,
+        'author_name': comment.author.name,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat()
+    } for comment in task.comments.all()]
+
+
+TASK_FIELDS = FieldSet({
+    'id': Output('id'),
+    'title': Output('title'),
+    'description': Output('description'),
+    'status': Output('status'),
+    'priority': Output('priority'),
+    'assignees': Output(value=_task_assignees, prefetch=[
+        Prefetch('assignees', queryset=Employee.objects.only('id', 'name')),
+    ]),
+    'manager_id': Output('manager'),
+    'manager_name': Output('manager__name', value=lambda t, request: t.manager.name if t.manager else None),
+    'created_by': Output('created_by', value=lambda t, request: t.created_by_id),
+    'created_by_name': Output('created_by__name', value=lambda t, request: t.created_by.name),
+    'due_date': Output('due_date', value=lambda t, request: str(t.due_date) if t.due_date else None),
+    'created_at': Output('created_at', value=lambda t, request: t.created_at.isoformat()),
+    'updated_at': Output('updated_at', value=lambda t, request: t.updated_at.isoformat()),
+    'comments': Output(value=_task_comments, prefetch=[
+        Prefetch('comments', queryset=TaskComment.objects.select_related('author')),
+    ]),
+})
+
+
+def _get_admin_task_manager_data(fields=None):
     """Helper: Get all tasks for Admin Task Manager"""
-    tasks = Task.objects.select_related('created_by', 'manager').prefetch_related('assignees').order_by('-created_at')
-    return _serialize_tasks(tasks)
+    tasks = Task.objects.order_by('-created_at')
+    return _serialize_tasks(tasks, fields)
 
-def _get_employee_my_tasks_data(employee):
-    """Helper: Get assigned tasks + overseen tasks for Employee My Tasks"""
-    tasks = Task.objects.filter(
+def _employee_my_tasks(employee):
+    """Helper: Assigned tasks + overseen tasks for Employee My Tasks"""
+    return Task.objects.filter(
         Q(assignees=employee) | Q(manager=employee)
-    ).distinct().select_related('created_by', 'manager').prefetch_related('assignees').order_by('-created_at')
-    return _serialize_tasks(tasks)
+    ).distinct().order_by('-created_at')
 
-def _get_manager_employees_tasks_data(manager):
-    """Helper: Get tasks for employees reporting to this manager + tasks explicitly managed by them"""
-    tasks = Task.objects.filter(
+def _manager_employees_tasks(manager):
+    """Helper: Tasks of employees reporting to this manager + tasks explicitly managed by them"""
+    return Task.objects.filter(
         Q(assignees__manager=manager) | Q(manager=manager)
-    ).distinct().select_related('created_by', 'manager').prefetch_related('assignees').order_by('-created_at')
-    return _serialize_tasks(tasks)
-
-def _serialize_tasks(tasks):
-    """Helper: Serialize task list with comments"""
-    data = []
-    for task in tasks:
-        # Get comments for each task
-        comments = []
-        for comment in task.comments.all().select_related('author'):
-            comments.append({
-                'id': comment.id,
-                'author_name': comment.author.name,
-                'content': comment.content,
-                'created_at': comment.created_at.isoformat()
-            })
-
-        # Get all assignees
-        assignees_info = []
-        for assignee in task.assignees.all():
-            assignees_info.append({
-                'id': assignee.id,
-                'name': assignee.name
-            })
+    ).distinct().order_by('-created_at')
 
-        data.append({
-            'id': task.id,
-            'title': task.title,
-            'description': task.description,
-            'status': task.status,
-            'priority': task.priority,
-            'assignees': assignees_info,
-            'manager_id': task.manager.id if task.manager else None,
-            'manager_name': task.manager.name if task.manager else None,
-            'created_by': task.created_by.id,
-            'created_by_name': task.created_by.name,
-            'due_date': str(task.due_date) if task.due_date else None,
-            'created_at': task.created_at.isoformat(),
-            'updated_at': task.updated_at.isoformat(),
-            'comments': comments
-        })
-    return data
+def _serialize_tasks(tasks, fields=None):
+    """Helper: Serialize a task queryset (or list of tasks) with assignees and comments"""
+    if fields is None:
+        fields = list(TASK_FIELDS.outputs)
+    if hasattr(tasks, 'query'):
+        tasks = TASK_FIELDS.apply(tasks, fields)
+    return [TASK_FIELDS.serialize(task, fields) for task in tasks]
 
 def _create_task_admin(data, creator):
     """Helper: Admin creates a task"""
@@ -2563,19 +3074,19 @@ def tasks_api(request):
 
             try:
                 emp = Employee.objects.get(id=employee_id)
+                fields = TASK_FIELDS.select(request)
 
                 if emp.role == 'admin':
                     # ADMIN PATH
-                    tasks_data = _get_admin_task_manager_data()
+                    tasks_data = _get_admin_task_manager_data(fields)
                 elif emp.role == 'manager':
                     # MANAGER PATH - Sees their own tasks + their employees' tasks
-                    own_tasks = _get_employee_my_tasks_data(emp)
-                    subordinate_tasks = _get_manager_employees_tasks_data(emp)
-                    # Merge and remove duplicates if any (though shouldn't be)
-                    tasks_data = own_tasks + [t for t in subordinate_tasks if t['id'] not in [ot['id'] for ot in own_tasks]]
+                    own_tasks = _employee_my_tasks(emp)
+                    subordinate_tasks = _manager_employees_tasks(emp).exclude(id__in=own_tasks.values('id'))
+                    tasks_data = _serialize_tasks(own_tasks, fields) + _serialize_tasks(subordinate_tasks, fields)
                 else:
                     # EMPLOYEE PATH
-                    tasks_data = _get_employee_my_tasks_data(emp)
+                    tasks_data = _serialize_tasks(_employee_my_tasks(emp), fields)
 
                 return Response({
                     'success': True,
@@ -2585,6 +3096,11 @@ def tasks_api(request):
             except Employee.DoesNotExist:
                 return Response({'success': True, 'tasks': []})
 
+        except InvalidFields as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'success': False,
@@ -3014,36 +3530,57 @@ def leave_request(request):
         else:
             return Response({'success': False, 'message': 'Date(s) required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            employee = Employee.objects.get(id=employee_id)
-        except Employee.DoesNotExist:
-            return Response({'success': False, 'message': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        created_count = 0
+        # Invalid and repeated dates are skipped, as are dates an existing request already covers
+        requested = set()
         skipped_count = 0
-
         for d_str in target_dates:
             try:
                 req_date = datetime.strptime(d_str, '%Y-%m-%d').date()
-                
-                # Check existing
-                existing = EmployeeRequest.objects.filter(employee=employee, start_date=req_date).first()
-                if existing:
-                    skipped_count += 1
-                    continue
+            except (TypeError, ValueError):
+                skipped_count += 1
+                continue
+            if req_date in requested:
+                skipped_count += 1
+            requested.add(req_date)
+
+        with transaction.atomic():
+            # Locking the employee row serializes concurrent submissions for the same person
+            employee = Employee.objects.select_for_update().filter(id=employee_id).first()
+            if employee is None:
+                return Response({'success': False, 'message': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            covered = set()
+            if requested:
+                existing = EmployeeRequest.objects.filter(
+                    employee=employee, start_date__lte=max(requested), end_date__gte=min(requested)
+                ).values_list('start_date', 'end_date')
+                for start, end in existing:
+                    covered.update(d for d in requested if start <= d <= end)
+            new_dates = sorted(requested - covered)
+            skipped_count += len(covered)
+
+            # One request per date, or per run of consecutive dates with merge_ranges
+            runs = []
+            for req_date in new_dates:
+                if data.get('merge_ranges') and runs and runs[-1][1] + timedelta(days=1) == req_date:
+                    runs[-1][1] = req_date
+                else:
+                    runs.append([req_date, req_date])
 
-                EmployeeRequest.objects.create(
+            EmployeeRequest.objects.bulk_create([
+                EmployeeRequest(
                     employee=employee,
                     request_type=r_type,
-                    start_date=req_date,
-                    end_date=req_date,
+                    start_date=start,
+                    end_date=end,
                     reason=reason,
                     status='pending',
                     half_day_period=period if r_type == 'half_day' else None
                 )
-                created_count += 1
-            except Exception:
-                skipped_count += 1
+                for start, end in runs
+            ])
+            request_intervals.invalidate([employee.id])  # bulk_create sends no signals
+        created_count = len(new_dates)
 
         if created_count == 0 and skipped_count > 0:
             return Response({'success': False, 'message': 'Requests already exist for selected date(s)'}, status=status.HTTP_400_BAD_REQUEST)
@@ -3052,7 +3589,8 @@ def leave_request(request):
             'success': True, 
             'message': f'Submitted {created_count} request(s). {skipped_count} skipped.',
             'created_count': created_count,
-            'skipped_count': skipped_count
+            'skipped_count': skipped_count,
+            'request_count': len(runs)
         })
     except Exception as e:
         return Response({'success': False, 'message': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -3116,6 +3654,132 @@ def leave_request_approve(request):
         return Response({'success': False, 'message': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Attendance written for each day of an approved leave: (status, type, is_half_day).
+# WFH approvals write nothing; the employee checks in with the WFH button.
+LEAVE_ATTENDANCE = {
+    'full_day': ('leave', 'office', False),
+    'half_day': ('half_day', 'office', True),
+}
+
+
+def _apply_approved_leave(requests):
+    """Upsert the attendance rows of approved leave requests in one statement; returns the rows written"""
+    records = {}
+    for req in sorted(requests, key=lambda r: r.request_type == 'full_day'):
+        if req.request_type not in LEAVE_ATTENDANCE:
+            continue
+        attendance_status, attendance_type, is_half = LEAVE_ATTENDANCE[req.request_type]
+        current_date = req.start_date
+        while current_date <= req.end_date:
+            # One row per (employee, date); overlapping full-day leave is applied last and wins
+            records[(req.employee_id, current_date)] = AttendanceRecord(
+                employee_id=req.employee_id,
+                date=current_date,
+                type=attendance_type,
+                status=attendance_status,
+                is_half_day=is_half,
+                notes=f'Approved {req.request_type} request',
+            )
+            current_date += timedelta(days=1)
+    if not records:
+        return 0
+    records = list(records.values())
+
+    # The upsert sends no model signals: lock the rows it will overwrite so their summary
+    # contribution can be moved from the stored values to the leave values
+    existing = AttendanceRecord.objects.select_for_update().filter(
+        employee_id__in={r.employee_id for r in records},
+        date__in={r.date for r in records},
+    ).values(*RECORD_STATE_FIELDS)
+    previous = {(row['employee_id'], row['date']): row for row in existing}
+
+    # Same fields update_or_create would set; check-in data on existing rows is kept
+    conflict_target = {'unique_fields': ['employee', 'date']} if connection.features.supports_update_conflicts_with_target else {}
+    AttendanceRecord.objects.bulk_create(
+        records,
+        batch_size=1000,
+        update_conflicts=True,
+        update_fields=['type', 'status', 'is_half_day', 'notes', 'updated_at'],
+        **conflict_target,
+    )
+
+    summary_changes = []
+    for r in records:
+        old = previous.get((r.employee_id, r.date))
+        leave = {'type': r.type, 'status': r.status, 'is_half_day': r.is_half_day}
+        summary_changes.append((old, {**old, **leave} if old else record_state(r)))
+    apply_record_changes(summary_changes)
+    return len(records)
+
+
+@api_view(['POST'])
+@parser_classes([JSONParser])
+def requests_bulk_approve(request):
+    """Approve or reject many WFH/leave requests in one transaction"""
+    data = request.data
+    request_ids = data.get('request_ids') or []
+    status_val = data.get('status', 'approved')
+    admin_response = data.get('admin_response', '')
+    reviewer_id = data.get('reviewed_by')
+
+    if not isinstance(request_ids, list) or not request_ids:
+        return Response({
+            'success': False,
+            'message': 'request_ids must be a non-empty list'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if status_val not in ('approved', 'rejected'):
+        return Response({
+            'success': False,
+            'message': "status must be 'approved' or 'rejected'"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        reviewer = Employee.objects.filter(id=reviewer_id).first() if reviewer_id else None
+        if reviewer is None:
+            reviewer = Employee.objects.filter(role='admin').first()
+
+        results = {}
+        with transaction.atomic():
+            found = {
+                req.id: req for req in EmployeeRequest.objects.select_for_update().filter(id__in=[
+                    request_id for request_id in request_ids if str(request_id).isdigit()
+                ]).only('id', 'employee_id', 'request_type', 'start_date', 'end_date', 'status')
+            }
+            changed = [req for req in found.values() if req.status != status_val]
+            now = timezone.now()
+            EmployeeRequest.objects.filter(id__in=[req.id for req in changed]).update(
+                status=status_val,
+                admin_response=admin_response,
+                reviewed_at=now,
+                reviewed_by=reviewer,
+                updated_at=now,
+            )
+            records_written = _apply_approved_leave(changed) if status_val == 'approved' else 0
+            request_intervals.invalidate({req.employee_id for req in changed})  # update() sends no signals
+
+        for request_id in request_ids:
+            req = found.get(int(request_id)) if str(request_id).isdigit() else None
+            if req is None:
+                results[request_id] = {'request_id': request_id, 'success': False, 'message': 'Request not found'}
+            elif req.status == status_val:
+                results[request_id] = {'request_id': request_id, 'success': True, 'message': f'Already {status_val}'}
+            else:
+                results[request_id] = {'request_id': request_id, 'success': True, 'message': f'Request {status_val}'}
+
+        return Response({
+            'success': True,
+            'message': f'{len(changed)} request(s) {status_val}',
+            'updated_count': len(changed),
+            'attendance_records_written': records_written,
+            'results': list(results.values())
+        })
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'Failed to update requests'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 
 @api_view(['GET'])
 def attendance_predictions(request):
@@ -3201,11 +3865,11 @@ def intelligence_hub_trends(request):
         from .intelligence_hub import get_company_overview
         
         days = int(request.GET.get('days', 30))
-        overview_data = get_company_overview(days)
+        overview_data = get_company_overview(days, stream_employees=True)
         
-        return Response({
+        return streaming_json_response(request, {
             'success': True,
-            **overview_data  # Unpacks summary, departments, employees, trends
+            **overview_data  # Unpacks summary, departments, employees (streamed), trends
         })
     except Exception as e:
         import traceback
@@ -0,0 +1,186 @@
+"""
+Client Visit Detection
+Clusters field staff GPS trails into dwell visits with a grid-hashed, DBSCAN-style pass.
+Trails are Douglas-Peucker simplified, so stationary stretches shrink to a few points;
+density is therefore measured in dwell seconds per grid cell rather than point counts.
+"""
+from datetime import datetime
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClientVisit, LocationTrail
+from .geofence import EARTH_RADIUS_M, evaluate_points, get_office_index
+from .trails import unpack_points
+
+
+DEFAULT_EPS_M = 60.0            # grid cell size / neighbourhood radius
+DEFAULT_MIN_DWELL_S = 10 * 60   # a visit must last at least 10 minutes
+DEFAULT_MAX_GAP_S = 30 * 60     # cap on dwell credited to a single point (GPS gaps)
+
+_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def cluster_points(lats, lngs, epoch, eps_m=DEFAULT_EPS_M, min_dwell_s=DEFAULT_MIN_DWELL_S,
+                   max_gap_s=DEFAULT_MAX_GAP_S):
+    """
+    Label each (time-sorted) point with a cluster id, or -1 for movement/noise.
+    A grid cell is "core" when it and its 8 neighbours hold at least min_dwell_s
+    of dwell time; connected core cells form a cluster and adjacent cells join
+    it as border cells.
+    """
+    n = len(lats)
+    if n == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+
+    weights = np.minimum(np.diff(epoch, append=epoch[-1]), max_gap_s).clip(min=0)
+
+    lat0 = np.radians(np.mean(lats))
+    y = np.radians(lats) * EARTH_RADIUS_M
+    x = np.radians(lngs) * EARTH_RADIUS_M * np.cos(lat0)
+    cells = np.stack([np.floor(x / eps_m), np.floor(y / eps_m)], axis=1).astype(np.int64)
+
+    unique_cells, point_cell = np.unique(cells, axis=0, return_inverse=True)
+    point_cell = point_cell.reshape(-1)
+    cell_weight = np.bincount(point_cell, weights=weights, minlength=len(unique_cells))
+    cell_pos = {(int(cx), int(cy)): i for i, (cx, cy) in enumerate(unique_cells.tolist())}
+
+    def neighbours(cx, cy):
+        for dx, dy in _NEIGHBOURS:
+            j = cell_pos.get((cx + dx, cy + dy))
+            if j is not None:
+                yield j
+
+    keys = [tuple(c) for c in unique_cells.tolist()]
+    core = np.array([
+        sum(cell_weight[j] for j in neighbours(*key)) >= min_dwell_s for key in keys
+    ], dtype=bool)
+
+    cell_label = np.full(len(unique_cells), -1, dtype=np.intp)
+    next_label = 0
+    for start in np.flatnonzero(core).tolist():
+        if cell_label[start] >= 0:
+            continue
+        cell_label[start] = next_label
+        stack = [start]
+        while stack:
+            i = stack.pop()
+            for j in neighbours(*keys[i]):
+                if cell_label[j] >= 0:
+                    continue
+                cell_label[j] = next_label
+                if core[j]:
+                    stack.append(j)  # only core cells expand the cluster
+        next_label += 1
+
+    return cell_label[point_cell], weights
+
+
+def detect_visits(lats, lngs, epoch, eps_m=DEFAULT_EPS_M, min_dwell_s=DEFAULT_MIN_DWELL_S,
+                  max_gap_s=DEFAULT_MAX_GAP_S):
+    """
+    Turn one day's trace into visits: [{start, end, lat, lng, dwell_s, points}].
+    A visit is a run of consecutive points in the same cluster; start/end are epoch seconds.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    epoch = np.asarray(epoch, dtype=np.float64)
+    order = np.argsort(epoch, kind='stable')
+    lats, lngs, epoch = lats[order], lngs[order], epoch[order]
+
+    labels, weights = cluster_points(lats, lngs, epoch, eps_m, min_dwell_s, max_gap_s)
+    if not len(labels):
+        return []
+
+    # Split into runs wherever the label changes
+    boundaries = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate([[0], boundaries])
+    stops = np.concatenate([boundaries, [len(labels)]])
+
+    visits = []
+    for a, b in zip(starts.tolist(), stops.tolist()):
+        if labels[a] < 0:
+            continue
+        dwell = float(epoch[b - 1] + weights[b - 1] - epoch[a])
+        if dwell < min_dwell_s:
+            continue
+        w = weights[a:b]
+        if w.sum() > 0:
+            lat, lng = np.average(lats[a:b], weights=w), np.average(lngs[a:b], weights=w)
+        else:
+            lat, lng = lats[a:b].mean(), lngs[a:b].mean()
+        visits.append({
+            'start': float(epoch[a]),
+            'end': float(epoch[a] + dwell),
+            'lat': float(lat),
+            'lng': float(lng),
+            'dwell_s': dwell,
+            'points': b - a,
+        })
+    return visits
+
+
+def load_daily_traces(start_date, end_date, employee_ids=None):
+    """Yield (employee_id, date, lats, lngs, epoch) per employee-day from stored trails"""
+    segments = LocationTrail.objects.filter(date__gte=start_date, date__lte=end_date)
+    if employee_ids:
+        segments = segments.filter(employee_id__in=employee_ids)
+    segments = segments.order_by('employee_id', 'date', 'started_at') \
+        .values_list('employee_id', 'date', 'started_at', 'points') \
+        .iterator(chunk_size=500)
+
+    current, parts = None, []
+    for employee_id, day, started_at, blob in segments:
+        if current is not None and current != (employee_id, day):
+            yield (*current, *_concat(parts))
+            parts = []
+        current = (employee_id, day)
+        points = unpack_points(blob)
+        parts.append((points['lat'], points['lng'], started_at.timestamp() + points['t'].astype(np.float64)))
+    if current is not None:
+        yield (*current, *_concat(parts))
+
+
+def _concat(parts):
+    return tuple(np.concatenate([p[k] for p in parts]).astype(np.float64) for k in range(3))
+
+
+def rebuild_visits(start_date, end_date, employee_ids=None, **params):
+    """
+    Recompute the client_visits table for a date range. Visits inside an office
+    geofence keep that office_id; the rest are client sites.
+    Returns (employee_days, visits_written).
+    """
+    tz = timezone.get_current_timezone()
+    index = get_office_index()
+    rows = []
+    employee_days = 0
+
+    for employee_id, day, lats, lngs, epoch in load_daily_traces(start_date, end_date, employee_ids):
+        employee_days += 1
+        visits = detect_visits(lats, lngs, epoch, **params)
+        if not visits:
+            continue
+        inside, _ = evaluate_points(index, [v['lat'] for v in visits], [v['lng'] for v in visits])
+        for visit, office in zip(visits, inside.tolist()):
+            rows.append(ClientVisit(
+                employee_id=employee_id,
+                date=day,
+                start_time=datetime.fromtimestamp(visit['start'], tz),
+                end_time=datetime.fromtimestamp(visit['end'], tz),
+                latitude=visit['lat'],
+                longitude=visit['lng'],
+                dwell_minutes=round(visit['dwell_s'] / 60, 1),
+                point_count=visit['points'],
+                office_id=index.ids[office] if office >= 0 else None,
+            ))
+
+    with transaction.atomic():
+        stale = ClientVisit.objects.filter(date__gte=start_date, date__lte=end_date)
+        if employee_ids:
+            stale = stale.filter(employee_id__in=employee_ids)
+        stale.delete()
+        ClientVisit.objects.bulk_create(rows, batch_size=1000)
+
+    return employee_days, len(rows)
@@ -0,0 +1,340 @@
+"""
+Write-Behind Attendance Queue
+Check-in/check-out events are appended to a local journal (group-fsynced) and acknowledged
+right away; a single writer thread applies them to the database in batched transactions.
+Applying an event is idempotent, so the journal is simply replayed after a crash.
+An event the database rejects is moved to a dead-letter file (same line format as the
+journal) instead of blocking the events behind it; transient database errors are retried.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import date, time
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from .checkin import upsert_check_ins
+from .models import AttendanceRecord
+from .rollups import RECORD_STATE_FIELDS, apply_record_changes
+
+try:
+    import fcntl
+except ImportError:  # No advisory locks on Windows; a single process is assumed
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY_SECONDS = 0.5
+
+
+def _encode(event):
+    return json.dumps(event, default=lambda value: value.isoformat(), separators=(',', ':'))
+
+
+def _decode(line):
+    event = json.loads(line)
+    event['date'] = date.fromisoformat(event['date'])
+    for key in ('check_in_time', 'check_out_time'):
+        if event.get(key):
+            event[key] = time.fromisoformat(event[key])
+    return event
+
+
+def _transient(error):
+    """The database is unreachable or locked: retry the batch rather than dead-letter its events"""
+    if isinstance(error, OperationalError):
+        return True
+    return isinstance(error, InterfaceError) and not (connection.connection and connection.is_usable())
+
+
+def _employee_key(employee_id):
+    try:
+        return int(employee_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class WriteBehindQueue:
+    """Durable in-process buffer of attendance writes with a single batching writer thread."""
+
+    def __init__(self, journal_path, dead_letter_path=None, interval_ms=5, max_batch=500):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.dead_letter_path = dead_letter_path or f'{journal_path}.dead'
+
+        self._lock = threading.Lock()         # guards the buffers and journal writes
+        self._sync_lock = threading.Lock()    # one fsync at a time, shared by every waiting writer
+        self._stopped = threading.Event()
+        self._pending = []                    # journaled, not yet picked up by the writer
+        self._inflight = []                   # batch currently being applied
+        self._written = 0
+        self._synced = 0
+
+        self._journal = open(journal_path, 'a+', encoding='utf-8')
+        if fcntl:
+            try:
+                fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._journal.close()
+                raise
+        self._replay()
+
+        self._thread = threading.Thread(target=self._run, name='attendance-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # Journal
+
+    def _replay(self):
+        self._journal.seek(0)
+        for line in self._journal:
+            try:
+                self._pending.append(_decode(line))
+            except (ValueError, KeyError):
+                logger.warning('Skipping unreadable write-behind journal line')  # torn final write
+        if self._pending:
+            logger.info('Replaying %d write-behind events', len(self._pending))
+
+    def _append(self, event):
+        """Write one event to the journal; caller holds self._lock"""
+        self._journal.write(_encode(event) + '\n')
+        self._journal.flush()
+        self._pending.append(event)
+        self._written += 1
+        return self._written
+
+    def _sync(self, seq):
+        """Group commit: a single fsync covers every event written before it started"""
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._lock:
+                target = self._written
+            os.fsync(self._journal.fileno())
+            self._synced = target
+
+    # Producers (request threads)
+
+    def _find(self, employee_id, att_date, op):
+        for event in self._inflight + self._pending:
+            if event['op'] == op and event['employee_id'] == employee_id and event['date'] == att_date:
+                return event
+        return None
+
+    def submit_check_in(self, **check_in):
+        """Journal a check-in; returns False if one is already pending for that employee and date"""
+        event = {'op': 'check_in', **check_in, 'employee_id': _employee_key(check_in['employee_id'])}
+        with self._lock:
+            if self._find(event['employee_id'], event['date'], 'check_in'):
+                return False
+            seq = self._append(event)
+        self._sync(seq)
+        return True
+
+    def submit_check_out(self, employee_id, att_date, check_out_time, total_hours, status, photo=None):
+        """Journal a check-out; returns False if one is already pending for that employee and date"""
+        event = {
+            'op': 'check_out',
+            'employee_id': _employee_key(employee_id),
+            'date': att_date,
+            'check_out_time': check_out_time,
+            'total_hours': total_hours,
+            'status': status,
+            'photo': photo,
+        }
+        with self._lock:
+            if self._find(event['employee_id'], att_date, 'check_out'):
+                return False
+            seq = self._append(event)
+        self._sync(seq)
+        return True
+
+    def pending_state(self, employee_id, att_date):
+        """Uncommitted events for an employee-day as {'check_in': event, 'check_out': event}, or None"""
+        employee_id = _employee_key(employee_id)
+        with self._lock:
+            state = {
+                'check_in': self._find(employee_id, att_date, 'check_in'),
+                'check_out': self._find(employee_id, att_date, 'check_out'),
+            }
+        return state if state['check_in'] or state['check_out'] else None
+
+    def pending_check_out(self, employee_id):
+        """Latest pending check-out of an employee, or None"""
+        employee_id = _employee_key(employee_id)
+        with self._lock:
+            check_outs = [
+                e for e in self._inflight + self._pending
+                if e['op'] == 'check_out' and e['employee_id'] == employee_id
+            ]
+        return max(check_outs, key=lambda e: e['date']) if check_outs else None
+
+    def pending_open_session(self, employee_id):
+        """Latest pending check-in that has no pending check-out, or None"""
+        employee_id = _employee_key(employee_id)
+        with self._lock:
+            events = self._inflight + self._pending
+            closed = {e['date'] for e in events if e['op'] == 'check_out' and e['employee_id'] == employee_id}
+            open_sessions = [
+                e for e in events
+                if e['op'] == 'check_in' and e['employee_id'] == employee_id and e['date'] not in closed
+            ]
+        return max(open_sessions, key=lambda e: e['date']) if open_sessions else None
+
+    # Writer thread
+
+    def _run(self):
+        if connection.vendor == 'sqlite':
+            # WAL lets request threads keep reading while the writer commits
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+        while True:
+            stopping = self._stopped.wait(self.interval)
+            while True:
+                applied = self._flush()
+                if applied < 0:
+                    if stopping:
+                        break
+                    self._stopped.wait(RETRY_DELAY_SECONDS)
+                    continue
+                if applied < self.max_batch:
+                    break  # Drained; otherwise keep going without sleeping
+            if stopping:
+                connection.close()
+                return
+
+    def _flush(self):
+        """Apply one batch; returns its size, or -1 if it must be retried"""
+        with self._lock:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:len(batch)]
+            self._inflight = batch
+        if not batch:
+            return 0
+
+        try:
+            self._apply(batch)
+        except Exception:
+            logger.exception('Write-behind flush of %d events failed; retrying', len(batch))
+            connection.close()
+            with self._lock:
+                self._pending[:0] = batch
+                self._inflight = []
+            return -1
+
+        with self._lock:
+            self._inflight = []
+            if not self._pending:
+                # Everything journaled so far is committed
+                self._journal.truncate(0)
+                self._journal.flush()
+        return len(batch)
+
+    def _apply(self, batch):
+        try:
+            with transaction.atomic():
+                self._apply_events(batch)
+        except Exception as error:
+            if _transient(error):
+                raise
+            # A bad event (a deleted employee, a value the column rejects) must not block the rest of the queue
+            for event in batch:
+                try:
+                    with transaction.atomic():
+                        self._apply_events([event])
+                except Exception as error:
+                    if _transient(error):
+                        raise
+                    logger.exception('Moving write-behind event that cannot be applied to %s: %s',
+                                     self.dead_letter_path, _encode(event))
+                    self._dead_letter(event)
+
+    def _dead_letter(self, event):
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as dead_letter:
+            dead_letter.write(_encode(event) + '\n')
+            dead_letter.flush()
+            os.fsync(dead_letter.fileno())
+
+    @staticmethod
+    def _apply_events(events):
+        # One row per employee-day: PostgreSQL refuses to upsert the same row twice in a statement
+        check_ins = {}
+        for e in events:
+            if e['op'] == 'check_in':
+                check_ins.setdefault((e['employee_id'], e['date']), {k: v for k, v in e.items() if k != 'op'})
+        if check_ins:
+            upsert_check_ins(list(check_ins.values()))
+
+        check_outs = [e for e in events if e['op'] == 'check_out']
+        if not check_outs:
+            return
+
+        # update() sends no model signals: lock the open rows, write, then move their
+        # summary contributions from the locked values to the checked-out ones
+        keys = {(e['employee_id'], e['date']) for e in check_outs}
+        open_rows = AttendanceRecord.objects.select_for_update().filter(
+            employee_id__in={employee_id for employee_id, _ in keys},
+            date__in={day for _, day in keys},
+            check_out_time__isnull=True,
+        ).values(*RECORD_STATE_FIELDS)
+        previous = {(row['employee_id'], row['date']): row for row in open_rows}
+
+        now = timezone.now()
+        summary_changes = []
+        for e in check_outs:
+            old = previous.pop((e['employee_id'], e['date']), None)
+            if old is None:
+                continue  # No open session, or a check-out earlier in this batch closed it
+            changes = {
+                'check_out_time': e['check_out_time'],
+                'total_hours': e['total_hours'],
+                'status': e['status'],
+                'updated_at': now,
+            }
+            if e.get('photo'):
+                changes['check_out_photo'] = e['photo']
+            AttendanceRecord.objects.filter(
+                employee_id=e['employee_id'],
+                date=e['date'],
+                check_out_time__isnull=True,
+            ).update(**changes)
+            summary_changes.append((old, {**old, 'total_hours': e['total_hours'], 'status': e['status']}))
+        apply_record_changes(summary_changes)
+
+    def stop(self):
+        """Flush what is buffered and stop the writer thread"""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+_queue = None
+_queue_unavailable = False
+_queue_lock = threading.Lock()
+
+
+def get_write_behind_queue():
+    """The process-wide queue when ATTENDANCE_WRITE_BEHIND is enabled, otherwise None"""
+    global _queue, _queue_unavailable
+    if not settings.ATTENDANCE_WRITE_BEHIND or _queue_unavailable:
+        return None
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None and not _queue_unavailable:
+                try:
+                    _queue = WriteBehindQueue(
+                        settings.ATTENDANCE_WRITE_BEHIND_JOURNAL,
+                        dead_letter_path=settings.ATTENDANCE_WRITE_BEHIND_DEAD_LETTER,
+                        interval_ms=settings.ATTENDANCE_WRITE_BEHIND_INTERVAL_MS,
+                        max_batch=settings.ATTENDANCE_WRITE_BEHIND_MAX_BATCH,
+                    )
+                except OSError:
+                    # Another process owns the journal; this one writes synchronously
+                    logger.warning('Write-behind journal is locked by another process; writing synchronously')
+                    _queue_unavailable = True
+    return _queue
@@ -4,6 +4,7 @@ Django settings for attendance_system project.
 from pathlib import Path
 import os
 import random
+from importlib.util import find_spec
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -104,6 +105,15 @@ else:
         }
     }
 
+# Write-behind check-in/check-out queue (meant for single-process SQLite deployments).
+# Events are acknowledged once appended to the journal and applied in batches by one writer thread.
+ATTENDANCE_WRITE_BEHIND = os.getenv('ATTENDANCE_WRITE_BEHIND', 'False') == 'True'
+ATTENDANCE_WRITE_BEHIND_JOURNAL = BASE_DIR / os.getenv('ATTENDANCE_WRITE_BEHIND_JOURNAL', 'write_behind.journal')
+# Events the database rejects are moved here (journal line format) so they can be fixed and replayed
+ATTENDANCE_WRITE_BEHIND_DEAD_LETTER = BASE_DIR / os.getenv('ATTENDANCE_WRITE_BEHIND_DEAD_LETTER', 'write_behind.dead')
+ATTENDANCE_WRITE_BEHIND_INTERVAL_MS = int(os.getenv('ATTENDANCE_WRITE_BEHIND_INTERVAL_MS', 5))
+ATTENDANCE_WRITE_BEHIND_MAX_BATCH = int(os.getenv('ATTENDANCE_WRITE_BEHIND_MAX_BATCH', 500))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -151,8 +161,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # orjson-backed JSON first, so */* clients get JSON; MessagePack on Accept: application/msgpack
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'attendance.renderers.FastJSONRenderer',
+        *(['attendance.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -14,7 +14,7 @@ let notificationTimeout = null;
 let currentEditAttendanceId = null;
 let allAttendanceRecords = [];
 let selectedOfficeInRange = false;
-let attendanceDaysOffset = 0;
+let attendanceNextCursor = null;
 let attendanceHasMore = false;
 let faceapiLoaded = false;
 let trackingInterval = null;
@@ -3152,6 +3152,28 @@ async function changeCalendarMonth(offset) {
     await buildAttendanceCalendar(currentCalendarYear, currentCalendarMonth);
 }
 
+// Calendar months by URL with their ETag; an unchanged month comes back as 304 and is reused
+const calendarMonthCache = new Map();
+
+async function fetchCalendarMonth(employeeId, year, month) {
+    const url = `${apiBaseUrl}/attendance-calendar?employee_id=${encodeURIComponent(employeeId)}&year=${year}&month=${month}`;
+    const cached = calendarMonthCache.get(url);
+    const headers = {};
+    if (cached) headers['If-None-Match'] = cached.etag;
+
+    try {
+        const res = await fetch(url, { headers, cache: 'no-store' });
+        if (res.status === 304 && cached) return cached.data;
+        const data = await res.json();
+        const etag = res.headers.get('ETag');
+        if (res.ok && etag) calendarMonthCache.set(url, { etag, data });
+        return data;
+    } catch (error) {
+        console.error('Calendar fetch failed:', error);
+        return cached ? cached.data : { success: false, message: 'Network error or server unreachable' };
+    }
+}
+
 async function buildAttendanceCalendar(year, month) {
     const grid = document.getElementById('calendarGrid');
     const label = document.getElementById('calendarMonthLabel');
@@ -3174,74 +3196,17 @@ async function buildAttendanceCalendar(year, month) {
         grid.appendChild(el);
     });
 
-    // Fetch attendance records and requests in parallel
-    const [attendanceRes, requestsRes] = await Promise.all([
-        apiCall('attendance-records', 'GET', { employee_id: currentUser.id }),
-        apiCall('my-requests', 'GET', { employee_id: currentUser.id })
-    ]);
-
-    const allRecords = (attendanceRes && attendanceRes.success && Array.isArray(attendanceRes.records)) ? attendanceRes.records : [];
-    const allRequests = (requestsRes && requestsRes.success && Array.isArray(requestsRes.requests)) ? requestsRes.requests : [];
-
-    console.log('DEBUG Calendar Records:', allRecords.length);
-    console.log('DEBUG Calendar Requests:', allRequests);
-
+    // One month of merged attendance and requests, indexed by day (days[0] is the 1st)
+    const calendarRes = await fetchCalendarMonth(currentUser.id, year, month + 1);
     const byDay = {};
-
-    // 1. Map attendance records first
-    allRecords.forEach(r => {
-        if (!r.date) return;
-        const d = new Date(r.date);
-        if (d.getFullYear() === year && d.getMonth() === month) {
-            byDay[d.getDate()] = { ...r, source: 'attendance' };
-        }
-    });
-
-    // 2. Map requests (Leaves, WFH) - they should override 'absent' or empty slots
-    allRequests.forEach(req => {
-        if (!req.start_date) return;
-        if (req.status === 'rejected') return; // User requested: rejected requests should disappear
-
-        // Use a safe date parser to avoid UTC shifts
-        const parseDate = (s) => {
-            const parts = s.split('-');
-            return new Date(parts[0], parts[1] - 1, parts[2]);
-        };
-
-        const start = parseDate(req.start_date);
-        const end = parseDate(req.end_date || req.start_date);
-
-        let curr = new Date(start);
-        while (curr <= end) {
-            if (curr.getFullYear() === year && curr.getMonth() === month) {
-                const dayNum = curr.getDate();
-                const type = req.type; // 'full_day', 'half_day', 'wfh'
-                const reqStatus = req.status; // 'pending', 'approved'
-
-                if (type === 'full_day' || type === 'half_day') {
-                    // Overwrite if empty OR if currently says 'absent'
-                    if (!byDay[dayNum] || byDay[dayNum].status === 'absent') {
-                        byDay[dayNum] = {
-                            ...req,
-                            status: (type === 'half_day') ? 'half_day' : 'leave',
-                            request_status: reqStatus,
-                            source: 'request'
-                        };
-                    }
-                } else if (type === 'wfh') {
-                    if (!byDay[dayNum]) {
-                        byDay[dayNum] = {
-                            ...req,
-                            status: 'wfh',
-                            request_status: reqStatus,
-                            source: 'request'
-                        };
-                    }
-                }
-            }
-            curr.setDate(curr.getDate() + 1);
-        }
-    });
+    if (calendarRes && calendarRes.success && Array.isArray(calendarRes.days)) {
+        calendarRes.days.forEach((row, i) => {
+            if (!row) return;
+            const entry = {};
+            calendarRes.columns.forEach((column, c) => { entry[column] = row[c]; });
+            byDay[i + 1] = entry;
+        });
+    }
 
     const firstDay = new Date(year, month, 1).getDay(); // 0=Sun
     const daysInMonth = new Date(year, month + 1, 0).getDate();
@@ -4930,7 +4895,7 @@ async function markAttendance() {
             return;
         }
 
-        const loc = { latitude: currentPhotoLocation.lat, longitude: currentPhotoLocation.lng };
+        const loc = { latitude: currentPhotoLocation.lat, longitude: currentPhotoLocation.lng, accuracy: currentPhotoLocation.accuracy };
 
         const payload = {
             employee_id: currentUser.id,
@@ -5191,7 +5156,7 @@ async function loadAttendanceRecords(isMore = false) {
         const recordsContent = document.getElementById('recordsContent');
 
         if (!isMore) {
-            attendanceDaysOffset = 0;
+            attendanceNextCursor = null;
             allAttendanceRecords = [];
             recordsContent.innerHTML = `
                 <div class="text-center" style="padding: 40px;">
@@ -5207,10 +5172,10 @@ async function loadAttendanceRecords(isMore = false) {
             }
         }
 
-        const params = {
-            days_limit: 1,
-            days_offset: attendanceDaysOffset
-        };
+        const params = { limit: 100 };
+        if (isMore && attendanceNextCursor) {
+            params.cursor = attendanceNextCursor;
+        }
 
         // For non-admin users (employees), fetch last 6 months of data
         if (currentUser.role !== 'admin' && currentUser.role !== 'manager') {
@@ -5235,6 +5200,7 @@ async function loadAttendanceRecords(isMore = false) {
         if (result && result.success && Array.isArray(result.records)) {
             allAttendanceRecords = [...allAttendanceRecords, ...result.records];
             attendanceHasMore = result.has_more;
+            attendanceNextCursor = result.next_cursor;
             renderAttendanceTable(allAttendanceRecords);
             applyAttendanceSearch();
         } else {
@@ -5259,7 +5225,6 @@ async function loadAttendanceRecords(isMore = false) {
 }
 
 async function loadMoreAttendanceRecords() {
-    attendanceDaysOffset++;
     await loadAttendanceRecords(true);
 }
 